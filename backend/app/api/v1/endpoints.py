@@ -1,12 +1,26 @@
+import asyncio
+import time
+from dataclasses import asdict
+from contextlib import aclosing, contextmanager
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator, Callable, Iterator, Literal, Union
 from datetime import datetime
 
-from ...services.dataforseo_service import dataforseo_service
-from ...services.google_ads_service import google_ads_service
-from ...services.ms_ads_service import ms_ads_service
-from ...services.serp_service import serp_service
+import numpy as np
+
+from ...services.keyword_providers import KeywordQuery, ProviderResult, keyword_strategy
+from ...services.batch_planner import BatchUnit, SeedFetch, batch_planner
+from ...services.job_queue import JobContext, job_queue
+from ...services.plan_sessions import PlanSession, plan_sessions
+from ...services.cpu_pool import cpu_pool
+from ...engine.keyword_frame import KeywordFrame
+from ...engine.dedupe import variant_collapser, canonical_key
+from ...engine.planning import ad_group_specs, bid_plan, filter_rows, pmax_theme_specs
+from ...services.metrics import stage_timer, observe_keywords
+from ...services.tracing import current_span
+from ...services.wire_format import WireResponse, dumps, to_jsonable
 
 router = APIRouter()
 apiRouter = router
@@ -17,6 +31,7 @@ class KeywordRequest(BaseModel):
     competitor_url: Optional[str] = None
     locations: Optional[List[str]] = Field(default_factory=list)
     max_results: Optional[int] = Field(default=1000)
+    provider_strategy: Optional[str] = None  # sequential | hedged | parallel; server default when unset
 
 class KeywordItem(BaseModel):
     keyword: str
@@ -30,11 +45,15 @@ class KeywordItem(BaseModel):
     opportunity_score: float
 
 class FilterRequest(BaseModel):
-    keywords: List[KeywordItem]
+    keywords: List[KeywordItem] = Field(default_factory=list)
+    plan_id: Optional[str] = None  # work on a plan session's keywords instead of sending them
     min_search_volume: int = 500
     max_competition: Optional[str] = "High"
     min_opportunity_score: Optional[float] = 0.6
     exclude_branded: Optional[bool] = False
+    theme_tokens: Optional[Dict[str, List[str]]] = None  # extra PMax theme tokens per category
+    max_group_size: Optional[int] = 20
+    similarity_threshold: Optional[float] = 0.5
 
 class AdGroup(BaseModel):
     name: str
@@ -57,10 +76,136 @@ class PMaxTheme(BaseModel):
     asset_suggestions: Dict[str, List[str]]
 
 class BudgetRequest(BaseModel):
-    ad_groups: List[AdGroup]
+    ad_groups: List[AdGroup] = Field(default_factory=list)
+    plan_id: Optional[str] = None  # use the ad groups /group_keywords saved in the plan session
     budgets: Dict[str, float]
     conversion_rate: float = 0.02
     target_roas: Optional[float] = 4.0
+    conversion_value: Optional[float] = None  # revenue per conversion; inferred from target_roas when unset
+    include_keyword_bids: Optional[bool] = False
+    curve_points: int = Field(default=20, ge=0, le=200)  # points on the spend -> conversions curve
+
+class BatchJob(BaseModel):
+    job_id: Optional[str] = None
+    seed_keywords: List[str]
+    locations: Optional[List[str]] = Field(default_factory=list)  # one plan per location
+    brand_url: Optional[str] = None
+    competitor_url: Optional[str] = None
+    budgets: Dict[str, float] = Field(default_factory=dict)
+    conversion_rate: float = 0.02
+    target_roas: Optional[float] = 4.0
+    conversion_value: Optional[float] = None
+    max_results: Optional[int] = Field(default=200)
+    min_search_volume: int = 500
+    max_competition: Optional[str] = "High"
+    min_opportunity_score: Optional[float] = 0.6
+    exclude_branded: Optional[bool] = False
+    max_group_size: Optional[int] = 20
+
+class BatchPlanRequest(BaseModel):
+    jobs: List[BatchJob]
+    provider_strategy: Optional[str] = None
+
+PlanOutput = Literal["keywords", "filtered_keywords", "ad_groups", "pmax_themes", "bids"]
+
+class PlanRequest(BaseModel):
+    seed_keywords: List[str]
+    brand_url: Optional[str] = None
+    competitor_url: Optional[str] = None
+    locations: Optional[List[str]] = Field(default_factory=list)
+    max_results: Optional[int] = Field(default=1000)
+    provider_strategy: Optional[str] = None
+    min_search_volume: int = 500
+    max_competition: Optional[str] = "High"
+    min_opportunity_score: Optional[float] = 0.6
+    exclude_branded: Optional[bool] = False
+    max_group_size: Optional[int] = 20
+    similarity_threshold: Optional[float] = 0.5
+    theme_tokens: Optional[Dict[str, List[str]]] = None
+    budgets: Dict[str, float] = Field(default_factory=dict)
+    conversion_rate: float = 0.02
+    target_roas: Optional[float] = 4.0
+    conversion_value: Optional[float] = None
+    include_keyword_bids: Optional[bool] = False
+    curve_points: int = Field(default=20, ge=0, le=200)
+    # stages whose output nothing here needs are skipped
+    outputs: List[PlanOutput] = Field(default_factory=lambda: ["keywords", "filtered_keywords", "ad_groups", "pmax_themes", "bids"])
+
+# Response shapes. Handlers return a pre-rendered WireResponse, so these document the
+# API (OpenAPI) without FastAPI re-validating every nested keyword on the way out.
+class KeywordsResponse(BaseModel):
+    status: str
+    total_keywords: int
+    collapsed_variants: Optional[int] = None
+    keywords: List[KeywordItem]
+    data_source: str
+    generated_at: str
+    plan_id: Optional[str] = None
+
+class FilterResponse(BaseModel):
+    status: str
+    original_count: int
+    filtered_count: int
+    keywords: List[KeywordItem]
+    plan_id: Optional[str] = None
+
+class AdGroupsResponse(BaseModel):
+    status: str
+    ad_groups: List[AdGroup]
+    total_keywords: int
+    plan_id: Optional[str] = None
+
+class PMaxThemesResponse(BaseModel):
+    status: str
+    themes: List[PMaxTheme]
+
+class BidRecommendation(BaseModel):
+    ad_group_name: str
+    budget: float
+    channel_budgets: Dict[str, float]
+    target_cpa: float
+    target_cpc: float
+    recommended_bid: float
+    bid_range: Dict[str, float]
+    estimated_clicks: int
+    estimated_conversions: float
+    keyword_bids: Optional[List[Dict[str, Any]]] = None
+
+class BidPlanResponse(BaseModel):
+    status: str
+    budget_allocation: Dict[str, float]
+    suggested_budget_allocation: Dict[str, float]
+    total_budget: float
+    allocated_budget: float
+    unallocated_budget: float
+    estimated_clicks: int
+    estimated_conversions: float
+    target_cpa: float
+    expected_roas: float
+    channels: Dict[str, Dict[str, float]]
+    bid_recommendations: List[BidRecommendation]
+    spend_curve: List[Dict[str, float]]
+
+class BatchPlanResponse(BaseModel):
+    status: str
+    plans: List[Dict[str, Any]]
+    fetches: Dict[str, int]
+    generated_at: str
+
+class PlanResponse(BaseModel):
+    status: str
+    plan_id: Optional[str] = None
+    data_source: str
+    total_keywords: int
+    collapsed_variants: int
+    counts: Dict[str, int]
+    keywords: Optional[List[KeywordItem]] = None
+    filtered_keywords: Optional[List[KeywordItem]] = None
+    ad_groups: Optional[List[AdGroup]] = None
+    pmax_themes: Optional[List[PMaxTheme]] = None
+    bids: Optional[BidPlanResponse] = None
+    timings_ms: Dict[str, float]
+    generated_at: str
 
 class CampaignOptimization(BaseModel):
     campaign_type: str
@@ -70,245 +215,541 @@ class CampaignOptimization(BaseModel):
     creative_recommendations: List[str]
     performance_predictions: Dict[str, float]
 
-@apiRouter.post("/generate_keywords", response_model=Dict[str, Any])
+def _location_code(locations: Optional[List[str]]) -> int:
+    # Parse first numeric location if provided; default to US (2840)
+    location_code = 2840
+    try:
+        if locations:
+            first = locations[0]
+            if isinstance(first, str) and first.strip().isdigit():
+                location_code = int(first.strip())
+    except Exception:
+        pass
+    return location_code
+
+def _keyword_query(request: Union[KeywordRequest, PlanRequest]) -> KeywordQuery:
+    return KeywordQuery(
+        seed_keywords=request.seed_keywords,
+        locations=request.locations or [],
+        location_code=_location_code(request.locations),
+        language_code="en",
+        brand_url=request.brand_url,
+        competitor_url=request.competitor_url,
+    )
+
+@stage_timer("serialize")
+def _frame_items(frame: KeywordFrame) -> List[KeywordItem]:
+    # frame columns are already typed, so skip re-validation at the response boundary
+    return [KeywordItem.model_construct(**rec) for rec in frame.to_records()]
+
+@apiRouter.post("/generate_keywords", response_model=KeywordsResponse)
 async def generate_keywords(request: KeywordRequest):
     try:
         # Priority: DataForSEO → Google Ads → Microsoft Ads → SerpAPI discovery
-        real_keywords: List[Dict[str, Any]] = []
-
-        # Parse first numeric location if provided; default to US (2840)
-        location_code = 2840
-        try:
-            if request.locations:
-                first = request.locations[0]
-                if isinstance(first, str) and first.strip().isdigit():
-                    location_code = int(first.strip())
-        except Exception:
-            pass
-
-        if dataforseo_service.is_configured:
-            real_keywords = await dataforseo_service.get_keyword_data(
-                seed_keywords=request.seed_keywords,
-                location_code=location_code,
-                language_code="en",
-                brand_url=request.brand_url,
-                competitor_url=request.competitor_url,
-                min_volume=300,
-            )
+        query = _keyword_query(request)
+        result = await keyword_strategy.run(query, mode=request.provider_strategy)
+        return WireResponse(await _keyword_response(request, query, result))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Keyword generation failed: {str(e)}")
 
-        if not real_keywords:
-            ga_keywords = await google_ads_service.get_keyword_ideas(
-                seed_keywords=request.seed_keywords,
-                location_ids=request.locations
-            )
-            if ga_keywords:
-                real_keywords = ga_keywords
+async def _keyword_response(request: KeywordRequest, query: KeywordQuery, result: ProviderResult) -> Dict[str, Any]:
+    real_keywords: List[Dict[str, Any]] = result.keywords
+    observe_keywords("provider", len(real_keywords))
 
-        if not real_keywords and request.seed_keywords:
-            ms_keywords = await ms_ads_service.get_keyword_ideas(
-                seed_keywords=request.seed_keywords,
-                location_ids=request.locations
-            )
-            if ms_keywords:
-                real_keywords = [
-                    {
-                        "keyword": k.get("keyword") or k.get("text") or "",
-                        "avg_monthly_searches": k.get("avg_monthly_searches") or k.get("monthly_searches") or 0,
-                        "competition": k.get("competition") or ("High" if (k.get("competition_level") or 0) > 0.66 else ("Medium" if (k.get("competition_level") or 0) > 0.33 else "Low")),
-                        "low_top_of_page_bid_micros": int((k.get("cpc_low") or k.get("suggested_bid_low") or 0) * 1_000_000),
-                        "high_top_of_page_bid_micros": int((k.get("cpc_high") or k.get("suggested_bid_high") or k.get("cpc") or 0) * 1_000_000),
-                        "source": "ms_ads_planner"
-                    }
-                    for k in ms_keywords if (k.get("keyword") or k.get("text"))
-                ]
-
-        if not real_keywords and request.seed_keywords:
-            discovered = await serp_service.discover_keywords(request.seed_keywords)
-            real_keywords = [
-                {
-                    "keyword": r["keyword"],
-                    "avg_monthly_searches": r.get("score", 0),
-                    "competition": "Unknown",
-                    "low_top_of_page_bid_micros": 0,
-                    "high_top_of_page_bid_micros": 0,
-                    "source": "serpapi"
-                }
-                for r in discovered
-            ]
-        
-        def to_scores(volume: int, competition: str) -> Dict[str, float]:
-            comp_map = {"Low": 0.2, "Medium": 0.5, "High": 0.8, "Unknown": 0.5}
-            difficulty = comp_map.get(competition, 0.5)
-            vol_norm = min(1.0, volume / 20000.0)
-            opportunity = round(max(0.0, min(1.0, (0.7 * vol_norm) + (0.3 * (1 - difficulty)))), 3)
-            return {"difficulty": round(difficulty, 3), "opportunity": opportunity}
-
-        keyword_items = [
-            KeywordItem(
-                keyword=kw_data["keyword"],
-                avg_monthly_searches=kw_data.get("avg_monthly_searches", 0),
-                competition=kw_data.get("competition", "Unknown"),
-                top_of_page_bid_low=kw_data.get("low_top_of_page_bid_micros", 0) / 1_000_000,
-                top_of_page_bid_high=kw_data.get("high_top_of_page_bid_micros", 0) / 1_000_000,
-                source=kw_data.get("source", "keyword_planner"),
-                intent="commercial",
-                **(lambda s: {"difficulty_score": s["difficulty"], "opportunity_score": s["opportunity"]})(to_scores(kw_data.get("avg_monthly_searches", 0), kw_data.get("competition", "Unknown")))
-            ) for kw_data in real_keywords
-        ]
-        
-        if not keyword_items:
-            return {"status": "success", "total_keywords": 0, "keywords": [], "data_source": "none", "generated_at": datetime.now().isoformat()}
-        
-        data_source = (
-            "dataforseo_api" if (dataforseo_service.is_configured and real_keywords and real_keywords[0].get("source") == "dataforseo") else
-            ("google_ads_api" if google_ads_service.is_configured and real_keywords and real_keywords[0].get("source") != "ms_ads_planner" and real_keywords[0].get("source") != "serpapi" else
-             ("ms_ads_api" if ms_ads_service.is_configured and real_keywords and real_keywords[0].get("source") == "ms_ads_planner" else "serpapi_fallback"))
-        )
-        
-        return {
+    with stage_timer("frame"):
+        # fold plural / word-order / spelling variants before anything is scored
+        frame = variant_collapser.collapse(KeywordFrame.from_rows(real_keywords, brand_tokens=query.brand_tokens))
+    observe_keywords("collapsed", len(frame))
+    with stage_timer("score"):
+        # only build models for what we return
+        scored = frame.head(request.max_results).score()
+    keyword_items = _frame_items(scored)
+    observe_keywords("returned", len(keyword_items))
+    current_span().set_attributes({
+        "seed.count": len(request.seed_keywords),
+        "keyword.provider_count": len(real_keywords),
+        "keyword.count": len(keyword_items),
+        "data_source": result.data_source,
+    })
+
+    if not keyword_items:
+        return {"status": "success", "total_keywords": 0, "keywords": [], "data_source": "none", "generated_at": datetime.now().isoformat()}
+
+    return {
+        "status": "success",
+        "total_keywords": len(frame),
+        "collapsed_variants": len(real_keywords) - len(frame),
+        "keywords": keyword_items,
+        "data_source": result.data_source,
+        "generated_at": datetime.now().isoformat(),
+        # later stages can send this instead of the keyword list
+        "plan_id": await plan_sessions.create(scored),
+    }
+
+async def _plan_session(plan_id: str) -> PlanSession:
+    session = await plan_sessions.get(plan_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired plan: {plan_id}")
+    return session
+
+def _stream_frame(fmt: str, event: str, payload: Dict[str, Any]) -> bytes:
+    body = dumps({"type": event, **payload})
+    if fmt == "sse":
+        return b"event: " + event.encode() + b"\ndata: " + body + b"\n\n"
+    return body + b"\n"
+
+async def _keyword_frames(request: KeywordRequest, fmt: str) -> AsyncIterator[bytes]:
+    sent = 0
+    seen = set()
+    data_source = "none"
+    limit = request.max_results
+    query = _keyword_query(request)
+    try:
+        # closing the provider stream once max_results is reached cancels the remaining upstream calls
+        async with aclosing(keyword_strategy.stream(query, mode=request.provider_strategy)) as batches:
+            async for source, batch in batches:
+                data_source = source
+                # variants of keywords from earlier batches are dropped; within the batch they are merged
+                keyed = [(canonical_key(row["keyword"]), row) for row in batch if row.get("keyword")]
+                fresh = [row for key, row in keyed if key not in seen]
+                seen.update(key for key, _ in keyed)
+                frame = variant_collapser.collapse(KeywordFrame.from_rows(fresh, brand_tokens=query.brand_tokens))
+                if limit is not None:
+                    frame = frame.head(max(0, limit - sent))
+                if len(frame):
+                    items = _frame_items(frame.score())
+                    sent += len(items)
+                    yield _stream_frame(fmt, "keywords", {"data_source": source, "keywords": items})
+                if limit is not None and sent >= limit:
+                    break
+        observe_keywords("streamed", sent)
+        yield _stream_frame(fmt, "summary", {
             "status": "success",
-            "total_keywords": len(keyword_items),
-            "keywords": keyword_items[:request.max_results],
-            "data_source": data_source,
-            "generated_at": datetime.now().isoformat()
-        }
+            "total_keywords": sent,
+            "data_source": data_source if sent else "none",
+            "limit_reached": limit is not None and sent >= limit,
+            "generated_at": datetime.now().isoformat(),
+        })
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Keyword generation failed: {str(e)}")
+        yield _stream_frame(fmt, "error", {"status": "error", "error": f"Keyword generation failed: {str(e)}"})
+
+@apiRouter.post("/generate_keywords/stream")
+async def generate_keywords_stream(request: KeywordRequest, format: str = "ndjson"):
+    """Scored keywords as they arrive: one "keywords" frame per provider/enrichment batch,
+    then a "summary" frame. format=ndjson (default) or sse.
+    """
+    fmt = "sse" if format == "sse" else "ndjson"
+    media_type = "text/event-stream" if fmt == "sse" else "application/x-ndjson"
+    return StreamingResponse(_keyword_frames(request, fmt), media_type=media_type, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
-@apiRouter.post("/filter_keywords", response_model=Dict[str, Any])
+@apiRouter.post("/filter_keywords", response_model=FilterResponse)
 async def filter_keywords(request: FilterRequest):
+    session = await _plan_session(request.plan_id) if request.plan_id else None
     try:
-        filtered_kws = [
-            kw for kw in request.keywords
-            if kw.avg_monthly_searches >= request.min_search_volume and
-            not (request.max_competition and kw.competition == "High" and request.max_competition != "High") and
-            kw.opportunity_score >= request.min_opportunity_score and
-            not (request.exclude_branded and "brand" in kw.keyword.lower())
-        ]
-        filtered_kws.sort(key=lambda x: x.opportunity_score, reverse=True)
-        return {
+        frame = session.frame if session is not None else KeywordFrame.from_items(request.keywords)
+        # one vectorised mask and sort: cheaper inline than shipping the frame to the cpu pool
+        rows = filter_rows(
+            frame,
+            min_volume=request.min_search_volume,
+            max_competition=request.max_competition,
+            min_opportunity=request.min_opportunity_score,
+            exclude_branded=bool(request.exclude_branded),
+        )
+        if session is not None:
+            # always filtered from the full keyword set, so changed thresholds can widen it again
+            session.selection = rows
+            session.ad_groups = None
+            await plan_sessions.save(session)
+        filtered = frame.take(rows)
+        observe_keywords("filtered", len(filtered))
+        return WireResponse({
             "status": "success",
-            "original_count": len(request.keywords),
-            "filtered_count": len(filtered_kws),
-            "keywords": filtered_kws,
-        }
+            "original_count": len(frame),
+            "filtered_count": len(filtered),
+            "keywords": _frame_items(filtered),
+            "plan_id": request.plan_id,
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Keyword filtering failed: {str(e)}")
 
-@apiRouter.post("/group_keywords", response_model=Dict[str, Any])
+def _ad_group_models(frame: KeywordFrame, specs: List[Dict[str, Any]]) -> List[AdGroup]:
+    return [
+        AdGroup(keywords=_frame_items(frame.take(spec["rows"])), **{k: v for k, v in spec.items() if k != "rows"})
+        for spec in specs
+    ]
+
+# CPU-heavy stages go through cpu_pool: inline for small frames, in a worker process for large ones
+async def _ad_group_specs(frame: KeywordFrame, max_group_size: int = 20, similarity_threshold: float = 0.5) -> List[Dict[str, Any]]:
+    with stage_timer("ad_groups"):
+        return await cpu_pool.run(ad_group_specs, frame, max_group_size, similarity_threshold, rows=len(frame))
+
+async def _build_ad_groups(frame: KeywordFrame, max_group_size: int = 20, similarity_threshold: float = 0.5) -> List[AdGroup]:
+    return _ad_group_models(frame, await _ad_group_specs(frame, max_group_size, similarity_threshold))
+
+@apiRouter.post("/group_keywords", response_model=AdGroupsResponse)
 async def group_keywords(request: FilterRequest):
+    session = await _plan_session(request.plan_id) if request.plan_id else None
     try:
-        adGroups = []
-        brandKws = [kw for kw in request.keywords if kw.intent == "navigational"]
-        if brandKws:
-            adGroups.append(AdGroup(
-                name="Brand Terms",
-                theme="Brand searches",
-                keywords=brandKws,
-                suggested_match_types={"exact": [kw.keyword for kw in brandKws], "phrase": [kw.keyword for kw in brandKws], "bmm": []},
-                cpc_range={"low": 1.5, "high": 3.2},
-                estimated_clicks=2500,
-                estimated_conversions=50.0,
-                target_cpa=50.0
-            ))
-        categoryKws = [kw for kw in request.keywords if kw.intent == "commercial"]
-        if categoryKws:
-            adGroups.append(AdGroup(
-                name="Category Terms",
-                theme="Product or service categories",
-                keywords=categoryKws,
-                suggested_match_types={"exact": [kw.keyword for kw in categoryKws[:5]], "phrase": [kw.keyword for kw in categoryKws], "bmm": [kw.keyword for kw in categoryKws]},
-                cpc_range={"low": 3.2, "high": 8.5},
-                estimated_clicks=1800,
-                estimated_conversions=36.0,
-                target_cpa=45.0
-            ))
-        infoKws = [kw for kw in request.keywords if kw.intent == "informational"]
-        if infoKws:
-            adGroups.append(AdGroup(
-                name="Informational Terms",
-                theme="Educational queries",
-                keywords=infoKws,
-                suggested_match_types={"exact": [], "phrase": [kw.keyword for kw in infoKws], "bmm": [kw.keyword for kw in infoKws]},
-                cpc_range={"low": 1.2, "high": 3.5},
-                estimated_clicks=1200,
-                estimated_conversions=24.0,
-                target_cpa=40.0
-            ))
-        return {"status": "success", "ad_groups": adGroups, "total_keywords": len(request.keywords)}
+        frame = session.keywords() if session is not None else KeywordFrame.from_items(request.keywords)
+        specs = await _ad_group_specs(
+            frame,
+            max_group_size=request.max_group_size or 20,
+            similarity_threshold=request.similarity_threshold if request.similarity_threshold is not None else 0.5,
+        )
+        if session is not None:
+            # rows are kept relative to the session's full keyword set
+            base = session.selection
+            session.ad_groups = [spec if base is None else {**spec, "rows": base[spec["rows"]]} for spec in specs]
+            await plan_sessions.save(session)
+        adGroups = _ad_group_models(frame, specs)
+        return WireResponse({"status": "success", "ad_groups": adGroups, "total_keywords": len(frame), "plan_id": request.plan_id})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Keyword grouping failed: {str(e)}")
 
-@apiRouter.post("/pmax_themes", response_model=Dict[str, Any])
+async def _build_pmax_themes(frame: KeywordFrame, theme_tokens: Optional[Dict[str, List[str]]] = None) -> List[PMaxTheme]:
+    with stage_timer("pmax_themes"):
+        themes = await cpu_pool.run(pmax_theme_specs, frame, theme_tokens, rows=len(frame))
+    return [PMaxTheme(**theme) for theme in themes]
+
+@apiRouter.post("/pmax_themes", response_model=PMaxThemesResponse)
 async def generate_pmax_themes(request: FilterRequest):
+    session = await _plan_session(request.plan_id) if request.plan_id else None
     try:
-        # naive clustering by simple tokens
-        buckets: Dict[str, List[str]] = {"product": [], "use_case": [], "demographic": [], "seasonal": []}
-        for kw in request.keywords:
-            text = kw.keyword.lower()
-            if any(t in text for t in ["for men", "for women", "kids", "senior", "student"]):
-                buckets["demographic"].append(kw.keyword)
-            elif any(t in text for t in ["winter", "summer", "spring", "fall", "black friday", "cyber monday"]):
-                buckets["seasonal"].append(kw.keyword)
-            elif any(t in text for t in ["best", "near me", "how to", "vs", "review", "ideas", "tips"]):
-                buckets["use_case"].append(kw.keyword)
-            else:
-                buckets["product"].append(kw.keyword)
-        themes: List[PMaxTheme] = []
-        for cat, kws in buckets.items():
-            if not kws:
-                continue
-            # basic assets
-            top_keywords = kws[:6]
-            headlines = [f"Shop {k[:30].title()}" for k in top_keywords[:3]] + ["Fast Shipping", "Great Prices"]
-            descriptions = [
-                "Discover quality picks with fast delivery.",
-                "Save time and get better results with our selection.",
-            ]
-            images: List[str] = []
-            est_impr = int(sum(kw.avg_monthly_searches for kw in request.keywords if kw.keyword in kws) * 1.5)
-            expected_ctr = 0.02 if cat != "seasonal" else 0.03
-            themes.append(PMaxTheme(
-                title=f"{cat.title()} Theme",
-                category=cat,
-                description=f"Asset group centered on {cat.replace('_',' ')} queries",
-                keywords=kws[:30],
-                target_audience="General",
-                estimated_impressions=est_impr,
-                expected_ctr=expected_ctr,
-                asset_suggestions={"headlines": headlines, "descriptions": descriptions, "images": images}
-            ))
-        return {"status": "success", "themes": themes}
+        frame = session.keywords() if session is not None else KeywordFrame.from_items(request.keywords)
+        themes = await _build_pmax_themes(frame, request.theme_tokens)
+        return WireResponse({"status": "success", "themes": themes})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"PMax theme generation failed: {str(e)}")
 
-@apiRouter.post("/calculate_bids", response_model=Dict[str, Any])
+async def _frame_bid_plan(frame: KeywordFrame, sizes: np.ndarray, names: List[str], cpc_ranges: List[Dict[str, float]], budgets: Dict[str, float], conversion_rate: float, **options: Any) -> Dict[str, Any]:
+    with stage_timer("bids"):
+        return await cpu_pool.run(bid_plan, frame, sizes, names, cpc_ranges, budgets, conversion_rate, rows=len(frame), **options)
+
+async def _bid_plan(ad_groups: List[AdGroup], budgets: Dict[str, float], conversion_rate: float, **options: Any) -> Dict[str, Any]:
+    frame = KeywordFrame.from_items([kw for g in ad_groups for kw in g.keywords])
+    sizes = np.fromiter((len(g.keywords) for g in ad_groups), dtype=np.int64, count=len(ad_groups))
+    return await _frame_bid_plan(frame, sizes, [g.name for g in ad_groups], [g.cpc_range for g in ad_groups], budgets, conversion_rate, **options)
+
+async def _session_bid_plan(session: PlanSession, budgets: Dict[str, float], conversion_rate: float, **options: Any) -> Dict[str, Any]:
+    groups = session.ad_groups or []
+    rows = np.concatenate([g["rows"] for g in groups]) if groups else np.zeros(0, dtype=np.int64)
+    sizes = np.fromiter((len(g["rows"]) for g in groups), dtype=np.int64, count=len(groups))
+    return await _frame_bid_plan(session.frame.take(rows), sizes, [g["name"] for g in groups], [g["cpc_range"] for g in groups], budgets, conversion_rate, **options)
+
+@apiRouter.post("/calculate_bids", response_model=BidPlanResponse)
 async def calculate_bids(request: BudgetRequest):
+    session = await _plan_session(request.plan_id) if request.plan_id else None
+    if session is not None and session.ad_groups is None:
+        raise HTTPException(status_code=409, detail=f"Plan {request.plan_id} has no ad groups yet; call /group_keywords with it first")
     try:
-        totalBudget = sum(request.budgets.values())
-        totalConversions = sum(g.estimated_conversions for g in request.ad_groups) or 1
-        targetCpa = totalBudget / totalConversions
-        bidRecs = []
-        for g in request.ad_groups:
-            targetCpc = targetCpa * request.conversion_rate
-            recommendedBid = min(max(targetCpc, g.cpc_range["low"]), g.cpc_range["high"])
-            bidRecs.append({
-                "ad_group_name": g.name,
-                "target_cpa": targetCpa,
-                "target_cpc": targetCpc,
-                "recommended_bid": recommendedBid,
-                "bid_range": g.cpc_range,
-                "estimated_clicks": g.estimated_clicks,
-                "estimated_conversions": g.estimated_conversions
-            })
-        expectedRoas = 4.0
-        return {
-            "status": "success",
-            "budget_allocation": request.budgets,
-            "total_budget": totalBudget,
-            "target_cpa": targetCpa,
-            "expected_roas": expectedRoas,
-            "bid_recommendations": bidRecs,
+        options = {
+            "target_roas": request.target_roas,
+            "conversion_value": request.conversion_value,
+            "include_keyword_bids": bool(request.include_keyword_bids),
+            "curve_points": request.curve_points,
         }
+        if session is not None:
+            return WireResponse({"status": "success", **await _session_bid_plan(session, request.budgets, request.conversion_rate, **options)})
+        return WireResponse({"status": "success", **await _bid_plan(request.ad_groups, request.budgets, request.conversion_rate, **options)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Bid calculation failed: {str(e)}")
+
+@contextmanager
+def _stage_clock(timings: Dict[str, float], stage: str, observe: bool = True) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        if observe:
+            with stage_timer(stage):
+                yield
+        else:
+            yield
+    finally:
+        timings[stage] = round((time.perf_counter() - started) * 1000, 2)
+
+async def _plan_stage(timings: Dict[str, float], stage: str, fn: Callable[..., Any], frame: KeywordFrame, *args: Any, **kwargs: Any) -> Any:
+    with _stage_clock(timings, stage):
+        return await cpu_pool.run(fn, frame, *args, rows=len(frame), **kwargs)
+
+async def _skipped() -> None:
+    return None
+
+async def _run_plan(request: PlanRequest) -> Dict[str, Any]:
+    started = time.perf_counter()
+    timings: Dict[str, float] = {}
+    outputs = set(request.outputs)
+    # the default outputs include bids; with no budgets they are only skipped (explicit requests get a 422)
+    wantBids = "bids" in outputs and bool(request.budgets)
+    wantGroups = "ad_groups" in outputs or wantBids
+    wantThemes = "pmax_themes" in outputs
+    wantFilter = wantGroups or wantThemes or "filtered_keywords" in outputs
+
+    query = _keyword_query(request)
+    with _stage_clock(timings, "fetch"):
+        result = await keyword_strategy.run(query, mode=request.provider_strategy)
+    observe_keywords("provider", len(result.keywords))
+    with _stage_clock(timings, "frame"):
+        frame = variant_collapser.collapse(KeywordFrame.from_rows(result.keywords, brand_tokens=query.brand_tokens))
+    observe_keywords("collapsed", len(frame))
+    with _stage_clock(timings, "score"):
+        scored = frame.head(request.max_results).score()
+    observe_keywords("returned", len(scored))
+    current_span().set_attributes({"seed.count": len(request.seed_keywords), "keyword.count": len(scored), "data_source": result.data_source, "plan.outputs": ",".join(request.outputs)})
+
+    # every later stage works on row indices into scored; keywords become models once, at the end
+    rows = np.zeros(0, dtype=np.int64)
+    if wantFilter:
+        with _stage_clock(timings, "filter"):
+            rows = filter_rows(
+                scored,
+                min_volume=request.min_search_volume,
+                max_competition=request.max_competition,
+                min_opportunity=request.min_opportunity_score,
+                exclude_branded=bool(request.exclude_branded),
+            )
+        observe_keywords("filtered", len(rows))
+    filtered = scored.take(rows)
+
+    # grouping and theme bucketing only share the filtered keywords, so they run side by side
+    specs, themes = await asyncio.gather(
+        _plan_stage(timings, "ad_groups", ad_group_specs, filtered, request.max_group_size or 20, request.similarity_threshold if request.similarity_threshold is not None else 0.5) if wantGroups and len(filtered) else _skipped(),
+        _plan_stage(timings, "pmax_themes", pmax_theme_specs, filtered, request.theme_tokens) if wantThemes and len(filtered) else _skipped(),
+    )
+    specs = specs or []
+    bids = None
+    if wantBids:
+        groupRows = np.concatenate([spec["rows"] for spec in specs]) if specs else np.zeros(0, dtype=np.int64)
+        sizes = np.fromiter((len(spec["rows"]) for spec in specs), dtype=np.int64, count=len(specs))
+        bids = await _plan_stage(
+            timings, "bids", bid_plan, filtered.take(groupRows), sizes,
+            [spec["name"] for spec in specs], [spec["cpc_range"] for spec in specs],
+            request.budgets, request.conversion_rate,
+            target_roas=request.target_roas,
+            conversion_value=request.conversion_value,
+            include_keyword_bids=bool(request.include_keyword_bids),
+            curve_points=request.curve_points,
+        )
+
+    # the session holds what was computed, so follow-up calls (new budgets, regrouping) can send plan_id
+    planId = await plan_sessions.create(
+        scored,
+        selection=rows if wantFilter else None,
+        ad_groups=[{**spec, "rows": rows[spec["rows"]]} for spec in specs] if wantGroups else None,
+    ) if len(scored) else None
+
+    counts = {"returned": len(scored)}
+    if wantFilter:
+        counts["filtered"] = len(filtered)
+    if wantGroups:
+        counts["ad_groups"] = len(specs)
+    plan: Dict[str, Any] = {
+        "status": "success",
+        "plan_id": planId,
+        "data_source": result.data_source if result.keywords else "none",
+        "total_keywords": len(frame),
+        "collapsed_variants": len(result.keywords) - len(frame),
+        "counts": counts,
+    }
+    # _frame_items reports its own serialize metric
+    with _stage_clock(timings, "serialize", observe=False):
+        if "keywords" in outputs:
+            plan["keywords"] = _frame_items(scored)
+        if "filtered_keywords" in outputs:
+            plan["filtered_keywords"] = _frame_items(filtered)
+        if "ad_groups" in outputs:
+            plan["ad_groups"] = _ad_group_models(filtered, specs)
+        if wantThemes:
+            plan["pmax_themes"] = [PMaxTheme(**theme) for theme in themes or []]
+        if "bids" in outputs:
+            plan["bids"] = {"status": "success", **bids} if bids is not None else None
+    timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+    plan.update({"timings_ms": timings, "generated_at": datetime.now().isoformat()})
+    return plan
+
+@apiRouter.post("/plan", response_model=PlanResponse)
+async def build_plan(request: PlanRequest):
+    """Keywords -> filter -> ad groups + PMax themes -> bids in one call, on one keyword frame.
+    Only the stages the requested outputs need are run; timings_ms reports each one.
+    """
+    if "outputs" in request.model_fields_set and "bids" in request.outputs and not request.budgets:
+        raise HTTPException(status_code=422, detail="outputs includes \"bids\" but no budgets were given")
+    try:
+        return WireResponse(await _run_plan(request))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Plan generation failed: {str(e)}")
+
+async def _batch_plan(unit: BatchUnit, results: List[ProviderResult]) -> Dict[str, Any]:
+    job = unit.job
+    plan: Dict[str, Any] = {"job_id": unit.job_id, "location": unit.location}
+    try:
+        brandTokens = KeywordQuery(seed_keywords=[], brand_url=job.get("brand_url"), competitor_url=job.get("competitor_url")).brand_tokens
+        rows: List[Dict[str, Any]] = []
+        seen = set()
+        sources: List[str] = []
+        for result in results:
+            if result.keywords and result.data_source not in sources:
+                sources.append(result.data_source)
+            for row in result.keywords:
+                key = (row.get("keyword") or "").strip().lower()
+                if not key or key in seen:
+                    continue
+                # seeds are fetched brand-free and shared across jobs; DataForSEO rows get the same brand exclusion a single request applies
+                if result.data_source == "dataforseo_api" and any(tok in key for tok in brandTokens):
+                    continue
+                seen.add(key)
+                rows.append(row)
+
+        observe_keywords("provider", len(rows))
+        with stage_timer("frame"):
+            frame = variant_collapser.collapse(KeywordFrame.from_rows(rows, brand_tokens=brandTokens)).score()
+        observe_keywords("collapsed", len(frame))
+        filtered = frame.filter(
+            min_volume=job.get("min_search_volume", 500),
+            max_competition=job.get("max_competition"),
+            min_opportunity=job.get("min_opportunity_score"),
+            exclude_branded=bool(job.get("exclude_branded")),
+        ).sort_by_opportunity().head(job.get("max_results"))
+        observe_keywords("filtered", len(filtered))
+        adGroups = await _build_ad_groups(filtered, max_group_size=job.get("max_group_size") or 20)
+        plan.update({
+            "status": "success",
+            "data_source": ",".join(sources) or "none",
+            "total_keywords": len(frame),
+            "keywords": _frame_items(filtered),
+            "ad_groups": adGroups,
+            "pmax_themes": await _build_pmax_themes(filtered),
+            "bids": await _bid_plan(adGroups, job["budgets"], job.get("conversion_rate", 0.02), target_roas=job.get("target_roas", 4.0), conversion_value=job.get("conversion_value")) if job.get("budgets") else None,
+        })
+    except Exception as e:
+        plan.update({"status": "error", "error": f"Plan generation failed: {str(e)}"})
+    return plan
+
+@apiRouter.post("/batch_plan", response_model=BatchPlanResponse)
+async def batch_plan(request: BatchPlanRequest):
+    """Full plans (keywords, ad groups, PMax themes, bids) for many jobs in one call.
+    Every job gets one plan per location; each job's seeds are fetched in provider-sized batches, and identical batches across jobs once.
+    """
+    try:
+        units = batch_planner.units([job.model_dump() for job in request.jobs])
+        current_span().set_attributes({"batch.jobs": len(request.jobs), "batch.units": len(units), "batch.fetch_calls": batch_planner.fetch_counts(units)["calls"]})
+        order = {id(u): i for i, u in enumerate(units)}
+        plans: List[Any] = [None] * len(units)
+        async with aclosing(batch_planner.run(units, _batch_plan, mode=request.provider_strategy)) as finished:
+            async for unit, plan in finished:
+                plans[order[id(unit)]] = plan
+        return WireResponse({
+            "status": "success",
+            "plans": plans,
+            "fetches": batch_planner.fetch_counts(units),
+            "generated_at": datetime.now().isoformat(),
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch planning failed: {str(e)}")
+
+async def _batch_frames(request: BatchPlanRequest, fmt: str) -> AsyncIterator[bytes]:
+    try:
+        units = batch_planner.units([job.model_dump() for job in request.jobs])
+        async with aclosing(batch_planner.run(units, _batch_plan, mode=request.provider_strategy)) as finished:
+            async for _, plan in finished:
+                yield _stream_frame(fmt, "plan", plan)
+        yield _stream_frame(fmt, "summary", {
+            "status": "success",
+            "total_plans": len(units),
+            "fetches": batch_planner.fetch_counts(units),
+            "generated_at": datetime.now().isoformat(),
+        })
+    except Exception as e:
+        yield _stream_frame(fmt, "error", {"status": "error", "error": f"Batch planning failed: {str(e)}"})
+
+@apiRouter.post("/batch_plan/stream")
+async def batch_plan_stream(request: BatchPlanRequest, format: str = "ndjson"):
+    """Same as /batch_plan, one "plan" frame per (job, location) as soon as it is ready, then a "summary" frame."""
+    fmt = "sse" if format == "sse" else "ndjson"
+    media_type = "text/event-stream" if fmt == "sse" else "application/x-ndjson"
+    return StreamingResponse(_batch_frames(request, fmt), media_type=media_type, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+async def _batch_plan_job(ctx: JobContext) -> Dict[str, Any]:
+    request = BatchPlanRequest(**ctx.payload)
+    units = batch_planner.units([job.model_dump() for job in request.jobs])
+
+    async def checkpointed(fetch: SeedFetch, mode: Optional[str]) -> ProviderResult:
+        async def fetchRows() -> Dict[str, Any]:
+            return asdict(await batch_planner.fetch_one(fetch, mode))
+        return ProviderResult(**await ctx.checkpoint(f"fetch:{fetch.key}", fetchRows))
+
+    await ctx.stage("fetch")
+    order = {id(u): i for i, u in enumerate(units)}
+    plans: List[Any] = [None] * len(units)
+    async with aclosing(batch_planner.run(units, _batch_plan, mode=request.provider_strategy, fetcher=checkpointed)) as finished:
+        async for unit, plan in finished:
+            plans[order[id(unit)]] = plan
+    await ctx.stage("plan")
+    return to_jsonable({
+        "status": "success",
+        "plans": plans,
+        "fetches": batch_planner.fetch_counts(units),
+        "generated_at": datetime.now().isoformat(),
+    })
+
+async def _generate_keywords_job(ctx: JobContext) -> Dict[str, Any]:
+    request = KeywordRequest(**ctx.payload)
+    query = _keyword_query(request)
+
+    async def fetchRows() -> Dict[str, Any]:
+        return asdict(await keyword_strategy.run(query, mode=request.provider_strategy))
+
+    await ctx.stage("fetch")
+    result = ProviderResult(**await ctx.checkpoint("fetch", fetchRows))
+    await ctx.stage("score")
+    return to_jsonable(await _keyword_response(request, query, result))
+
+job_queue.register("batch_plan", _batch_plan_job)
+job_queue.register("generate_keywords", _generate_keywords_job)
+
+async def _submit(kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        jobId = await job_queue.submit(kind, payload)
+        return {"status": "queued", "job_id": jobId}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Job submission failed: {str(e)}")
+
+@apiRouter.post("/jobs/batch_plan", response_model=Dict[str, Any])
+async def submit_batch_plan(request: BatchPlanRequest):
+    """Queues a /batch_plan request; poll /jobs/{job_id} and fetch /jobs/{job_id}/result."""
+    return await _submit("batch_plan", request.model_dump())
+
+@apiRouter.post("/jobs/generate_keywords", response_model=Dict[str, Any])
+async def submit_generate_keywords(request: KeywordRequest):
+    """Queues a /generate_keywords request."""
+    return await _submit("generate_keywords", request.model_dump())
+
+@apiRouter.get("/jobs/{job_id}", response_model=Dict[str, Any])
+async def job_status(job_id: str):
+    job = await job_queue.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
+
+@apiRouter.get("/jobs/{job_id}/result", response_model=Dict[str, Any])
+async def job_result(job_id: str):
+    job = await job_queue.status(job_id, with_result=True)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    if job["status"] in ("queued", "running"):
+        return WireResponse({"job_id": job_id, "status": job["status"], "stage": job["stage"]}, status_code=202)
+    if job["status"] != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job {job['status']}: {job['error'] or 'no result'}")
+    return WireResponse(job["result"])
+
+@apiRouter.post("/jobs/{job_id}/cancel", response_model=Dict[str, Any])
+async def cancel_job(job_id: str):
+    job = await job_queue.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
+
+@apiRouter.delete("/plans/{plan_id}", response_model=Dict[str, Any])
+async def discard_plan(plan_id: str):
+    """Frees a plan session before it expires."""
+    if not await plan_sessions.discard(plan_id):
+        raise HTTPException(status_code=404, detail=f"Unknown or expired plan: {plan_id}")
+    return {"status": "deleted", "plan_id": plan_id}
@@ -0,0 +1 @@
+# engine package - columnar planning stages, no network calls in here
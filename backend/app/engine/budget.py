@@ -0,0 +1,188 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# share of a keyword's top-of-page clicks still winnable per competition code (Low, Medium, High, Unknown)
+COMPETITION_SHARE = np.array([1.0, 0.8, 0.6, 0.8])
+# a keyword whose high bid is (almost) its low bid still gets this much room to bid up
+MIN_BID_SPREAD = 1.2
+MIN_CPC = 0.05
+BISECT_STEPS = 60
+
+# per budget key: reach (share of search clicks the campaign type can win), cpc (price relative
+# to search bids) and which intents it serves. Rough defaults: shopping only shows on product
+# queries, pmax spreads over every intent at a lower share. Unknown keys plan like search.
+CHANNEL_PROFILES: Dict[str, Dict] = {
+    "search": {"reach": 1.0, "cpc": 1.0, "intents": None},
+    "shopping": {"reach": 0.6, "cpc": 0.7, "intents": ("transactional", "commercial")},
+    "pmax": {"reach": 0.4, "cpc": 0.85, "intents": None},
+}
+
+
+def click_capacity(volume: np.ndarray, competition: np.ndarray, ctr: np.ndarray) -> np.ndarray:
+    """Monthly clicks a keyword yields at its high top-of-page bid."""
+    return volume * ctr * COMPETITION_SHARE[competition]
+
+
+class ResponseCurves:
+    """Spend -> clicks response curve per keyword, all as arrays:
+
+        clicks(s) = capacity * (1 - exp(-s / scale)),  scale = capacity * base_cpc
+
+    The first click costs base_cpc and the marginal cpc at spend s is base_cpc * exp(s / scale),
+    i.e. the bid needed for the next click. Bidding is capped at max_cpc, which caps spend at
+    scale * ln(max_cpc / base_cpc); capacity is set so that the cap yields clicks_at_max.
+    Conversions are conversion_rate * clicks, so the curves are concave and the best split of
+    a budget equalises marginal conversions per dollar across keywords (water-filling).
+    """
+
+    __slots__ = ("base_cpc", "max_cpc", "capacity", "scale", "max_spend", "conversion_rate", "_log_peak")
+
+    def __init__(self, clicks_at_max: np.ndarray, base_cpc: np.ndarray, max_cpc: np.ndarray, conversion_rate: float) -> None:
+        base = np.maximum(np.asarray(base_cpc, dtype=np.float64), MIN_CPC)
+        top = np.maximum(np.asarray(max_cpc, dtype=np.float64), base * MIN_BID_SPREAD)
+        self.base_cpc = base
+        self.max_cpc = top
+        self.capacity = np.maximum(np.asarray(clicks_at_max, dtype=np.float64), 0.0) / (1.0 - base / top)
+        scale = self.capacity * base
+        self.max_spend = scale * np.log(top / base)
+        # zero-capacity keywords never get spend; a unit scale just keeps the divisions finite
+        self.scale = np.where(scale > 0, scale, 1.0)
+        self.conversion_rate = max(float(conversion_rate), 1e-9)
+        # log of conversions per dollar for the first dollar spent on each keyword
+        self._log_peak = np.log(self.conversion_rate / base)
+
+    def __len__(self) -> int:
+        return len(self.base_cpc)
+
+    @classmethod
+    def concat(cls, parts: List["ResponseCurves"]) -> "ResponseCurves":
+        out = cls.__new__(cls)
+        for name in ("base_cpc", "max_cpc", "capacity", "scale", "max_spend", "_log_peak"):
+            setattr(out, name, np.concatenate([getattr(p, name) for p in parts]) if parts else np.zeros(0))
+        out.conversion_rate = parts[0].conversion_rate if parts else 1e-9
+        return out
+
+    def spend_at(self, log_lam: float) -> np.ndarray:
+        """Spend per keyword when every keyword is bought down to log_lam marginal conversions per dollar."""
+        return np.clip(self.scale * (self._log_peak - log_lam), 0.0, self.max_spend)
+
+    def clicks(self, spend: np.ndarray) -> np.ndarray:
+        return self.capacity * -np.expm1(-spend / self.scale)
+
+    def conversions(self, spend: np.ndarray) -> np.ndarray:
+        return self.clicks(spend) * self.conversion_rate
+
+    def bids(self, spend: np.ndarray) -> np.ndarray:
+        return np.minimum(self.base_cpc * np.exp(spend / self.scale), self.max_cpc)
+
+    def _log_lam_bounds(self) -> tuple:
+        live = self.max_spend > 0
+        # lowest: every keyword bought up to max_cpc; highest: nothing worth a first dollar
+        return float(np.log(self.conversion_rate / self.max_cpc[live]).min()), float(self._log_peak[live].max())
+
+    def solve(self, budget: float) -> np.ndarray:
+        """Spend per keyword maximising conversions within budget. Bisection on the shared
+        marginal return; each step is one pass over the arrays. Spend stops short of the
+        budget only when every keyword is already at its max bid."""
+        total = float(self.max_spend.sum())
+        if budget <= 0 or total <= 0:
+            return np.zeros(len(self))
+        if budget >= total:
+            return self.max_spend.copy()
+        lo, hi = self._log_lam_bounds()
+        for _ in range(BISECT_STEPS):
+            mid = (lo + hi) / 2
+            spent = float(self.spend_at(mid).sum())
+            if spent > budget:
+                lo = mid
+            else:
+                hi = mid
+            if budget - spent <= budget * 1e-6 and spent <= budget:
+                break
+        return self.spend_at(hi)
+
+    def frontier(self, points: int = 20) -> List[Dict[str, float]]:
+        """The spend -> conversions curve of optimal plans, from the first dollar up to every
+        keyword at its max bid. marginal_cpa is the cost of the last conversion bought."""
+        if len(self) == 0 or float(self.max_spend.sum()) <= 0 or points < 2:
+            return []
+        lo, hi = self._log_lam_bounds()
+        curve = []
+        for log_lam in np.linspace(hi, lo, points):
+            spend = self.spend_at(log_lam)
+            clicks = self.clicks(spend)
+            curve.append({
+                "spend": round(float(spend.sum()), 2),
+                "clicks": round(float(clicks.sum()), 1),
+                "conversions": round(float(clicks.sum()) * self.conversion_rate, 2),
+                "marginal_cpa": round(float(np.exp(-log_lam)), 2),
+            })
+        return curve
+
+
+class ChannelAllocation:
+    __slots__ = ("channel", "budget", "curves", "spend")
+
+    def __init__(self, channel: str, budget: float, curves: ResponseCurves, spend: np.ndarray) -> None:
+        self.channel = channel
+        self.budget = budget
+        self.curves = curves
+        self.spend = spend
+
+    @property
+    def clicks(self) -> np.ndarray:
+        return self.curves.clicks(self.spend)
+
+    @property
+    def conversions(self) -> np.ndarray:
+        return self.curves.conversions(self.spend)
+
+    @property
+    def bids(self) -> np.ndarray:
+        return self.curves.bids(self.spend)
+
+
+class BudgetPlan:
+    """Per-channel keyword spend for the requested budgets, the split the same total would
+    get if channels could trade budget, and the spend -> conversions frontier."""
+
+    __slots__ = ("channels", "suggested", "frontier")
+
+    def __init__(self, channels: List[ChannelAllocation], suggested: Dict[str, float], frontier: List[Dict[str, float]]) -> None:
+        self.channels = channels
+        self.suggested = suggested
+        self.frontier = frontier
+
+
+def channel_curves(channel: str, clicks_at_max: np.ndarray, base_cpc: np.ndarray, max_cpc: np.ndarray, intent: np.ndarray, conversion_rate: float) -> ResponseCurves:
+    profile = CHANNEL_PROFILES.get(channel, CHANNEL_PROFILES["search"])
+    reach = clicks_at_max * profile["reach"]
+    if profile["intents"] is not None:
+        reach = np.where(np.isin(intent, profile["intents"]), reach, 0.0)
+    return ResponseCurves(reach, base_cpc * profile["cpc"], max_cpc * profile["cpc"], conversion_rate)
+
+
+def allocate_budgets(budgets: Dict[str, float], clicks_at_max: np.ndarray, base_cpc: np.ndarray, max_cpc: np.ndarray, intent: np.ndarray, conversion_rate: float, curve_points: int = 20) -> BudgetPlan:
+    """Splits each budget across the keywords its channel can serve. Channels compete for
+    the same queries only through their reach shares, so each budget is solved on its own;
+    the suggested split and the frontier come from one joint solve over all channels."""
+    channels: List[ChannelAllocation] = []
+    for channel, budget in budgets.items():
+        curves = channel_curves(channel, clicks_at_max, base_cpc, max_cpc, intent, conversion_rate)
+        channels.append(ChannelAllocation(channel, float(budget or 0.0), curves, curves.solve(float(budget or 0.0))))
+
+    joint = ResponseCurves.concat([c.curves for c in channels])
+    total = sum(c.budget for c in channels)
+    spend = joint.solve(total)
+    n = len(clicks_at_max)
+    suggested = {c.channel: round(float(spend[i * n:(i + 1) * n].sum()), 2) for i, c in enumerate(channels)}
+    return BudgetPlan(channels, suggested, joint.frontier(curve_points))
+
+
+def reference_cpa(base_cpc: np.ndarray, conversion_rate: float, weights: Optional[np.ndarray] = None) -> float:
+    """CPA of buying only the cheapest clicks; used to value conversions when no value is given."""
+    if len(base_cpc) == 0:
+        return 0.0
+    cpc = float(np.average(np.maximum(base_cpc, MIN_CPC), weights=weights if weights is not None and weights.sum() > 0 else None))
+    return cpc / max(conversion_rate, 1e-9)
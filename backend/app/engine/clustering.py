@@ -0,0 +1,96 @@
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .keyword_frame import KeywordFrame
+from .minhash import minhash_signatures, lsh_candidate_pairs, estimated_similarity, connected_components
+
+STOPWORDS = {"a", "an", "the", "for", "to", "of", "in", "on", "and", "or", "with", "my", "your", "at", "by", "from", "is", "are"}
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# ad groups come out grouped by intent in this order
+INTENT_ORDER = ["navigational", "transactional", "commercial", "informational"]
+
+
+def keyword_tokens(keyword: str) -> List[str]:
+    tokens = [t for t in _TOKEN.findall(keyword.lower()) if t not in STOPWORDS]
+    return tokens or [keyword.lower().strip()]
+
+
+def _features(tokens: List[str]) -> List[str]:
+    # unigrams + bigrams, so word order carries some weight
+    return list(dict.fromkeys(tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]))
+
+
+class KeywordCluster:
+    __slots__ = ("name", "intent", "rows")
+
+    def __init__(self, name: str, intent: str, rows: np.ndarray) -> None:
+        self.name = name
+        self.intent = intent
+        self.rows = rows
+
+
+def _split(rows: np.ndarray, volume: np.ndarray, max_size: int) -> List[np.ndarray]:
+    # biggest keywords first, then cut into max_size pieces
+    ordered = rows[np.lexsort((rows, -volume[rows]))]
+    return [ordered[i:i + max_size] for i in range(0, len(ordered), max_size)]
+
+
+def _cluster_name(features: List[List[str]], rows: np.ndarray, df: Counter) -> str:
+    # most shared unigram/bigram among members; ties prefer the bigram, then the rarer
+    # feature overall, then alphabetical
+    counts = Counter(f for r in rows.tolist() for f in features[r])
+    best = min(counts.items(), key=lambda kv: (-kv[1], -kv[0].count(" "), df[kv[0]], kv[0]))[0]
+    return best.title()
+
+
+def cluster_keywords(frame: KeywordFrame, max_group_size: int = 20, threshold: float = 0.5, num_perm: int = 64, bands: int = 16) -> List[KeywordCluster]:
+    """Token/bigram overlap clustering that scales near-linearly.
+    1. MinHash signatures over unigram+bigram sets
+    2. LSH banding for candidate pairs, kept if estimated Jaccard >= threshold
+    3. union-find (vectorized) over the surviving pairs, within each intent
+    4. leftover singletons grouped by their most common token
+    5. anything larger than max_group_size split by volume
+    Output order is deterministic: intent order, then total volume, then name.
+    """
+    n = len(frame)
+    if n == 0:
+        return []
+    max_group_size = max(1, max_group_size)
+    tokens = [keyword_tokens(k) for k in frame.keyword.tolist()]
+    features = [_features(t) for t in tokens]
+    df = Counter(f for feats in features for f in feats)
+
+    sig = minhash_signatures(features, num_perm=num_perm)
+    u, v = lsh_candidate_pairs(sig, bands=bands, rows=num_perm // bands)
+    # never merge across intents (brand terms stay out of category groups)
+    keep = (frame.intent[u] == frame.intent[v]) & (estimated_similarity(sig, u, v) >= threshold) if len(u) else np.zeros(0, dtype=bool)
+    labels = connected_components(n, u[keep], v[keep])
+
+    sizes = np.bincount(labels, minlength=n)
+    singles = np.flatnonzero(sizes[labels] == 1)
+    groups: Dict[Tuple[str, object], List[int]] = {}
+    for r in np.flatnonzero(sizes[labels] > 1).tolist():
+        groups.setdefault((frame.intent[r], int(labels[r])), []).append(r)
+    for r in singles.tolist():
+        # most common token across the plan is the broadest theme this keyword belongs to
+        head = min(tokens[r], key=lambda t: (-df[t], t))
+        groups.setdefault((frame.intent[r], head), []).append(r)
+
+    clusters: List[KeywordCluster] = []
+    for (intent, _), rows in groups.items():
+        for part in _split(np.asarray(rows, dtype=np.int64), frame.volume, max_group_size):
+            clusters.append(KeywordCluster(_cluster_name(features, part, df), intent, part))
+
+    intent_rank = {name: i for i, name in enumerate(INTENT_ORDER)}
+    clusters.sort(key=lambda c: (intent_rank.get(c.intent, len(INTENT_ORDER)), -int(frame.volume[c.rows].sum()), c.name, int(c.rows.min())))
+    # disambiguate repeated names (split clusters, shared head tokens)
+    seen: Counter = Counter()
+    for c in clusters:
+        seen[c.name] += 1
+        if seen[c.name] > 1:
+            c.name = f"{c.name} {seen[c.name]}"
+    return clusters
@@ -0,0 +1,207 @@
+import re
+from collections import Counter
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from ..config import get_env
+from .keyword_frame import KeywordFrame, UNKNOWN
+from .minhash import minhash_signatures, lsh_candidate_pairs, estimated_similarity, connected_components
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_DIGITS = re.compile(r"\d+")
+VOLUME_MODES = ("max", "sum")
+# narrower than clustering.STOPWORDS: prepositions carry meaning in a variant key
+STOPWORDS = {"a", "an", "the", "for", "of", "and", "or", "my", "your", "is", "are"}
+# direction / relation words: "flights to paris" is not "flights from paris", and with one of
+# these in the keyword the word order matters too ("paris to london" vs "london to paris")
+ORDERED_WORDS = {"to", "from", "in", "on", "at", "by", "into", "via", "near", "over", "under", "without", "than"}
+# words the suffix rules get wrong: singular forms ending in s, and irregular plurals
+_STEMS = {
+    "news": "news", "lens": "lens", "does": "does", "goes": "goes", "glasses": "glasses",
+    "opens": "opens", "series": "series", "species": "species", "means": "means", "goods": "goods",
+    "clothes": "clothes", "pants": "pants", "jeans": "jeans", "shorts": "shorts", "sales": "sales",
+    "physics": "physics", "economics": "economics", "politics": "politics", "athletics": "athletics",
+    "children": "child", "feet": "foot", "teeth": "tooth", "mice": "mouse", "knives": "knife",
+}
+
+
+def _stem(token: str) -> str:
+    # plurals only - anything heavier starts merging different products
+    if token in _STEMS:
+        return _STEMS[token]
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 4 and token.endswith(("ches", "shes", "sses", "xes", "zes")):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def _variant_tokens(keyword: str) -> List[str]:
+    lowered = keyword.lower().replace("'", "").replace("’", "")
+    return [_stem(t) for t in _TOKEN.findall(lowered) if t not in STOPWORDS]
+
+
+def _key(keyword: str, tokens: List[str]) -> str:
+    ordered = tokens if ORDERED_WORDS.intersection(tokens) else sorted(tokens)
+    return " ".join(ordered) or keyword.lower().strip()
+
+
+def canonical_key(keyword: str) -> str:
+    """Case, punctuation, stopword, plural and word-order insensitive form of a keyword:
+    "Boots for Women", "women's boots" and "womens boot" all map to "boot women".
+    Keywords with a direction word keep their order: "paris to london" stays as it is."""
+    return _key(keyword, _variant_tokens(keyword))
+
+
+def _markers(key: str) -> str:
+    # each direction word with the word after it: "to paris", "from london"
+    tokens = key.split()
+    return " ".join(f"{t} {n}" for t, n in zip(tokens, tokens[1:] + [""]) if t in ORDERED_WORDS)
+
+
+# audience / segment words: one of these differing between two keywords is never a typo
+SEGMENT_WORDS = {
+    "men", "mens", "man", "women", "womens", "woman", "ladies", "lady", "kid", "kids", "child", "adult",
+    "boy", "boys", "girl", "girls", "baby", "toddler", "teen", "senior", "unisex", "male", "female",
+}
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    # Levenshtein, giving up (limit + 1) once every cell of a row is past the limit
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _same_tokens(a: Sequence[str], b: Sequence[str], seen: Counter) -> bool:
+    """True if two token lists differ only by spacing ("t shirt" / "tshirt") or by a typo
+    inside one token. A differing token that is a word in its own right - a segment word, or
+    one seen in other keywords of the batch - keeps the pair apart (men / women)."""
+    left, right = Counter(a), Counter(b)
+    da = [t for t in a if left[t] > right[t]]
+    db = [t for t in b if right[t] > left[t]]
+    if "".join(da) == "".join(db):
+        return True
+    if len(da) != 1 or len(db) != 1:
+        return False
+    x, y = da[0], db[0]
+    if x in SEGMENT_WORDS or y in SEGMENT_WORDS or min(len(x), len(y)) < 4:
+        return False
+    # a typo is rare; when both spellings recur they are different words
+    if seen[x] > 1 and seen[y] > 1:
+        return False
+    limit = 1 if max(len(x), len(y)) < 8 else 2
+    return _edit_distance(x, y, limit) <= limit
+
+
+def _trigrams(text: str) -> List[str]:
+    text = f" {text} "
+    return [text[i:i + 3] for i in range(len(text) - 2)]
+
+
+class VariantCollapser:
+    """Folds close keyword variants into one canonical row before scoring.
+    1. exact collapse on canonical_key (token sort, light stemming, punctuation/case)
+    2. MinHash/LSH over character trigrams of the space-free keys finds candidate spacing
+       and spelling variants ("tshirt" / "t shirt"); pairs must share intent, numbers and
+       direction words with their objects ("to paris"), and then the same tokens up to
+       spacing or one typo (_same_tokens), so "boots for men" never meets "boots for women"
+    Each group keeps its highest-volume member's text, source and competition;
+    volume is the max (planners report one figure for close variants) or the sum.
+    Low bid is the lowest non-zero bid, high bid the highest.
+    """
+
+    def __init__(self, enabled: bool = True, threshold: float = 0.8, volume: str = "max", num_perm: int = 32, bands: int = 8) -> None:
+        self.enabled = enabled
+        self.threshold = threshold
+        self.volume = volume if volume in VOLUME_MODES else "max"
+        self.num_perm = num_perm
+        self.bands = bands
+
+    def group_ids(self, frame: KeywordFrame) -> np.ndarray:
+        """Group id per row; ids are numbered in order of first appearance."""
+        n = len(frame)
+        keys: Dict[str, int] = {}
+        # first member's tokens in their original order; spaces dropped for the trigrams: "t shirt printing" -> "tshirtprinting"
+        token_lists: List[List[str]] = []
+        compact: List[str] = []
+        exact = np.empty(n, dtype=np.int64)
+        for i, keyword in enumerate(frame.keyword.tolist()):
+            tokens = _variant_tokens(keyword)
+            key = _key(keyword, tokens)
+            idx = keys.get(key)
+            if idx is None:
+                idx = keys[key] = len(keys)
+                token_lists.append(tokens)
+                compact.append("".join(tokens) or key)
+            exact[i] = idx
+        unique = list(keys)
+        m = len(unique)
+        labels = np.arange(m, dtype=np.int64)
+        if m > 1 and self.threshold < 1.0:
+            first = np.full(m, n, dtype=np.int64)
+            np.minimum.at(first, exact, np.arange(n))
+            intent = frame.intent[first]
+            lengths = np.fromiter((len(c) for c in compact), dtype=np.int64, count=m)
+            digits = np.array([" ".join(_DIGITS.findall(k)) for k in unique], dtype=object)
+            markers = np.array([_markers(k) for k in unique], dtype=object)
+            sig = minhash_signatures([_trigrams(c) for c in compact], num_perm=self.num_perm)
+            u, v = lsh_candidate_pairs(sig, bands=self.bands, rows=self.num_perm // self.bands)
+            if len(u):
+                keep = (intent[u] == intent[v]) & (digits[u] == digits[v]) & (markers[u] == markers[v]) & (np.abs(lengths[u] - lengths[v]) <= 2)
+                u, v = u[keep], v[keep]
+                keep = estimated_similarity(sig, u, v) >= self.threshold
+                u, v = u[keep], v[keep]
+                seen = Counter(t for tokens in token_lists for t in set(tokens))
+                keep = np.fromiter((_same_tokens(token_lists[a], token_lists[b], seen) for a, b in zip(u.tolist(), v.tolist())), dtype=bool, count=len(u))
+                labels = connected_components(m, u[keep], v[keep])
+        _, groups = np.unique(labels[exact], return_inverse=True)
+        # renumber by first appearance so provider order survives
+        first_seen = np.full(groups.max() + 1, n, dtype=np.int64)
+        np.minimum.at(first_seen, groups, np.arange(n))
+        rank = np.empty_like(first_seen)
+        rank[np.argsort(first_seen, kind="stable")] = np.arange(len(first_seen))
+        return rank[groups]
+
+    def collapse(self, frame: KeywordFrame) -> KeywordFrame:
+        if not self.enabled or len(frame) < 2:
+            return frame
+        groups = self.group_ids(frame)
+        count = int(groups.max()) + 1
+        if count == len(frame):
+            return frame
+        # representative: highest volume, then earliest row
+        order = np.lexsort((np.arange(len(frame)), -frame.volume, groups))
+        starts = np.flatnonzero(np.concatenate(([True], groups[order][1:] != groups[order][:-1])))
+        merged = frame.take(order[starts])
+
+        volume = frame.volume[order]
+        merged.volume = np.add.reduceat(volume, starts) if self.volume == "sum" else np.maximum.reduceat(volume, starts)
+        low = frame.bid_low[order]
+        merged.bid_low = np.minimum.reduceat(np.where(low > 0, low, np.inf), starts)
+        merged.bid_low[np.isinf(merged.bid_low)] = 0.0
+        merged.bid_high = np.maximum.reduceat(frame.bid_high[order], starts)
+        # an Unknown representative takes the strongest known competition in its group
+        comp = frame.competition[order]
+        known = np.maximum.reduceat(np.where(comp == UNKNOWN, -1, comp), starts)
+        fill = (merged.competition == UNKNOWN) & (known >= 0)
+        merged.competition[fill] = known[fill]
+        return merged
+
+
+variant_collapser = VariantCollapser(
+    enabled=get_env("KEYWORD_DEDUPE_ENABLED", "true").lower() in ("1", "true", "yes"),
+    threshold=float(get_env("KEYWORD_DEDUPE_THRESHOLD", "0.8")),
+    volume=get_env("KEYWORD_DEDUPE_VOLUME", "max"),
+)
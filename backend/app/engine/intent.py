@@ -0,0 +1,145 @@
+from functools import lru_cache
+from itertools import repeat
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+INTENTS = ["navigational", "informational", "commercial", "transactional"]
+# codes double as precedence: a keyword hitting several lexicons takes the lowest code
+NAVIGATIONAL, INFORMATIONAL, COMMERCIAL, TRANSACTIONAL = range(4)
+# no signal at all - most planner keywords are category terms
+DEFAULT_INTENT = COMMERCIAL
+INTENT_NAMES = np.array(INTENTS, dtype=object)
+
+LEXICONS: Dict[int, List[str]] = {
+    NAVIGATIONAL: ["login", "log in", "sign in", "signin", "sign up", "account", "official site", "official website", "website", "homepage", "customer service", "phone number", "contact"],
+    INFORMATIONAL: ["how", "what", "why", "when", "where", "who", "which", "guide", "tutorial", "tips", "ideas", "meaning", "definition", "examples", "learn", "history", "diy", "?"],
+    COMMERCIAL: ["best", "top", "review", "reviews", "vs", "versus", "compare", "comparison", "alternative", "alternatives", "rated", "recommended"],
+    TRANSACTIONAL: ["buy", "purchase", "order", "price", "prices", "pricing", "cost", "cheap", "discount", "deal", "deals", "coupon", "promo code", "sale", "for sale", "shop", "near me", "delivery", "free shipping", "quote", "hire", "booking", "subscription", "rent"],
+}
+# yes/no questions only count as the first word ("is it worth", "can i")
+QUESTION_STARTS = ["is", "are", "can", "does", "do", "should", "will", "could", "would"]
+
+# per-token flags; the low bits hold intent code + 1 (0 = no intent)
+_INTENT_MASK = 0x7
+_QUESTION = 0x8
+_PHRASE_HEAD = 0x10
+_ROW_BREAK = 0x20
+_NO_HIT = 0x7
+
+# ascii lowercase; punctuation, whitespace and control bytes become spaces. Kept as-is:
+# digits, letters, utf-8 multibyte sequences, "?" and the \x01 row separator
+_TRANSLATE = bytes(
+    b + 32 if 65 <= b <= 90
+    else b if (48 <= b <= 57 or 97 <= b <= 122 or b >= 128 or b in (0x01, 0x3F))
+    else 32
+    for b in range(256)
+)
+_SEPARATOR = " \x01 "
+
+
+def _normalize(text: str) -> bytes:
+    return text.encode("utf-8", "replace").translate(_TRANSLATE).replace(b"?", b" ? ")
+
+
+def _brand_phrases(brand_tokens: Iterable[str]) -> List[str]:
+    # hostname parts: "home-depot" is searched as "home depot"; 1-2 letter parts ("co", "uk") are noise
+    phrases = {t.lower().replace("-", " ").strip() for t in brand_tokens}
+    return sorted(p for p in phrases if len(p) >= 3)
+
+
+class IntentClassifier:
+    """Rule-based intent over whole keyword arrays, with no Python loop per keyword.
+    - the column is joined with a row separator, lowercased and normalised in one bytes pass
+    - one split() and one dict lookup per token map the text to vocabulary ids
+    - one segmented min (np.minimum.reduceat) between separators keeps the strongest hit per row
+    - multi-word terms (brand names, "near me") are checked only where their first word occurs
+    """
+
+    def __init__(self, brand_tokens: Tuple[str, ...] = ()) -> None:
+        words: Dict[bytes, int] = {b"\x01": _ROW_BREAK}
+        # (words, intent code) per multi-word term
+        phrases: List[Tuple[List[bytes], int]] = []
+        terms = [(term, code) for code in range(len(INTENTS)) for term in LEXICONS[code]]
+        terms += [(brand, NAVIGATIONAL) for brand in _brand_phrases(brand_tokens)]
+        for term, code in terms:
+            parts = _normalize(term).split()
+            if len(parts) == 1:
+                flags = words.get(parts[0], 0)
+                current = (flags & _INTENT_MASK) or _NO_HIT
+                words[parts[0]] = (flags & ~_INTENT_MASK) | min(current, code + 1)
+            elif parts:
+                words[parts[0]] = words.get(parts[0], 0) | _PHRASE_HEAD
+                for part in parts[1:]:
+                    words.setdefault(part, 0)
+                phrases.append((parts, code))
+        for word in QUESTION_STARTS:
+            words[word.encode()] = words.get(word.encode(), 0) | _QUESTION
+
+        vocab = list(words)
+        self._index = {w: i for i, w in enumerate(vocab)}
+        flags = np.array([words[w] for w in vocab] + [0], dtype=np.int16)
+        # per vocabulary id (the extra last id is "not in any lexicon")
+        self._codes = np.where(flags & _INTENT_MASK, flags & _INTENT_MASK, _NO_HIT).astype(np.int8)
+        self._is_question = (flags & _QUESTION) != 0
+        self._is_head = (flags & _PHRASE_HEAD) != 0
+        self._break_id = self._index[b"\x01"]
+        self._missing_id = len(vocab)
+        self._phrase_ids = [([self._index[p] for p in parts], code) for parts, code in phrases]
+        self._phrase_len = max((len(parts) for parts, _ in phrases), default=0)
+
+    def _token_ids(self, data: bytes) -> np.ndarray:
+        """Vocabulary id per token (len(vocab) if the token is in no lexicon)."""
+        tokens = data.split()
+        # map() keeps the per-token dict lookup in C; whole tokens are compared, whatever their length
+        return np.fromiter(map(self._index.get, tokens, repeat(self._missing_id)), dtype=np.int64, count=len(tokens))
+
+    def classify_codes(self, keywords: List[str]) -> np.ndarray:
+        n = len(keywords)
+        if not n:
+            return np.zeros(0, dtype=np.int8)
+        text = _SEPARATOR.join(keywords)
+        if text.count("\x01") != n - 1:
+            # a stray separator byte inside a keyword would shift the row ids
+            text = _SEPARATOR.join(k.replace("\x01", " ") for k in keywords)
+        ids = self._token_ids(_normalize(text))
+        breaks = np.flatnonzero(ids == self._break_id)
+        # strongest code per token, then one segmented min per row. Each row's segment
+        # opens on its separator (a sentinel for row 0), so empty keywords still get one
+        codes = np.concatenate(([_NO_HIT], self._codes[ids]))
+        segments = np.concatenate(([0], breaks + 1))
+
+        first = segments[segments < len(ids)]
+        question = first[self._is_question[ids[first]]]
+        codes[question + 1] = np.minimum(codes[question + 1], INFORMATIONAL + 1)
+
+        heads = np.flatnonzero(self._is_head[ids])
+        if len(heads):
+            padded = np.concatenate((ids, np.full(self._phrase_len, self._missing_id)))
+            head_ids = ids[heads]
+            for parts, code in self._phrase_ids:
+                at = heads[head_ids == parts[0]]
+                for offset, part in enumerate(parts[1:], start=1):
+                    at = at[padded[at + offset] == part]
+                codes[at + 1] = np.minimum(codes[at + 1], code + 1)
+
+        best = np.minimum.reduceat(codes, segments)
+        return np.where(best == _NO_HIT, DEFAULT_INTENT, best - 1).astype(np.int8)
+
+    def classify(self, keywords: List[str]) -> np.ndarray:
+        """Intent name per keyword (object array)."""
+        return INTENT_NAMES[self.classify_codes(keywords)]
+
+
+@lru_cache(maxsize=64)
+def _compiled(brand_tokens: Tuple[str, ...]) -> IntentClassifier:
+    return IntentClassifier(brand_tokens)
+
+
+def intent_classifier(brand_tokens: Optional[Iterable[str]] = None) -> IntentClassifier:
+    """Cached classifier for a brand token set (see DataForSEOService.brand_tokens)."""
+    return _compiled(tuple(sorted(set(brand_tokens or ()))))
+
+
+def classify_intents(keywords: List[str], brand_tokens: Optional[Iterable[str]] = None) -> np.ndarray:
+    return intent_classifier(brand_tokens).classify(keywords)
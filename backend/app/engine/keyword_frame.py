@@ -0,0 +1,152 @@
+from typing import List, Dict, Any, Iterable, Optional
+
+import numpy as np
+
+from .intent import classify_intents
+
+# competition is carried as a small int code; order doubles as the competition cap ranking
+COMPETITION_LEVELS = ["Low", "Medium", "High", "Unknown"]
+COMPETITION_CODES = {name: code for code, name in enumerate(COMPETITION_LEVELS)}
+UNKNOWN = COMPETITION_CODES["Unknown"]
+# difficulty per competition code (Low, Medium, High, Unknown)
+DIFFICULTY = np.array([0.2, 0.5, 0.8, 0.5])
+
+
+class KeywordFrame:
+    """Columnar keyword set: one NumPy array per field instead of one object per keyword.
+    Scoring, filtering and sorting run as whole-array operations; rows only become dicts
+    (and pydantic models) at the response boundary via to_records().
+    """
+
+    __slots__ = ("keyword", "volume", "competition", "bid_low", "bid_high", "source", "intent", "difficulty", "opportunity")
+
+    def __init__(self, keyword: np.ndarray, volume: np.ndarray, competition: np.ndarray, bid_low: np.ndarray, bid_high: np.ndarray, source: np.ndarray, intent: np.ndarray, difficulty: Optional[np.ndarray] = None, opportunity: Optional[np.ndarray] = None) -> None:
+        self.keyword = keyword
+        self.volume = volume
+        self.competition = competition
+        self.bid_low = bid_low
+        self.bid_high = bid_high
+        self.source = source
+        self.intent = intent
+        self.difficulty = difficulty if difficulty is not None else np.zeros(len(keyword))
+        self.opportunity = opportunity if opportunity is not None else np.zeros(len(keyword))
+
+    def __len__(self) -> int:
+        return len(self.keyword)
+
+    # construction
+
+    @classmethod
+    def empty(cls) -> "KeywordFrame":
+        return cls.from_columns([], [], [], [], [], [], [])
+
+    @classmethod
+    def from_columns(cls, keyword: Iterable[str], volume: Iterable[int], competition: Iterable[str], bid_low: Iterable[float], bid_high: Iterable[float], source: Iterable[str], intent: Iterable[str], difficulty: Optional[Iterable[float]] = None, opportunity: Optional[Iterable[float]] = None) -> "KeywordFrame":
+        codes = COMPETITION_CODES
+        return cls(
+            keyword=np.array(list(keyword), dtype=object),
+            volume=np.fromiter((int(v or 0) for v in volume), dtype=np.int64),
+            competition=np.fromiter((codes.get(c, UNKNOWN) for c in competition), dtype=np.int8),
+            bid_low=np.fromiter((float(b or 0.0) for b in bid_low), dtype=np.float64),
+            bid_high=np.fromiter((float(b or 0.0) for b in bid_high), dtype=np.float64),
+            source=np.array(list(source), dtype=object),
+            intent=np.array(list(intent), dtype=object),
+            difficulty=None if difficulty is None else np.fromiter(difficulty, dtype=np.float64),
+            opportunity=None if opportunity is None else np.fromiter(opportunity, dtype=np.float64),
+        )
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict[str, Any]], brand_tokens: Optional[Iterable[str]] = None) -> "KeywordFrame":
+        """Provider rows (bids in micros) -> unscored frame, intent classified in one pass."""
+        keywords = [r["keyword"] for r in rows]
+        return cls.from_columns(
+            keyword=keywords,
+            volume=(r.get("avg_monthly_searches", 0) for r in rows),
+            competition=(r.get("competition", "Unknown") for r in rows),
+            bid_low=(r.get("low_top_of_page_bid_micros", 0) / 1_000_000 for r in rows),
+            bid_high=(r.get("high_top_of_page_bid_micros", 0) / 1_000_000 for r in rows),
+            source=(r.get("source", "keyword_planner") for r in rows),
+            intent=classify_intents(keywords, brand_tokens),
+        )
+
+    @classmethod
+    def from_items(cls, items: List[Any]) -> "KeywordFrame":
+        """KeywordItem-like objects (already scored) -> frame."""
+        return cls.from_columns(
+            keyword=(k.keyword for k in items),
+            volume=(k.avg_monthly_searches for k in items),
+            competition=(k.competition for k in items),
+            bid_low=(k.top_of_page_bid_low for k in items),
+            bid_high=(k.top_of_page_bid_high for k in items),
+            source=(k.source for k in items),
+            intent=(k.intent for k in items),
+            difficulty=(k.difficulty_score for k in items),
+            opportunity=(k.opportunity_score for k in items),
+        )
+
+    # batch operations
+
+    def score(self) -> "KeywordFrame":
+        """difficulty from competition; opportunity = 0.7 * volume (capped at 20k) + 0.3 * ease."""
+        self.difficulty = DIFFICULTY[self.competition]
+        vol_norm = np.minimum(1.0, self.volume / 20000.0)
+        self.opportunity = np.round(np.clip(0.7 * vol_norm + 0.3 * (1.0 - self.difficulty), 0.0, 1.0), 3)
+        return self
+
+    def filter_mask(self, min_volume: int = 0, max_competition: Optional[str] = None, min_opportunity: Optional[float] = None, exclude_branded: bool = False) -> np.ndarray:
+        mask = self.volume >= min_volume
+        if max_competition and max_competition in COMPETITION_CODES and max_competition != "Unknown":
+            # Unknown competition is never capped out
+            cap = COMPETITION_CODES[max_competition]
+            mask &= (self.competition <= cap) | (self.competition == UNKNOWN)
+        if min_opportunity is not None:
+            mask &= self.opportunity >= min_opportunity
+        if exclude_branded:
+            mask &= self.intent != "navigational"
+        return mask
+
+    def take(self, index: np.ndarray) -> "KeywordFrame":
+        return KeywordFrame(
+            keyword=self.keyword[index],
+            volume=self.volume[index],
+            competition=self.competition[index],
+            bid_low=self.bid_low[index],
+            bid_high=self.bid_high[index],
+            source=self.source[index],
+            intent=self.intent[index],
+            difficulty=self.difficulty[index],
+            opportunity=self.opportunity[index],
+        )
+
+    def head(self, n: Optional[int]) -> "KeywordFrame":
+        return self if n is None or n >= len(self) else self.take(np.arange(max(0, n)))
+
+    def sort_by_opportunity(self) -> "KeywordFrame":
+        # stable, highest first; ties keep their incoming order
+        return self.take(np.argsort(-self.opportunity, kind="stable"))
+
+    def filter(self, **thresholds: Any) -> "KeywordFrame":
+        return self.take(np.flatnonzero(self.filter_mask(**thresholds)))
+
+    # output
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        levels = COMPETITION_LEVELS
+        return [
+            {
+                "keyword": kw,
+                "avg_monthly_searches": vol,
+                "competition": levels[comp],
+                "top_of_page_bid_low": low,
+                "top_of_page_bid_high": high,
+                "source": src,
+                "intent": intent,
+                "difficulty_score": diff,
+                "opportunity_score": opp,
+            }
+            for kw, vol, comp, low, high, src, intent, diff, opp in zip(
+                self.keyword.tolist(), self.volume.tolist(), self.competition.tolist(),
+                self.bid_low.tolist(), self.bid_high.tolist(), self.source.tolist(),
+                self.intent.tolist(), self.difficulty.tolist(), self.opportunity.tolist(),
+            )
+        ]
@@ -0,0 +1,95 @@
+import zlib
+from typing import List, Tuple
+
+import numpy as np
+
+# Mersenne prime for the universal hash family; keeps a * x + b inside int64
+_PRIME = (1 << 31) - 1
+
+
+def minhash_signatures(feature_sets: List[List[str]], num_perm: int = 64, seed: int = 1) -> np.ndarray:
+    """(N, num_perm) MinHash signatures. Features hash via crc32, so signatures are
+    stable across processes and independent of input order. Every row needs >= 1 feature.
+    """
+    n = len(feature_sets)
+    if n == 0:
+        return np.zeros((0, num_perm), dtype=np.int64)
+    vocab: dict = {}
+    flat: List[int] = []
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    for i, feats in enumerate(feature_sets):
+        for f in feats:
+            idx = vocab.get(f)
+            if idx is None:
+                idx = vocab[f] = len(vocab)
+            flat.append(idx)
+        indptr[i + 1] = len(flat)
+    base = np.fromiter((zlib.crc32(f.encode()) for f in vocab), dtype=np.int64, count=len(vocab)) % _PRIME
+    flat_ids = np.asarray(flat, dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _PRIME, size=num_perm, dtype=np.int64)
+    b = rng.integers(0, _PRIME, size=num_perm, dtype=np.int64)
+    sig = np.empty((n, num_perm), dtype=np.int64)
+    step = 8
+    for j in range(0, num_perm, step):
+        # hash the vocabulary once per block of permutations, then min per row
+        hashed = (base[:, None] * a[None, j:j + step] + b[None, j:j + step]) % _PRIME
+        sig[:, j:j + step] = np.minimum.reduceat(hashed[flat_ids], indptr[:-1], axis=0)
+    return sig
+
+
+def lsh_candidate_pairs(sig: np.ndarray, bands: int, rows: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Unique row pairs sharing any band of `rows` hashes. Each bucket contributes a chain
+    of neighbouring pairs (enough for connected components, linear in bucket size)."""
+    us: List[np.ndarray] = []
+    vs: List[np.ndarray] = []
+    mult = np.uint64(0x9E3779B97F4A7C15)
+    for band in range(bands):
+        block = sig[:, band * rows:(band + 1) * rows].astype(np.uint64)
+        key = np.zeros(len(sig), dtype=np.uint64)
+        for col in range(block.shape[1]):
+            key = (key * mult) ^ block[:, col]
+        order = np.argsort(key, kind="stable")
+        sorted_keys = key[order]
+        same = sorted_keys[1:] == sorted_keys[:-1]
+        us.append(order[:-1][same])
+        vs.append(order[1:][same])
+    if not us:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    u = np.concatenate(us)
+    v = np.concatenate(vs)
+    # the same pair usually collides in several bands
+    lo = np.minimum(u, v)
+    hi = np.maximum(u, v)
+    pairs = np.unique(lo * len(sig) + hi)
+    return pairs // len(sig), pairs % len(sig)
+
+
+def estimated_similarity(sig: np.ndarray, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """Estimated Jaccard similarity for each (u, v) pair."""
+    if len(u) == 0:
+        return np.zeros(0)
+    return (sig[u] == sig[v]).mean(axis=1)
+
+
+def connected_components(n: int, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """Union-find over an edge list, done as vectorized min-label propagation with
+    pointer jumping. Each component is labelled with its smallest row index."""
+    labels = np.arange(n, dtype=np.int64)
+    if len(u) == 0:
+        return labels
+    while True:
+        lu = labels[u]
+        lv = labels[v]
+        low = np.minimum(lu, lv)
+        before = labels.copy()
+        np.minimum.at(labels, lu, low)
+        np.minimum.at(labels, lv, low)
+        # pointer jumping until every row points at its root
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+        if np.array_equal(labels, before):
+            return labels
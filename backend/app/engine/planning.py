@@ -0,0 +1,186 @@
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .budget import allocate_budgets, click_capacity, reference_cpa
+from .clustering import cluster_keywords
+from .keyword_frame import KeywordFrame
+from .themes import bucket_themes
+
+# per-intent ad group defaults: fallback cpc range when no bids are known, expected ctr, theme label
+AD_GROUP_PROFILES: Dict[str, Dict[str, Any]] = {
+    "navigational": {"cpc": (1.5, 3.2), "ctr": 0.08, "theme": "Brand searches"},
+    "transactional": {"cpc": (3.2, 8.5), "ctr": 0.05, "theme": "Purchase-ready searches"},
+    "commercial": {"cpc": (3.2, 8.5), "ctr": 0.035, "theme": "Product or service categories"},
+    "informational": {"cpc": (1.2, 3.5), "ctr": 0.02, "theme": "Educational queries"},
+}
+GROUP_CONVERSION_RATE = 0.02
+
+# Stages take frames / arrays / plain dicts and return plain data, so they run the same inline
+# or in a pool worker (services.cpu_pool); the API layer builds the response models.
+
+
+def filter_rows(frame: KeywordFrame, **thresholds: Any) -> np.ndarray:
+    """Rows passing frame.filter_mask, highest opportunity first (stable)."""
+    rows = np.flatnonzero(frame.filter_mask(**thresholds))
+    return rows[np.argsort(-frame.opportunity[rows], kind="stable")]
+
+
+def ad_group_specs(frame: KeywordFrame, max_group_size: int = 20, similarity_threshold: float = 0.5) -> List[Dict[str, Any]]:
+    """AdGroup fields with the keywords left as rows of frame; plan sessions store these."""
+    specs: List[Dict[str, Any]] = []
+    for cluster in cluster_keywords(frame, max_group_size=max_group_size, threshold=similarity_threshold):
+        profile = AD_GROUP_PROFILES.get(cluster.intent, AD_GROUP_PROFILES["commercial"])
+        members = frame.take(cluster.rows)
+        texts = members.keyword.tolist()
+        # members arrive sorted by volume, so the head of the list is the exact-match shortlist
+        if cluster.intent == "navigational":
+            match_types = {"exact": texts, "phrase": texts, "bmm": []}
+        elif cluster.intent == "informational":
+            match_types = {"exact": [], "phrase": texts, "bmm": texts}
+        else:
+            match_types = {"exact": texts[:5], "phrase": texts, "bmm": texts}
+        lows = members.bid_low[members.bid_low > 0]
+        highs = members.bid_high[members.bid_high > 0]
+        low = round(float(lows.mean()), 2) if len(lows) else profile["cpc"][0]
+        high = round(float(highs.mean()), 2) if len(highs) else profile["cpc"][1]
+        high = max(high, low)
+        clicks = int(members.volume.sum() * profile["ctr"])
+        specs.append({
+            "name": cluster.name,
+            "theme": f"{profile['theme']}: {cluster.name.lower()}",
+            "rows": cluster.rows,
+            "suggested_match_types": match_types,
+            "cpc_range": {"low": low, "high": high},
+            "estimated_clicks": clicks,
+            "estimated_conversions": round(clicks * GROUP_CONVERSION_RATE, 2),
+            "target_cpa": round(((low + high) / 2) / GROUP_CONVERSION_RATE, 2),
+        })
+    return specs
+
+
+def pmax_theme_specs(frame: KeywordFrame, theme_tokens: Optional[Dict[str, List[str]]] = None) -> List[Dict[str, Any]]:
+    themes: List[Dict[str, Any]] = []
+    for cat, rows, volume in bucket_themes(frame, theme_tokens):
+        kws = frame.keyword[rows[:30]].tolist()
+        # basic assets
+        top_keywords = kws[:6]
+        headlines = [f"Shop {k[:30].title()}" for k in top_keywords[:3]] + ["Fast Shipping", "Great Prices"]
+        descriptions = [
+            "Discover quality picks with fast delivery.",
+            "Save time and get better results with our selection.",
+        ]
+        images: List[str] = []
+        themes.append({
+            "title": f"{cat.title()} Theme",
+            "category": cat,
+            "description": f"Asset group centered on {cat.replace('_',' ')} queries",
+            "keywords": kws,
+            "target_audience": "General",
+            "estimated_impressions": int(volume * 1.5),
+            "expected_ctr": 0.02 if cat != "seasonal" else 0.03,
+            "asset_suggestions": {"headlines": headlines, "descriptions": descriptions, "images": images},
+        })
+    return themes
+
+
+def budget_curve_inputs(frame: KeywordFrame, sizes: np.ndarray, cpc_ranges: List[Dict[str, float]]) -> Dict[str, Any]:
+    """The optimizer's arrays for ad groups laid out back to back in frame (sizes[i] rows
+    each). Keywords without planner bids fall back to their ad group's cpc range."""
+    group = np.repeat(np.arange(len(sizes)), sizes)
+    group_low = np.fromiter((r.get("low", 0.0) for r in cpc_ranges), dtype=np.float64, count=len(cpc_ranges))
+    group_high = np.fromiter((r.get("high", 0.0) for r in cpc_ranges), dtype=np.float64, count=len(cpc_ranges))
+    ctr = np.fromiter((AD_GROUP_PROFILES.get(i, AD_GROUP_PROFILES["commercial"])["ctr"] for i in frame.intent), dtype=np.float64, count=len(frame))
+    return {
+        "group": group,
+        "clicks_at_max": click_capacity(frame.volume, frame.competition, ctr),
+        "base_cpc": np.where(frame.bid_low > 0, frame.bid_low, group_low[group]),
+        "max_cpc": np.where(frame.bid_high > 0, frame.bid_high, group_high[group]),
+    }
+
+
+def bid_plan(frame: KeywordFrame, sizes: np.ndarray, names: List[str], cpc_ranges: List[Dict[str, float]], budgets: Dict[str, float], conversion_rate: float, target_roas: Optional[float] = 4.0, conversion_value: Optional[float] = None, include_keyword_bids: bool = False, curve_points: int = 20) -> Dict[str, Any]:
+    """Optimised split of each budget over ad groups and keywords (engine.budget).
+    Without conversion_value, a conversion is valued so that the cheapest clicks would just
+    meet target_roas; expected_roas then measures the plan against that."""
+    inputs = budget_curve_inputs(frame, sizes, cpc_ranges)
+    group = inputs["group"]
+    plan = allocate_budgets(budgets, inputs["clicks_at_max"], inputs["base_cpc"], inputs["max_cpc"], frame.intent, conversion_rate, curve_points)
+
+    group_count = len(names)
+
+    def per_group(values: np.ndarray) -> np.ndarray:
+        return np.bincount(group, weights=values, minlength=group_count)
+
+    spend = np.zeros(len(frame))
+    clicks = np.zeros(len(frame))
+    conversions = np.zeros(len(frame))
+    channel_budgets: Dict[str, np.ndarray] = {}
+    channels: Dict[str, Dict[str, float]] = {}
+    for alloc in plan.channels:
+        ch_clicks = alloc.clicks
+        spend += alloc.spend
+        clicks += ch_clicks
+        conversions += ch_clicks * conversion_rate
+        channel_budgets[alloc.channel] = per_group(alloc.spend)
+        ch_spend, ch_conv = float(alloc.spend.sum()), float(ch_clicks.sum()) * conversion_rate
+        channels[alloc.channel] = {
+            "budget": alloc.budget,
+            "spend": round(ch_spend, 2),
+            "clicks": round(float(ch_clicks.sum()), 1),
+            "conversions": round(ch_conv, 2),
+            "cpa": round(ch_spend / ch_conv, 2) if ch_conv else 0.0,
+        }
+
+    # bids come from the search side of the plan (the first channel when there is no search budget)
+    bid_alloc = next((a for a in plan.channels if a.channel == "search"), plan.channels[0] if plan.channels else None)
+    bids = bid_alloc.bids if bid_alloc is not None else inputs["base_cpc"]
+    bid_clicks = bid_alloc.clicks if bid_alloc is not None else np.zeros(len(frame))
+    group_spend, group_clicks, group_conv = per_group(spend), per_group(clicks), per_group(conversions)
+    group_bid_clicks = per_group(bid_clicks)
+    group_bid = per_group(bids * bid_clicks)
+    group_bid_spend = per_group(bid_alloc.spend) if bid_alloc is not None else np.zeros(group_count)
+
+    offsets = np.concatenate(([0], np.cumsum(sizes)))
+    recommendations = []
+    for gi, name in enumerate(names):
+        recommended_bid = group_bid[gi] / group_bid_clicks[gi] if group_bid_clicks[gi] > 0 else cpc_ranges[gi].get("low", 0.0)
+        rec = {
+            "ad_group_name": name,
+            "budget": round(float(group_spend[gi]), 2),
+            "channel_budgets": {ch: round(float(v[gi]), 2) for ch, v in channel_budgets.items()},
+            "target_cpa": round(float(group_spend[gi] / group_conv[gi]), 2) if group_conv[gi] > 0 else 0.0,
+            "target_cpc": round(float(group_bid_spend[gi] / group_bid_clicks[gi]), 2) if group_bid_clicks[gi] > 0 else round(float(recommended_bid), 2),
+            "recommended_bid": round(float(recommended_bid), 2),
+            "bid_range": cpc_ranges[gi],
+            "estimated_clicks": int(round(float(group_clicks[gi]))),
+            "estimated_conversions": round(float(group_conv[gi]), 2),
+        }
+        if include_keyword_bids:
+            rows = slice(offsets[gi], offsets[gi + 1])
+            rec["keyword_bids"] = [
+                {"keyword": kw, "bid": round(float(b), 2), "spend": round(float(s), 2), "clicks": round(float(c), 1), "conversions": round(float(v), 2)}
+                for kw, b, s, c, v in zip(frame.keyword[rows].tolist(), bids[rows], spend[rows], clicks[rows], conversions[rows])
+            ]
+        recommendations.append(rec)
+
+    total_budget = sum(budgets.values())
+    total_spend = float(spend.sum())
+    total_conversions = float(conversions.sum())
+    target_cpa = total_spend / total_conversions if total_conversions else 0.0
+    value = conversion_value if conversion_value else (target_roas or 0.0) * reference_cpa(inputs["base_cpc"], conversion_rate, inputs["clicks_at_max"])
+    expected_roas = total_conversions * value / total_spend if total_spend else 0.0
+    return {
+        "budget_allocation": budgets,
+        "suggested_budget_allocation": plan.suggested,
+        "total_budget": total_budget,
+        "allocated_budget": round(total_spend, 2),
+        "unallocated_budget": round(max(0.0, total_budget - total_spend), 2),
+        "estimated_clicks": int(round(float(clicks.sum()))),
+        "estimated_conversions": round(total_conversions, 2),
+        "target_cpa": round(target_cpa, 2),
+        "expected_roas": round(expected_roas, 2),
+        "channels": channels,
+        "bid_recommendations": recommendations,
+        "spend_curve": plan.frontier,
+    }
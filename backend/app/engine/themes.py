@@ -0,0 +1,87 @@
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .keyword_frame import KeywordFrame
+
+# checked in this order: a keyword matching several lists lands in the first one
+DEFAULT_THEME_TOKENS: Dict[str, List[str]] = {
+    "demographic": ["for men", "for women", "kids", "senior", "student"],
+    "seasonal": ["winter", "summer", "spring", "fall", "black friday", "cyber monday"],
+    "use_case": ["best", "near me", "how to", "vs", "review", "ideas", "tips"],
+}
+FALLBACK_THEME = "product"
+# order themes are returned in
+THEME_ORDER = ["product", "use_case", "demographic", "seasonal"]
+
+
+class ThemeClassifier:
+    """All theme tokens compiled into one regex alternation (longest token first).
+    classify() joins the whole keyword column into one string and scans it once;
+    match offsets map back to rows with a binary search, so cost is linear in the
+    total text length. Same substring semantics as the old any(t in text ...) checks.
+    """
+
+    def __init__(self, tokens: Dict[str, List[str]]) -> None:
+        self.categories: List[str] = list(tokens.keys()) + [FALLBACK_THEME]
+        self._rank: Dict[str, int] = {}
+        for rank, cat in enumerate(tokens.keys()):
+            for tok in tokens[cat]:
+                tok = tok.lower()
+                if tok and tok not in self._rank:
+                    self._rank[tok] = rank
+        alternation = "|".join(re.escape(t) for t in sorted(self._rank, key=len, reverse=True))
+        # zero-width lookahead so overlapping tokens are all seen
+        self._pattern = re.compile(f"(?=({alternation}))") if alternation else None
+
+    def classify(self, keywords: List[str]) -> np.ndarray:
+        """Category index per keyword (len(categories) - 1 means fallback)."""
+        n = len(keywords)
+        ranks = np.full(n, len(self.categories) - 1, dtype=np.int64)
+        if not n or self._pattern is None:
+            return ranks
+        lowered = [k.lower().replace("\n", " ") for k in keywords]
+        text = "\n".join(lowered)
+        lengths = np.fromiter((len(k) + 1 for k in lowered), dtype=np.int64, count=n)
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        rank_of = self._rank
+        matches = [(m.start(), rank_of[m.group(1)]) for m in self._pattern.finditer(text)]
+        if matches:
+            found = np.asarray(matches, dtype=np.int64)
+            rows = np.searchsorted(starts, found[:, 0], side="right") - 1
+            np.minimum.at(ranks, rows, found[:, 1])
+        return ranks
+
+
+@lru_cache(maxsize=32)
+def _compiled(extra: Tuple[Tuple[str, Tuple[str, ...]], ...]) -> ThemeClassifier:
+    tokens = {cat: list(toks) for cat, toks in DEFAULT_THEME_TOKENS.items()}
+    for cat, toks in extra:
+        if cat == FALLBACK_THEME:
+            continue
+        tokens.setdefault(cat, []).extend(toks)
+    return ThemeClassifier(tokens)
+
+
+def theme_classifier(extra_tokens: Optional[Dict[str, List[str]]] = None) -> ThemeClassifier:
+    """Default classifier, optionally extended with user token lists (new categories rank after the defaults)."""
+    extra = tuple(sorted((cat, tuple(toks)) for cat, toks in (extra_tokens or {}).items()))
+    return _compiled(extra)
+
+
+def bucket_themes(frame: KeywordFrame, extra_tokens: Optional[Dict[str, List[str]]] = None) -> List[Tuple[str, np.ndarray, int]]:
+    """(category, row indices, total monthly volume) for every non-empty bucket, in THEME_ORDER
+    with any user categories after it."""
+    classifier = theme_classifier(extra_tokens)
+    ranks = classifier.classify(frame.keyword.tolist())
+    volume_by_rank = np.bincount(ranks, weights=frame.volume, minlength=len(classifier.categories))
+    order = [c for c in THEME_ORDER if c in classifier.categories] + [c for c in classifier.categories if c not in THEME_ORDER]
+    buckets: List[Tuple[str, np.ndarray, int]] = []
+    for cat in order:
+        rank = classifier.categories.index(cat)
+        rows = np.flatnonzero(ranks == rank)
+        if len(rows):
+            buckets.append((cat, rows, int(volume_by_rank[rank])))
+    return buckets
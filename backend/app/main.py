@@ -1,14 +1,36 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 import uvicorn
 
 from .api.v1.endpoints import router as v1_router
+from .services.keyword_cache import keyword_cache
+from .services.single_flight import single_flight
+from .services.registry import service_registry
+from .services.resilience import guard_snapshot
+from .services.job_queue import job_queue
+from .services.plan_sessions import plan_sessions
+from .services.cpu_pool import cpu_pool
+from .services.metrics import metrics, MetricsMiddleware
+from .services.tracing import TracingMiddleware
+from .services.wire_format import CompressionMiddleware, WireFormatMiddleware, WireResponse
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # warm provider clients before taking traffic, close pools on the way out
+    await service_registry.startup()
+    yield
+    await service_registry.shutdown()
 
 semApp = FastAPI(
     title="SEM Plan Tool API",
     description="Search engine marketing planning API: keyword generation, grouping, themes, and bids.",
     version="2.0.0",
+    lifespan=lifespan,
+    # fast encoder + JSON / MessagePack negotiation for every handler
+    default_response_class=WireResponse,
 )
 
 semApp.add_middleware(
@@ -19,11 +41,56 @@ semApp.add_middleware(
     allow_headers=["*"],
 )
 
+# compressed / MessagePack request bodies become plain JSON before routing
+semApp.add_middleware(WireFormatMiddleware)
+semApp.add_middleware(CompressionMiddleware)
+# outermost, so the timing covers CORS and exception handling too; sizes are bytes on the wire
+semApp.add_middleware(MetricsMiddleware)
+# request span around everything else; no-op unless TRACE_EXPORTER is set
+semApp.add_middleware(TracingMiddleware)
+
 semApp.include_router(v1_router, prefix="/api/v1")
 
+def _counter_gauges():
+    cache = keyword_cache.snapshot()
+    flights = single_flight.snapshot()["groups"]
+    guards = guard_snapshot()
+    jobs = job_queue.snapshot()
+    sessions = plan_sessions.snapshot()
+    pool = cpu_pool.snapshot()
+    return [
+        ("sem_cache_events", "Keyword cache hits / misses since start", [({"event": k}, v) for k, v in cache.items()]),
+        ("sem_single_flight_calls", "Coalesced upstream calls since start", [({"group": g, "kind": k}, v) for g, stats in flights.items() for k, v in stats.items()]),
+        ("sem_provider_guard_events", "Rate limiter / retry / breaker counters per provider", [({"provider": p, "event": k}, v) for p, snap in guards.items() for k, v in snap.items() if k not in ("state", "rate")]),
+        ("sem_provider_rate", "Current token bucket rate (requests/s)", [({"provider": p}, snap["rate"]) for p, snap in guards.items()]),
+        ("sem_provider_circuit_open", "1 while the provider's circuit breaker is not closed", [({"provider": p}, int(snap["state"] != "closed")) for p, snap in guards.items()]),
+        ("sem_jobs", "Background job workers and queue depth", [({"kind": k}, v) for k, v in jobs.items()]),
+        ("sem_plan_sessions", "Plan sessions held in memory and tier hits / spills since start", [({"kind": k}, v) for k, v in sessions.items()]),
+        ("sem_cpu_pool", "Planning stage process pool: workers, tasks in flight / queued, totals since start", [({"kind": k}, v) for k, v in pool.items()]),
+    ]
+
+metrics.add_collector(_counter_gauges)
+
 @semApp.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    # liveness: the app only serves once startup is through (warm-up done or timed out),
+    # so a slow warm-up reports "ready": false here instead of failing the container check
+    return service_registry.health()
+
+@semApp.get("/ready")
+async def readiness_check():
+    # readiness: 503 until every provider has been warmed
+    health = service_registry.health()
+    return JSONResponse(status_code=200 if health["ready"] else 503, content=health)
+
+@semApp.get("/stats")
+async def upstream_stats():
+    # cache, request-coalescing, plan session, cpu pool and per-provider rate limit / breaker counters
+    return {"cache": keyword_cache.snapshot(), "single_flight": single_flight.snapshot(), "plan_sessions": plan_sessions.snapshot(), "cpu_pool": cpu_pool.snapshot(), "providers": guard_snapshot()}
+
+@semApp.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @semApp.get("/")
 async def root():
@@ -32,6 +99,7 @@ async def root():
         "version": "2.0.0",
         "docs": "/docs",
         "health": "/health",
+        "ready": "/ready",
     }
 
 @semApp.exception_handler(HTTPException)
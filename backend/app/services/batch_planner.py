@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, AsyncIterator, Awaitable, Callable, Tuple, TypeVar
+
+from ..config import get_env
+from .dataforseo_service import KEYWORDS_FOR_KEYWORDS_BATCH
+from .keyword_providers import KeywordQuery, ProviderResult, ProviderStrategy, keyword_strategy
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class SeedFetch:
+    """One provider lookup: a provider-sized batch of one job's seeds in one location. Jobs
+    asking for the same batch share the fetch; brand handling happens per job on its rows."""
+    seeds: Tuple[str, ...]
+    location: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.location}:{'|'.join(self.seeds)}"
+
+    def query(self) -> KeywordQuery:
+        location = self.location.strip()
+        return KeywordQuery(
+            seed_keywords=list(self.seeds),
+            locations=[location],
+            location_code=int(location) if location.isdigit() else 2840,
+            language_code="en",
+        )
+
+
+@dataclass
+class BatchUnit:
+    """One (job, location) plan, its seeds and the batched fetches that hold them."""
+    job_id: str
+    location: str
+    seeds: List[str]
+    fetches: List[SeedFetch]
+    job: Dict[str, Any]
+
+
+Fetcher = Callable[[SeedFetch, Optional[str]], Awaitable[ProviderResult]]
+
+
+class BatchPlanner:
+    """Schedules the provider calls for many plan jobs at once.
+    - every job is split per location, and each location's seeds into batches of batch_size;
+      each batch is one fetch, and identical batches across jobs run once
+    - batches never mix jobs' seeds, so a job's plan doesn't depend on what else is in the
+      request (provider fallback and Labs expansion see exactly that job's seeds)
+    - at most max_concurrency fetches are in flight; below that the shared http transport
+      limits, response cache and request coalescing apply as for single requests
+    - run() yields each unit's result as soon as its own fetches are done
+    """
+
+    def __init__(self, strategy: ProviderStrategy, max_concurrency: int = 8, batch_size: int = KEYWORDS_FOR_KEYWORDS_BATCH) -> None:
+        self.strategy = strategy
+        self.max_concurrency = max(1, max_concurrency)
+        self.batch_size = max(1, batch_size)
+
+    def units(self, jobs: List[Dict[str, Any]]) -> List[BatchUnit]:
+        units: List[BatchUnit] = []
+        for idx, job in enumerate(jobs):
+            seeds = list(dict.fromkeys(s.strip().lower() for s in job.get("seed_keywords") or [] if s and s.strip()))
+            locations = list(dict.fromkeys(str(l).strip() for l in job.get("locations") or [] if str(l).strip())) or ["2840"]
+            # sorted, so jobs with the same seed set in any order ask for the same batches
+            ordered = sorted(seeds)
+            for location in locations:
+                units.append(BatchUnit(
+                    job_id=job.get("job_id") or f"job-{idx + 1}",
+                    location=location,
+                    job=job,
+                    seeds=seeds,
+                    fetches=[SeedFetch(tuple(ordered[start:start + self.batch_size]), location) for start in range(0, len(ordered), self.batch_size)],
+                ))
+        return units
+
+    async def fetch_one(self, fetch: SeedFetch, mode: Optional[str] = None) -> ProviderResult:
+        return await self.strategy.run(fetch.query(), mode=mode)
+
+    async def _fetch(self, fetch: SeedFetch, limit: asyncio.Semaphore, mode: Optional[str], fetcher: Fetcher) -> ProviderResult:
+        async with limit:
+            try:
+                return await fetcher(fetch, mode)
+            except Exception as e:
+                logger.error(f"batch fetch failed for {len(fetch.seeds)} seeds in {fetch.location}: {e}")
+                return ProviderResult(keywords=[], data_source="none")
+
+    async def run(self, units: List[BatchUnit], build: Callable[[BatchUnit, List[ProviderResult]], Awaitable[T]], mode: Optional[str] = None, fetcher: Optional[Fetcher] = None) -> AsyncIterator[Tuple[BatchUnit, T]]:
+        """Yields (unit, await build(unit, results)) in completion order. results line up with unit.fetches.
+        fetcher replaces fetch_one, e.g. to checkpoint each fetch of a background job."""
+        limit = asyncio.Semaphore(self.max_concurrency)
+        fetcher = fetcher or self.fetch_one
+        shared: Dict[SeedFetch, asyncio.Task] = {}
+        for unit in units:
+            for fetch in unit.fetches:
+                if fetch not in shared:
+                    shared[fetch] = asyncio.create_task(self._fetch(fetch, limit, mode, fetcher))
+
+        async def complete(unit: BatchUnit) -> Tuple[BatchUnit, T]:
+            results = list(await asyncio.gather(*(shared[f] for f in unit.fetches)))
+            return unit, await build(unit, results)
+
+        pending = [asyncio.create_task(complete(unit)) for unit in units]
+        try:
+            for finished in asyncio.as_completed(pending):
+                yield await finished
+        finally:
+            # caller went away: drop whatever has not finished
+            for task in pending + list(shared.values()):
+                task.cancel()
+
+    @staticmethod
+    def fetch_counts(units: List[BatchUnit]) -> Dict[str, int]:
+        # requested: (seed, location) lookups over all units; unique: distinct ones; calls: batched fetches
+        requested = sum(len(u.seeds) for u in units)
+        unique = len({(u.location, seed) for u in units for seed in u.seeds})
+        calls = len({f for u in units for f in u.fetches})
+        return {"requested": requested, "unique": unique, "calls": calls}
+
+
+batch_planner = BatchPlanner(
+    strategy=keyword_strategy,
+    max_concurrency=int(get_env("BATCH_MAX_CONCURRENCY", "8")),
+)
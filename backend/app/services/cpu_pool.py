@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from ..config import get_env
+from .metrics import CPU_TASK_DURATION, metrics
+
+logger = logging.getLogger(__name__)
+
+
+def available_cpus() -> int:
+    # honours taskset / container cpusets where the platform exposes them
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _timed_call(fn: Callable[..., Any], args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Tuple[Any, float, float]:
+    # runs in the worker; the start time lets the parent split queue wait from run time
+    started = time.time()
+    clock = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, started, time.perf_counter() - clock
+
+
+def _warm() -> int:
+    # pays the numpy / engine import in each worker before the first real task
+    from ..engine import planning  # noqa: F401
+    return os.getpid()
+
+
+class CpuTaskTimeout(TimeoutError):
+    pass
+
+
+class CpuPool:
+    """Process pool for the CPU-bound planning stages (clustering, theme bucketing, bid plans),
+    so a large plan neither blocks the event loop nor stays on one core.
+    - run(fn, ...): fn must be a module-level function (engine.planning) taking compact,
+      picklable inputs: KeywordFrame columns, row-index arrays, plain dicts
+    - rows < min_rows runs inline: below that the pickling round trip costs more than it saves
+    - timeout: the caller gets CpuTaskTimeout; a task still queued is cancelled, one already
+      running finishes in its worker and the result is dropped
+    - a crashed worker breaks the pool; it is rebuilt for the next task
+    """
+
+    def __init__(self, workers: int = 0, timeout: float = 60.0, min_rows: int = 5000, start_method: str = "spawn", enabled: bool = True) -> None:
+        # default leaves one core to the event loop
+        self.workers = workers if workers > 0 else max(1, available_cpus() - 1)
+        self.timeout = timeout
+        self.min_rows = min_rows
+        self.start_method = start_method
+        self.enabled = enabled
+        self.in_flight = 0
+        self.stats: Dict[str, int] = {"submitted": 0, "completed": 0, "failed": 0, "timeouts": 0, "inline": 0, "restarts": 0}
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn by default: forking a process that already runs threads (blocking pool,
+            # exporters) can copy held locks into the child
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(self.start_method))
+        return self._pool
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        if self._pool is broken:
+            self._pool = None
+            self.stats["restarts"] += 1
+            logger.warning("cpu pool worker died, pool will be rebuilt")
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def start(self) -> None:
+        """Spawns the workers ahead of the first heavy request."""
+        if not self.enabled:
+            return
+        pool = self._executor()
+        for _ in range(self.workers):
+            pool.submit(_warm)
+
+    async def run(self, fn: Callable[..., Any], *args: Any, rows: int = 0, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """fn(*args, **kwargs) in a worker process; rows is the input size the inline cut-off checks."""
+        name = getattr(fn, "__name__", "task")
+        if not self.enabled or rows < self.min_rows:
+            self.stats["inline"] += 1
+            clock = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                if metrics.enabled:
+                    CPU_TASK_DURATION.observe(time.perf_counter() - clock, task=name, phase="inline")
+
+        limit = timeout or self.timeout
+        pool = self._executor()
+        submitted = time.time()
+        future = pool.submit(_timed_call, fn, args, kwargs)
+        self.stats["submitted"] += 1
+        self.in_flight += 1
+        try:
+            result, started, seconds = await asyncio.wait_for(asyncio.wrap_future(future), limit)
+        except asyncio.TimeoutError:
+            future.cancel()
+            self.stats["timeouts"] += 1
+            raise CpuTaskTimeout(f"{name} did not finish within {limit:g}s")
+        except BrokenProcessPool:
+            self.stats["failed"] += 1
+            self._restart(pool)
+            raise
+        except asyncio.CancelledError:
+            # the request went away; a queued task is dropped, a running one finishes unobserved
+            future.cancel()
+            raise
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+        finally:
+            self.in_flight -= 1
+        self.stats["completed"] += 1
+        if metrics.enabled:
+            CPU_TASK_DURATION.observe(max(0.0, started - submitted), task=name, phase="queued")
+            CPU_TASK_DURATION.observe(seconds, task=name, phase="run")
+        return result
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        # tasks beyond one per worker are waiting in the pool's queue
+        return {"workers": self.workers, "in_flight": self.in_flight, "queued": max(0, self.in_flight - self.workers), **self.stats}
+
+
+cpu_pool = CpuPool(
+    workers=int(get_env("CPU_POOL_WORKERS", "0")),
+    timeout=float(get_env("CPU_POOL_TASK_TIMEOUT", "60")),
+    min_rows=int(get_env("CPU_POOL_MIN_ROWS", "5000")),
+    start_method=get_env("CPU_POOL_START_METHOD", "spawn"),
+    enabled=get_env("CPU_POOL_ENABLED", "true").lower() in ("1", "true", "yes"),
+)
@@ -1,20 +1,33 @@
+import asyncio
 import base64
 import json
 import logging
 from urllib.parse import urlparse
-from typing import List, Dict, Any, Set
+from typing import List, Dict, Any, Set, AsyncIterator
 
-import requests
 from ..config import get_env
+from .http_client import http_transport
+from .keyword_cache import keyword_cache
+from .resilience import provider_guards
+from .metrics import track_upstream
+from .tracing import traced
+from .single_flight import single_flight, request_key
 
 logger = logging.getLogger(__name__)
 
+# per-task keyword limits of the Keywords Data endpoints
+KEYWORDS_FOR_KEYWORDS_BATCH = 20
+SEARCH_VOLUME_BATCH = 1000
+
+def _chunks(items: List[str], size: int) -> List[List[str]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
 class DataForSEOService:
     """Thin wrapper around DataForSEO v3 Keywords Data + Labs endpoints.
     Strategy:
     - Try Keywords Data: google_ads/keywords_for_keywords/live for KPIs
-    - If results are sparse, pull Labs keyword_ideas/live to expand, then enrich KPIs via
-      google_ads/search_volume/live on the new terms
+    - If results are sparse, pull Labs keyword_ideas/live for every seed concurrently and
+      stream the new terms into google_ads/search_volume/live in API-sized chunks
     - Apply simple min volume filter and brand exclusions
     """
 
@@ -23,7 +36,8 @@ class DataForSEOService:
         self.api_password = get_env("DATAFORSEO_API_PASSWORD")
         self.api_key = get_env("DATAFORSEO_API_KEY")
         self.base = get_env("DATAFORSEO_BASE_URL", "https://api.dataforseo.com")
-        self.session = requests.Session()
+
+        self.guard = provider_guards["dataforseo"]
 
         self.is_configured = bool((self.api_login and self.api_password) or self.api_key)
         if not self.is_configured:
@@ -38,16 +52,34 @@ class DataForSEOService:
             return {"Authorization": f"Basic {token}"}
         return {}
 
-    def _post(self, path: str, payload: Any) -> Dict[str, Any]:
+    @track_upstream("dataforseo", lambda self, path, payload: path)
+    @traced("dataforseo.post", lambda self, path, payload: {"dataforseo.path": path, "dataforseo.tasks": len(payload) if isinstance(payload, list) else 1})
+    async def _post(self, path: str, payload: Any) -> Dict[str, Any]:
+        # identical concurrent POSTs (same path + payload) share one upstream call
+        return await single_flight.do(request_key("dataforseo", path, payload), lambda: self._send(path, payload))
+
+    async def _send(self, path: str, payload: Any) -> Dict[str, Any]:
         url = f"{self.base}{path}"
-        try:
-            resp = self.session.post(url, headers=self._auth_headers(), json=payload, timeout=30)
+
+        async def attempt():
+            resp = await http_transport.request("POST", url, headers=self._auth_headers(), json=payload, timeout=30)
             resp.raise_for_status()
+            return resp
+
+        try:
+            # rate limited, retried on 429/5xx/timeouts, skipped outright while the breaker is open
+            resp = await self.guard.call(attempt)
             return resp.json()
         except Exception as e:
             logger.error(f"DataForSEO POST {path} failed: {e}")
             return {}
 
+    async def warmup(self) -> None:
+        # free account endpoint: opens the pooled TLS connection and checks the credentials
+        if self.is_configured:
+            resp = await http_transport.request("GET", f"{self.base}/v3/appendix/user_data", headers=self._auth_headers(), timeout=10)
+            resp.raise_for_status()
+
     def _hostname_tokens(self, url: str) -> Set[str]:
         try:
             host = urlparse(url).hostname or ""
@@ -94,9 +126,7 @@ class DataForSEOService:
             "source": "dataforseo",
         }
 
-    def _kdd_keywords_for_keywords(self, seeds: List[str], location_code: int, language_code: str) -> List[Dict[str, Any]]:
-        tasks = [{"keywords": seeds[:50], "location_code": location_code, "language_code": language_code}]
-        data = self._post("/v3/keywords_data/google_ads/keywords_for_keywords/live", tasks)
+    def _map_kpi_response(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
         results: List[Dict[str, Any]] = []
         for task in (data.get("tasks") or []):
             for item in (task.get("result") or []):
@@ -106,15 +136,31 @@ class DataForSEOService:
                         results.append(mapped)
         return results
 
-    def _labs_keyword_ideas(self, seeds: List[str], location_code: int, language_code: str, limit: int = 300) -> List[str]:
-        # Labs keyword ideas endpoint
+    @traced("dataforseo.keywords_for_keywords", lambda self, seeds, *a, **kw: {"seed.count": len(seeds)}, result_count="keyword.count")
+    async def _kdd_keywords_for_keywords(self, seeds: List[str], location_code: int, language_code: str) -> List[Dict[str, Any]]:
+        batches = _chunks(list(dict.fromkeys(seeds)), KEYWORDS_FOR_KEYWORDS_BATCH)
+        responses = await asyncio.gather(*(
+            self._post(
+                "/v3/keywords_data/google_ads/keywords_for_keywords/live",
+                [{"keywords": batch, "location_code": location_code, "language_code": language_code}],
+            )
+            for batch in batches
+        ))
+        results: List[Dict[str, Any]] = []
+        for data in responses:
+            results.extend(self._map_kpi_response(data))
+        return results
+
+    @traced("dataforseo.labs_keyword_ideas", lambda self, seed, *a, **kw: {"seed.count": 1}, result_count="keyword.count")
+    async def _labs_keyword_ideas(self, seed: str, location_code: int, language_code: str, limit: int = 300) -> List[str]:
+        # Labs keyword ideas endpoint, one seed per call
         payload = [{
-            "keyword": seeds[0],
+            "keyword": seed,
             "location_code": location_code,
             "language_code": language_code,
             "limit": min(1000, max(100, limit))
         }]
-        data = self._post("/v3/dataforseo_labs/google/keyword_ideas/live", payload)
+        data = await self._post("/v3/dataforseo_labs/google/keyword_ideas/live", payload)
         out: List[str] = []
         for task in (data.get("tasks") or []):
             for item in (task.get("result") or []):
@@ -123,59 +169,139 @@ class DataForSEOService:
                     if text:
                         out.append(str(text))
         # de-dupe preserve order
-        seen: Set[str] = set()
-        deduped: List[str] = []
-        for k in out:
-            if k not in seen:
-                seen.add(k)
-                deduped.append(k)
-        return deduped[:limit]
-
-    def _kdd_search_volume(self, keywords: List[str], location_code: int, language_code: str) -> List[Dict[str, Any]]:
+        return list(dict.fromkeys(out))[:limit]
+
+    @traced("dataforseo.search_volume", lambda self, keywords, *a, **kw: {"request.keyword_count": len(keywords)}, result_count="keyword.count")
+    async def _kdd_search_volume(self, keywords: List[str], location_code: int, language_code: str) -> List[Dict[str, Any]]:
         # Enrich list with KPIs (volume/CPC may be included here as well)
         if not keywords:
             return []
-        payload = [{
-            "keywords": keywords[:700],
-            "location_code": location_code,
-            "language_code": language_code
-        }]
-        data = self._post("/v3/keywords_data/google_ads/search_volume/live", payload)
-        results: List[Dict[str, Any]] = []
-        for task in (data.get("tasks") or []):
-            for item in (task.get("result") or []):
-                for kw in (item.get("items") or []):
-                    mapped = self._map_kpi_item(kw)
-                    if mapped:
-                        results.append(mapped)
-        return results
+        # only pay for keywords we haven't already seen for this market
+        cached = await keyword_cache.get_kpis("dataforseo", keywords, location_code, language_code)
+        missing = [k for k in keywords if k not in cached]
+        responses = await asyncio.gather(*(
+            self._post(
+                "/v3/keywords_data/google_ads/search_volume/live",
+                [{"keywords": batch, "location_code": location_code, "language_code": language_code}],
+            )
+            for batch in _chunks(missing, SEARCH_VOLUME_BATCH)
+        ))
+        fetched: List[Dict[str, Any]] = []
+        for data in responses:
+            fetched.extend(self._map_kpi_response(data))
+        await keyword_cache.set_kpis("dataforseo", fetched, location_code, language_code)
+        return list(cached.values()) + fetched
 
-    async def get_keyword_data(self, seed_keywords: List[str], location_code: int = 2840, language_code: str = "en", brand_url: str = None, competitor_url: str = None, min_volume: int = 300) -> List[Dict[str, Any]]:
-        if not self.is_configured or not seed_keywords:
-            return []
+    async def _expand_and_enrich(self, seeds: List[str], present: Set[str], location_code: int, language_code: str, limit: int = 400) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Labs ideas for all seeds run concurrently; new terms are de-duplicated as they
+        arrive and each full chunk is sent to search volume immediately. Yields enriched
+        rows chunk by chunk as they complete.
+        """
+        seen: Set[str] = set(present)
+        buffer: List[str] = []
+        labs = {asyncio.create_task(self._labs_keyword_ideas(seed, location_code, language_code, limit=limit)) for seed in dict.fromkeys(seeds)}
+        enrich: Set[asyncio.Task] = set()
 
-        exclude_tokens: Set[str] = set()
-        for url in [brand_url, competitor_url]:
-            exclude_tokens |= self._hostname_tokens(url or "")
+        def flush() -> None:
+            nonlocal buffer
+            enrich.add(asyncio.create_task(self._kdd_search_volume(buffer, location_code, language_code)))
+            buffer = []
 
+        try:
+            while labs or enrich:
+                done, _ = await asyncio.wait(labs | enrich, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task in labs:
+                        labs.discard(task)
+                        try:
+                            ideas = task.result()
+                        except Exception as e:
+                            logger.error(f"Labs keyword ideas failed: {e}")
+                            ideas = []
+                        for k in ideas:
+                            if k not in seen:
+                                seen.add(k)
+                                buffer.append(k)
+                                if len(buffer) >= SEARCH_VOLUME_BATCH:
+                                    flush()
+                        if not labs and buffer:
+                            flush()
+                    else:
+                        enrich.discard(task)
+                        try:
+                            rows = task.result()
+                        except Exception as e:
+                            logger.error(f"Search volume enrichment failed: {e}")
+                            rows = []
+                        if rows:
+                            yield rows
+        finally:
+            for task in labs | enrich:
+                task.cancel()
+
+    async def _iter_raw_keywords(self, seed_keywords: List[str], location_code: int, language_code: str) -> AsyncIterator[List[Dict[str, Any]]]:
         # 1) Try Keywords Data (KPIs included)
-        primary = self._kdd_keywords_for_keywords(seed_keywords, location_code, language_code)
+        primary = await self._kdd_keywords_for_keywords(seed_keywords, location_code, language_code)
+        await keyword_cache.set_kpis("dataforseo", primary, location_code, language_code)
+        yield primary
 
         # 2) If sparse, expand with Labs ideas and enrich via Search Volume
         if len(primary) < 30:
             try:
-                ideas = self._labs_keyword_ideas(seed_keywords, location_code, language_code, limit=400)
-                # remove already present
                 present = {p["keyword"] for p in primary}
-                to_enrich = [k for k in ideas if k not in present]
-                enriched = self._kdd_search_volume(to_enrich, location_code, language_code)
-                primary.extend(enriched)
+                async for enriched in self._expand_and_enrich(seed_keywords, present, location_code, language_code, limit=400):
+                    yield enriched
             except Exception as e:
                 logger.error(f"Labs enrichment failed: {e}")
 
+    async def _collect_keywords(self, seed_keywords: List[str], location_code: int, language_code: str) -> List[Dict[str, Any]]:
+        collected: List[Dict[str, Any]] = []
+        async for batch in self._iter_raw_keywords(seed_keywords, location_code, language_code):
+            collected.extend(batch)
+        return collected
+
+    def brand_tokens(self, brand_url: str = None, competitor_url: str = None) -> Set[str]:
+        # hostname parts of both sites: filtered out of DataForSEO results, navigational intent elsewhere
+        exclude_tokens: Set[str] = set()
+        for url in [brand_url, competitor_url]:
+            exclude_tokens |= self._hostname_tokens(url or "")
+        return {t.lower() for t in exclude_tokens}
+
+    async def get_keyword_data(self, seed_keywords: List[str], location_code: int = 2840, language_code: str = "en", brand_url: str = None, competitor_url: str = None, min_volume: int = 300) -> List[Dict[str, Any]]:
+        if not self.is_configured or not seed_keywords:
+            return []
+
+        primary = await keyword_cache.get_or_fetch(
+            "dataforseo", "keyword_data", seed_keywords, location_code, language_code,
+            lambda: self._collect_keywords(seed_keywords, location_code, language_code),
+        )
+
         # 3) Apply filtering and map
-        filtered = self._filter_terms(primary, min_volume=min_volume, exclude_tokens={t.lower() for t in exclude_tokens})
+        filtered = self._filter_terms(primary, min_volume=min_volume, exclude_tokens=self.brand_tokens(brand_url, competitor_url))
         return filtered
 
+    async def iter_keyword_data(self, seed_keywords: List[str], location_code: int = 2840, language_code: str = "en", brand_url: str = None, competitor_url: str = None, min_volume: int = 300) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Same result as get_keyword_data, yielded batch by batch as upstream calls complete.
+        Closing the iterator early cancels the outstanding Labs / search volume calls;
+        only a fully consumed run is written to the cache.
+        """
+        if not self.is_configured or not seed_keywords:
+            return
+        exclude_tokens = self.brand_tokens(brand_url, competitor_url)
+        cached = await keyword_cache.get(
+            "dataforseo", "keyword_data", seed_keywords, location_code, language_code,
+            refresh=lambda: self._collect_keywords(seed_keywords, location_code, language_code),
+        )
+        if cached is not None:
+            yield self._filter_terms(cached, min_volume=min_volume, exclude_tokens=exclude_tokens)
+            return
+        collected: List[Dict[str, Any]] = []
+        async for batch in self._iter_raw_keywords(seed_keywords, location_code, language_code):
+            collected.extend(batch)
+            filtered = self._filter_terms(batch, min_volume=min_volume, exclude_tokens=exclude_tokens)
+            if filtered:
+                yield filtered
+        await keyword_cache.put("dataforseo", "keyword_data", seed_keywords, location_code, language_code, collected)
+
 
 dataforseo_service = DataForSEOService()
@@ -2,8 +2,16 @@ import os
 import logging
 from typing import List, Dict, Any
 from datetime import datetime, timedelta
+import grpc
 from google.ads.googleads.client import GoogleAdsClient
 from google.ads.googleads.errors import GoogleAdsException
+from google.auth.transport.requests import Request
+
+from .http_client import run_blocking
+from .keyword_cache import keyword_cache
+from .resilience import provider_guards
+from .metrics import track_upstream
+from .tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +24,10 @@ class GoogleAdsService:
         self.customer_id = os.getenv('GOOGLE_ADS_CUSTOMER_ID')
         self.is_configured = all([self.g_client_id, self.g_client_secret, self.g_refresh_token, self.dev_token, self.customer_id])
         self.client = None
+        # get_service() opens a fresh gRPC channel each time, so keep the stubs
+        self._planner_svc = None
+        self._ga_svc = None
+        self.guard = provider_guards["google_ads"]
         if self.is_configured:
             try:
                 self._initialize_client()
@@ -37,36 +49,63 @@ class GoogleAdsService:
         self.client = GoogleAdsClient.load_from_dict(cfg)
         logger.info("Google Ads client initialized")
     
+    def _services(self):
+        if self._planner_svc is None:
+            self._planner_svc = self.client.get_service("KeywordPlanIdeaService")
+            self._ga_svc = self.client.get_service("GoogleAdsService")
+        return self._planner_svc, self._ga_svc
+
+    def _warm(self) -> None:
+        # mint the OAuth access token and open the planner channel (TLS + HTTP/2) up front
+        self.client.credentials.refresh(Request())
+        planner_svc, _ = self._services()
+        channel = getattr(planner_svc.transport, "grpc_channel", None)
+        if channel is not None:
+            grpc.channel_ready_future(channel).result(timeout=10)
+
+    async def warmup(self) -> None:
+        if self.is_configured:
+            await run_blocking(self._warm)
+
+    def _fetch_keyword_ideas(self, seed_keywords: List[str], language_id: str, location_ids: List[str]) -> List[Dict[str, Any]]:
+        # blocking gRPC call + pager iteration, run off the event loop
+        planner_svc, ga_svc = self._services()
+        req = self.client.get_type("GenerateKeywordIdeasRequest")
+        req.customer_id = self.customer_id
+        req.language = ga_svc.language_constant_path(language_id)
+        if location_ids:
+            for loc_id in location_ids:
+                geo_target = ga_svc.geographic_target_constant_path(loc_id)
+                req.geo_target_constants.append(geo_target)
+        if seed_keywords:
+            ks = self.client.get_type("KeywordSeed")
+            for k in seed_keywords:
+                ks.keywords.append(k)
+            req.keyword_seed = ks
+        response = planner_svc.generate_keyword_ideas(request=req)
+        return [
+            {
+                "keyword": r.text,
+                "avg_monthly_searches": r.keyword_idea_metrics.avg_monthly_searches,
+                "competition": self._map_competition_level(r.keyword_idea_metrics.competition),
+                "competition_index": r.keyword_idea_metrics.competition_index,
+                "low_top_of_page_bid_micros": r.keyword_idea_metrics.low_top_of_page_bid_micros,
+                "high_top_of_page_bid_micros": r.keyword_idea_metrics.high_top_of_page_bid_micros,
+                "source": "keyword_planner",
+            }
+            for r in response if r.keyword_idea_metrics
+        ]
+
+    @track_upstream("google_ads", "keyword_ideas")
+    @traced("google_ads.keyword_ideas", lambda self, seed_keywords, *a, **kw: {"seed.count": len(seed_keywords or [])}, result_count="keyword.count")
     async def get_keyword_ideas(self, seed_keywords: List[str], language_id: str = "1000", location_ids: List[str] = None) -> List[Dict[str, Any]]:
         if not self.is_configured:
             return []
         try:
-            planner_svc = self.client.get_service("KeywordPlanIdeaService")
-            req = self.client.get_type("GenerateKeywordIdeasRequest")
-            req.customer_id = self.customer_id
-            req.language = self.client.get_service("GoogleAdsService").language_constant_path(language_id)
-            if location_ids:
-                for loc_id in location_ids:
-                    geo_target = self.client.get_service("GoogleAdsService").geographic_target_constant_path(loc_id)
-                    req.geo_target_constants.append(geo_target)
-            if seed_keywords:
-                ks = self.client.get_type("KeywordSeed")
-                for k in seed_keywords:
-                    ks.keywords.append(k)
-                req.keyword_seed = ks
-            response = planner_svc.generate_keyword_ideas(request=req)
-            return [
-                {
-                    "keyword": r.text,
-                    "avg_monthly_searches": r.keyword_idea_metrics.avg_monthly_searches,
-                    "competition": self._map_competition_level(r.keyword_idea_metrics.competition),
-                    "competition_index": r.keyword_idea_metrics.competition_index,
-                    "low_top_of_page_bid_micros": r.keyword_idea_metrics.low_top_of_page_bid_micros,
-                    "high_top_of_page_bid_micros": r.keyword_idea_metrics.high_top_of_page_bid_micros,
-                    "source": "keyword_planner",
-                }
-                for r in response if r.keyword_idea_metrics
-            ]
+            return await keyword_cache.get_or_fetch(
+                "google_ads", "keyword_ideas", seed_keywords or [], ",".join(map(str, location_ids or [])), language_id,
+                lambda: self.guard.call(lambda: run_blocking(self._fetch_keyword_ideas, seed_keywords, language_id, location_ids)),
+            )
         except GoogleAdsException as e:
             logger.error(f"Google Ads API error: {e}")
             return []
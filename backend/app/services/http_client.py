@@ -0,0 +1,90 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlparse
+
+import httpx
+from ..config import get_env
+from .metrics import observe_upstream_response
+from .tracing import tracer, KIND_CLIENT
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncHttpTransport:
+    """Shared async HTTP transport for the REST-based providers (DataForSEO, SerpAPI).
+    - One pooled httpx.AsyncClient with keep-alive, created lazily on the running loop
+    - Per-host semaphore so a single upstream can't take every pooled connection
+    - Default timeout, overridable per call
+    """
+
+    def __init__(self, max_connections: int = 100, max_keepalive: int = 20, per_host_limit: int = 10, timeout: float = 30.0) -> None:
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive,
+                    keepalive_expiry=60.0,
+                ),
+                timeout=httpx.Timeout(self.timeout, connect=10.0),
+            )
+        return self._client
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).hostname or ""
+        sem = self._host_limits.get(host)
+        if sem is None:
+            sem = asyncio.Semaphore(self.per_host_limit)
+            self._host_limits[host] = sem
+        return sem
+
+    async def request(self, method: str, url: str, timeout: Optional[float] = None, **kwargs: Any) -> httpx.Response:
+        host = urlparse(url).hostname or ""
+        # one CLIENT span per attempt, so retries show up as siblings
+        with tracer.span(f"HTTP {method}", KIND_CLIENT, {"http.method": method, "server.address": host, "url.path": urlparse(url).path}) as span:
+            async with self._host_limit(url):
+                try:
+                    resp = await self.client.request(method, url, timeout=timeout or self.timeout, **kwargs)
+                except httpx.TransportError as e:
+                    observe_upstream_response(host, type(e).__name__)
+                    raise
+            span.set_attributes({"http.status_code": resp.status_code, "http.response_content_length": len(resp.content)})
+        observe_upstream_response(host, resp.status_code, len(resp.content))
+        return resp
+
+    async def aclose(self) -> None:
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self._host_limits.clear()
+
+
+# bounded pool for SDKs that only offer blocking calls (zeep, google-ads gRPC)
+blocking_pool = ThreadPoolExecutor(
+    max_workers=int(get_env("PROVIDER_THREAD_POOL_SIZE", "16")),
+    thread_name_prefix="provider-io",
+)
+
+
+async def run_blocking(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(blocking_pool, functools.partial(fn, *args, **kwargs))
+
+
+http_transport = AsyncHttpTransport(
+    max_connections=int(get_env("HTTP_MAX_CONNECTIONS", "100")),
+    max_keepalive=int(get_env("HTTP_MAX_KEEPALIVE", "20")),
+    per_host_limit=int(get_env("HTTP_PER_HOST_LIMIT", "10")),
+    timeout=float(get_env("HTTP_TIMEOUT_SECONDS", "30")),
+)
@@ -0,0 +1,295 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from ..config import get_env
+from .http_client import run_blocking
+
+logger = logging.getLogger(__name__)
+
+JOB_STATES = ("queued", "running", "succeeded", "failed", "cancelled")
+FINISHED = ("succeeded", "failed", "cancelled")
+
+
+class JobStore:
+    """SQLite-backed job table plus per-stage checkpoints. Sync methods; JobQueue calls
+    them through the blocking pool."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, payload TEXT NOT NULL, "
+                "result TEXT, error TEXT, stage TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints ("
+                "job_id TEXT NOT NULL, stage TEXT NOT NULL, value TEXT NOT NULL, created_at REAL NOT NULL, "
+                "PRIMARY KEY (job_id, stage))"
+            )
+            self._conn = conn
+        return self._conn
+
+    def create(self, job_id: str, kind: str, payload: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT INTO jobs (id, kind, status, payload, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), now, now),
+            )
+            db.commit()
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        if not fields:
+            return
+        if "result" in fields and fields["result"] is not None:
+            fields["result"] = json.dumps(fields["result"])
+        fields["updated_at"] = time.time()
+        cols = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            db = self._db()
+            db.execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+            db.commit()
+
+    def transition(self, job_id: str, status: str, **fields: Any) -> bool:
+        """Sets status (plus fields) unless the job already finished; False if it had.
+        The check and the write are one statement, so a finishing handler and cancel() can't
+        overwrite each other."""
+        if "result" in fields and fields["result"] is not None:
+            fields["result"] = json.dumps(fields["result"])
+        fields.update(status=status, updated_at=time.time())
+        cols = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            db = self._db()
+            changed = db.execute(
+                f"UPDATE jobs SET {cols} WHERE id = ? AND status NOT IN ({', '.join('?' for _ in FINISHED)})",
+                (*fields.values(), job_id, *FINISHED),
+            ).rowcount
+            db.commit()
+        return changed > 0
+
+    def get(self, job_id: str, with_result: bool = False) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db().execute(
+                "SELECT id, kind, status, payload, result, error, stage, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            done = self._db().execute("SELECT COUNT(*) FROM checkpoints WHERE job_id = ?", (job_id,)).fetchone()[0]
+        job = {
+            "job_id": row[0], "kind": row[1], "status": row[2], "error": row[5], "stage": row[6],
+            "checkpoints": done, "created_at": row[7], "updated_at": row[8],
+        }
+        if with_result:
+            job["payload"] = json.loads(row[3])
+            job["result"] = json.loads(row[4]) if row[4] else None
+        return job
+
+    def unfinished(self) -> List[str]:
+        # running jobs were cut off by a restart; they resume from their checkpoints
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def checkpoint_get(self, job_id: str, stage: str) -> Optional[Any]:
+        with self._lock:
+            row = self._db().execute("SELECT value FROM checkpoints WHERE job_id = ? AND stage = ?", (job_id, stage)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def checkpoint_put(self, job_id: str, stage: str, value: Any) -> None:
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO checkpoints (job_id, stage, value, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, stage, json.dumps(value), time.time()),
+            )
+            db.commit()
+
+    def purge(self, older_than: float) -> int:
+        """Drops finished jobs (and their checkpoints) last touched before older_than."""
+        with self._lock:
+            db = self._db()
+            ids = [r[0] for r in db.execute(
+                "SELECT id FROM jobs WHERE status IN ('succeeded', 'failed', 'cancelled') AND updated_at < ?", (older_than,)
+            ).fetchall()]
+            for i in range(0, len(ids), 500):
+                batch = ids[i:i + 500]
+                marks = ",".join("?" * len(batch))
+                db.execute(f"DELETE FROM checkpoints WHERE job_id IN ({marks})", batch)
+                db.execute(f"DELETE FROM jobs WHERE id IN ({marks})", batch)
+            db.commit()
+        return len(ids)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class JobContext:
+    """Handed to a job handler. checkpoint() runs a stage once per job: on a resumed job
+    the stored value comes back without calling upstream again."""
+
+    def __init__(self, queue: "JobQueue", job_id: str, payload: Dict[str, Any]) -> None:
+        self.queue = queue
+        self.job_id = job_id
+        self.payload = payload
+
+    async def checkpoint(self, stage: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        stored = await run_blocking(self.queue.store.checkpoint_get, self.job_id, stage)
+        if stored is not None:
+            return stored
+        value = await fn()
+        await run_blocking(self.queue.store.checkpoint_put, self.job_id, stage, value)
+        return value
+
+    async def stage(self, name: str) -> None:
+        await run_blocking(self.queue.store.update, self.job_id, stage=name)
+
+
+Handler = Callable[[JobContext], Awaitable[Any]]
+
+
+class JobQueue:
+    """Background plan computation behind submit / status / result / cancel.
+    - jobs and their stage checkpoints live in SQLite, so a restart loses at most the
+      stage that was in flight; queued and running jobs are picked up again on start()
+    - `workers` jobs run at once; each job's own upstream calls still go through the
+      shared transport limits, cache and request coalescing
+    - handlers are registered per job kind and return a JSON-serialisable result
+    """
+
+    def __init__(self, store: JobStore, workers: int = 2, retention_seconds: int = 7 * 24 * 3600) -> None:
+        self.store = store
+        self.workers = max(1, workers)
+        self.retention_seconds = retention_seconds
+        self.handlers: Dict[str, Handler] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._cancelled: Set[str] = set()
+
+    def register(self, kind: str, handler: Handler) -> None:
+        self.handlers[kind] = handler
+
+    async def start(self) -> None:
+        if self._workers:
+            return
+        self._queue = asyncio.Queue()
+        try:
+            purged = await run_blocking(self.store.purge, time.time() - self.retention_seconds)
+            if purged:
+                logger.info(f"purged {purged} finished jobs")
+            for job_id in await run_blocking(self.store.unfinished):
+                self._queue.put_nowait(job_id)
+        except Exception as e:
+            logger.error(f"job store unavailable: {e}")
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        # running jobs stay "running" in the store and resume on the next start()
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._running.clear()
+        self._cancelled.clear()
+        self.store.close()
+
+    async def submit(self, kind: str, payload: Dict[str, Any]) -> str:
+        if kind not in self.handlers:
+            raise ValueError(f"unknown job kind: {kind}")
+        job_id = uuid.uuid4().hex
+        await run_blocking(self.store.create, job_id, kind, payload)
+        if self._queue is not None:
+            self._queue.put_nowait(job_id)
+        return job_id
+
+    async def status(self, job_id: str, with_result: bool = False) -> Optional[Dict[str, Any]]:
+        return await run_blocking(self.store.get, job_id, with_result)
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await self.status(job_id)
+        if job is None or job["status"] in FINISHED:
+            return job
+        if not await run_blocking(self.store.transition, job_id, "cancelled"):
+            # finished between the read and the write; its stored outcome stands
+            return await self.status(job_id)
+        task = self._running.get(job_id)
+        if task is not None:
+            self._cancelled.add(job_id)
+            task.cancel()
+        return await self.status(job_id)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"job {job_id} crashed the worker loop: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        job = await self.status(job_id, with_result=True)
+        if job is None or job["status"] in FINISHED:
+            return
+        handler = self.handlers.get(job["kind"])
+        if handler is None:
+            await run_blocking(self.store.transition, job_id, "failed", error=f"unknown job kind: {job['kind']}")
+            return
+        if not await run_blocking(self.store.transition, job_id, "running"):
+            # cancelled while queued
+            return
+        task = asyncio.create_task(handler(JobContext(self, job_id, job["payload"])))
+        self._running[job_id] = task
+        try:
+            result = await task
+            # no-op if cancel() got there first
+            await run_blocking(self.store.transition, job_id, "succeeded", result=result, stage="done")
+        except asyncio.CancelledError:
+            if job_id in self._cancelled:
+                # cancel() already marked it; the worker itself carries on
+                return
+            raise
+        except Exception as e:
+            logger.error(f"job {job_id} failed: {e}")
+            await run_blocking(self.store.transition, job_id, "failed", error=str(e))
+        finally:
+            self._running.pop(job_id, None)
+            self._cancelled.discard(job_id)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"workers": len(self._workers), "running": len(self._running), "queued": self._queue.qsize() if self._queue else 0}
+
+
+job_queue = JobQueue(
+    store=JobStore(get_env("JOB_DB_PATH", "cache/jobs.sqlite3")),
+    workers=int(get_env("JOB_WORKERS", "2")),
+    retention_seconds=int(get_env("JOB_RETENTION_SECONDS", str(7 * 24 * 3600))),
+)
@@ -0,0 +1,287 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..config import get_env
+from .http_client import run_blocking
+from .single_flight import single_flight
+from .tracing import current_span
+
+logger = logging.getLogger(__name__)
+
+# (value, expires_at, stale_until)
+Entry = Tuple[Any, float, float]
+
+DEFAULT_TTLS = {
+    "dataforseo": 24 * 3600,
+    "google_ads": 24 * 3600,
+    "ms_ads": 24 * 3600,
+    "serpapi": 6 * 3600,
+}
+
+
+class LRUCache:
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max(1, max_entries)
+        self._data: "OrderedDict[str, Entry]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Entry]:
+        entry = self._data.get(key)
+        if entry is not None:
+            self._data.move_to_end(key)
+        return entry
+
+    def set(self, key: str, entry: Entry) -> None:
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class KeywordCache:
+    """Two-tier cache for provider responses.
+    - memory: bounded LRU for whole keyword lists, a larger one for per-keyword KPI rows
+    - disk: SQLite table shared by both, survives restarts
+    Keys cover provider, endpoint, normalized seed set, location and language. Entries
+    past their TTL are still served for stale_seconds while a background refresh runs.
+    Empty results are never stored so a failing upstream isn't pinned.
+    """
+
+    def __init__(self, path: str, max_entries: int = 512, max_kpi_entries: int = 50000, ttls: Optional[Dict[str, int]] = None, stale_seconds: int = 24 * 3600, enabled: bool = True) -> None:
+        self.path = path
+        self.enabled = enabled
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.stale_seconds = stale_seconds
+        self._lists = LRUCache(max_entries)
+        self._kpis = LRUCache(max_kpi_entries)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self.stats: Dict[str, int] = {"memory_hits": 0, "disk_hits": 0, "stale_hits": 0, "misses": 0, "kpi_hits": 0, "kpi_misses": 0}
+
+    # keys
+
+    @staticmethod
+    def normalize_seeds(seeds: Iterable[str]) -> List[str]:
+        return sorted({" ".join(str(s).lower().split()) for s in seeds if s and str(s).strip()})
+
+    def make_key(self, provider: str, endpoint: str, seeds: Iterable[str], location: Any, language: Any) -> str:
+        raw = json.dumps([provider, endpoint, self.normalize_seeds(seeds), str(location or ""), str(language or "")])
+        return f"{provider}:{endpoint}:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+    def kpi_key(self, provider: str, keyword: str, location: Any, language: Any) -> str:
+        return f"{provider}:kpi:{location}:{language}:{' '.join(keyword.lower().split())}"
+
+    def _ttl(self, provider: str) -> int:
+        return int(self.ttls.get(provider, 24 * 3600))
+
+    # disk tier
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, stale_until REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _disk_get_many(self, keys: List[str]) -> Dict[str, Entry]:
+        found: Dict[str, Entry] = {}
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                marks = ",".join("?" * len(batch))
+                rows = db.execute(f"SELECT key, value, expires_at, stale_until FROM entries WHERE key IN ({marks})", batch).fetchall()
+                for key, value, expires_at, stale_until in rows:
+                    if stale_until > now:
+                        found[key] = (json.loads(value), expires_at, stale_until)
+        return found
+
+    def _disk_put_many(self, items: List[Tuple[str, Entry]]) -> None:
+        with self._lock:
+            db = self._db()
+            db.executemany(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at, stale_until) VALUES (?, ?, ?, ?)",
+                [(key, json.dumps(value), expires_at, stale_until) for key, (value, expires_at, stale_until) in items],
+            )
+            db.execute("DELETE FROM entries WHERE stale_until < ?", (time.time(),))
+            db.commit()
+
+    def _entry(self, provider: str, value: Any) -> Entry:
+        expires_at = time.time() + self._ttl(provider)
+        return (value, expires_at, expires_at + self.stale_seconds)
+
+    async def _lookup(self, key: str) -> Optional[Entry]:
+        entry = self._lists.get(key)
+        if entry is not None and entry[2] > time.time():
+            self.stats["memory_hits"] += 1
+            return entry
+        try:
+            entry = (await run_blocking(self._disk_get_many, [key])).get(key)
+        except Exception as e:
+            logger.error(f"keyword cache read failed: {e}")
+            entry = None
+        if entry is not None:
+            self.stats["disk_hits"] += 1
+            self._lists.set(key, entry)
+        return entry
+
+    async def _store(self, key: str, provider: str, value: Any) -> None:
+        entry = self._entry(provider, value)
+        self._lists.set(key, entry)
+        try:
+            await run_blocking(self._disk_put_many, [(key, entry)])
+        except Exception as e:
+            logger.error(f"keyword cache write failed: {e}")
+
+    def _refresh_in_background(self, key: str, provider: str, fetch: Callable[[], Awaitable[Any]]) -> None:
+        if key in self._refreshing:
+            return
+
+        async def refresh() -> None:
+            try:
+                value = await fetch()
+                if value:
+                    await self._store(key, provider, value)
+            except Exception as e:
+                logger.error(f"keyword cache refresh for {key} failed: {e}")
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.create_task(refresh())
+
+    # public api
+
+    async def get(self, provider: str, endpoint: str, seeds: Iterable[str], location: Any, language: Any, refresh: Optional[Callable[[], Awaitable[Any]]] = None) -> Any:
+        """Cached value or None. A stale hit is still returned; with refresh given it is revalidated in the background."""
+        if not self.enabled:
+            return None
+        key = self.make_key(provider, endpoint, seeds, location, language)
+        entry = await self._lookup(key)
+        span = current_span()
+        if entry is None:
+            self.stats["misses"] += 1
+            span.add_event("cache", provider=provider, endpoint=endpoint, result="miss")
+            span.set_attribute("cache.hit", False)
+            return None
+        value, expires_at, _ = entry
+        stale = expires_at <= time.time()
+        if stale:
+            # serve stale, revalidate behind the response
+            self.stats["stale_hits"] += 1
+            if refresh is not None:
+                self._refresh_in_background(key, provider, refresh)
+        span.add_event("cache", provider=provider, endpoint=endpoint, result="stale" if stale else "hit")
+        span.set_attribute("cache.hit", True)
+        return value
+
+    async def put(self, provider: str, endpoint: str, seeds: Iterable[str], location: Any, language: Any, value: Any) -> None:
+        if self.enabled and value:
+            await self._store(self.make_key(provider, endpoint, seeds, location, language), provider, value)
+
+    async def get_or_fetch(self, provider: str, endpoint: str, seeds: Iterable[str], location: Any, language: Any, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.enabled:
+            return await fetch()
+        value = await self.get(provider, endpoint, seeds, location, language, refresh=fetch)
+        if value is not None:
+            return value
+        key = self.make_key(provider, endpoint, seeds, location, language)
+
+        async def fetch_and_store() -> Any:
+            value = await fetch()
+            if value:
+                await self._store(key, provider, value)
+            return value
+
+        # concurrent misses for the same key wait on one fetch
+        return await single_flight.do(f"cache:{key}", fetch_and_store)
+
+    async def get_kpis(self, provider: str, keywords: List[str], location: Any, language: Any) -> Dict[str, Any]:
+        """Fresh per-keyword KPI rows already seen for this location/language, keyed by keyword."""
+        if not self.enabled or not keywords:
+            return {}
+        now = time.time()
+        found: Dict[str, Any] = {}
+        disk_keys: Dict[str, str] = {}
+        for kw in keywords:
+            key = self.kpi_key(provider, kw, location, language)
+            entry = self._kpis.get(key)
+            if entry is not None and entry[1] > now:
+                found[kw] = entry[0]
+            else:
+                disk_keys[key] = kw
+        if disk_keys:
+            try:
+                rows = await run_blocking(self._disk_get_many, list(disk_keys.keys()))
+            except Exception as e:
+                logger.error(f"keyword cache read failed: {e}")
+                rows = {}
+            for key, entry in rows.items():
+                if entry[1] > now:
+                    self._kpis.set(key, entry)
+                    found[disk_keys[key]] = entry[0]
+        self.stats["kpi_hits"] += len(found)
+        self.stats["kpi_misses"] += len(keywords) - len(found)
+        current_span().set_attributes({"cache.kpi_hits": len(found), "cache.kpi_misses": len(keywords) - len(found)})
+        return found
+
+    async def set_kpis(self, provider: str, rows: List[Dict[str, Any]], location: Any, language: Any) -> None:
+        if not self.enabled or not rows:
+            return
+        items: List[Tuple[str, Entry]] = []
+        for row in rows:
+            kw = row.get("keyword")
+            if not kw:
+                continue
+            key = self.kpi_key(provider, kw, location, language)
+            entry = self._entry(provider, row)
+            self._kpis.set(key, entry)
+            items.append((key, entry))
+        try:
+            await run_blocking(self._disk_put_many, items)
+        except Exception as e:
+            logger.error(f"keyword cache write failed: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "memory_entries": len(self._lists), "kpi_memory_entries": len(self._kpis)}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+keyword_cache = KeywordCache(
+    path=get_env("CACHE_DB_PATH", "cache/keyword_cache.sqlite3"),
+    max_entries=int(get_env("CACHE_MEMORY_ENTRIES", "512")),
+    max_kpi_entries=int(get_env("CACHE_KPI_MEMORY_ENTRIES", "50000")),
+    ttls={
+        provider: int(get_env(f"CACHE_TTL_{provider.upper()}", str(ttl)))
+        for provider, ttl in DEFAULT_TTLS.items()
+    },
+    stale_seconds=int(get_env("CACHE_STALE_SECONDS", str(24 * 3600))),
+    enabled=get_env("CACHE_ENABLED", "true").lower() in ("1", "true", "yes"),
+)
@@ -0,0 +1,297 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple, Set
+
+from ..config import get_env
+from .dataforseo_service import dataforseo_service
+from .google_ads_service import google_ads_service
+from .ms_ads_service import ms_ads_service
+from .serp_service import serp_service
+from .tracing import tracer, current_span
+
+logger = logging.getLogger(__name__)
+
+STRATEGY_MODES = ("sequential", "hedged", "parallel")
+
+
+@dataclass
+class KeywordQuery:
+    seed_keywords: List[str]
+    locations: List[str] = field(default_factory=list)
+    location_code: int = 2840
+    language_code: str = "en"
+    brand_url: Optional[str] = None
+    competitor_url: Optional[str] = None
+
+    @property
+    def brand_tokens(self) -> Set[str]:
+        return dataforseo_service.brand_tokens(self.brand_url, self.competitor_url)
+
+
+@dataclass
+class ProviderResult:
+    keywords: List[Dict[str, Any]]
+    data_source: str
+    attempted: List[str] = field(default_factory=list)
+
+
+class KeywordProvider:
+    """One upstream keyword source. fetch() returns rows in the common shape:
+    keyword, avg_monthly_searches, competition, low/high_top_of_page_bid_micros, source.
+    """
+    name = ""
+    data_source = ""
+
+    @property
+    def is_configured(self) -> bool:
+        return False
+
+    async def fetch(self, query: KeywordQuery) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def stream(self, query: KeywordQuery) -> AsyncIterator[List[Dict[str, Any]]]:
+        # providers without incremental results answer in one batch
+        rows = await self.fetch(query)
+        if rows:
+            yield rows
+
+
+class DataForSEOProvider(KeywordProvider):
+    name = "dataforseo"
+    data_source = "dataforseo_api"
+
+    @property
+    def is_configured(self) -> bool:
+        return dataforseo_service.is_configured
+
+    async def fetch(self, query: KeywordQuery) -> List[Dict[str, Any]]:
+        return await dataforseo_service.get_keyword_data(
+            seed_keywords=query.seed_keywords,
+            location_code=query.location_code,
+            language_code=query.language_code,
+            brand_url=query.brand_url,
+            competitor_url=query.competitor_url,
+            min_volume=300,
+        )
+
+    async def stream(self, query: KeywordQuery) -> AsyncIterator[List[Dict[str, Any]]]:
+        async for batch in dataforseo_service.iter_keyword_data(
+            seed_keywords=query.seed_keywords,
+            location_code=query.location_code,
+            language_code=query.language_code,
+            brand_url=query.brand_url,
+            competitor_url=query.competitor_url,
+            min_volume=300,
+        ):
+            yield batch
+
+
+class GoogleAdsProvider(KeywordProvider):
+    name = "google_ads"
+    data_source = "google_ads_api"
+
+    @property
+    def is_configured(self) -> bool:
+        return google_ads_service.is_configured
+
+    async def fetch(self, query: KeywordQuery) -> List[Dict[str, Any]]:
+        return await google_ads_service.get_keyword_ideas(
+            seed_keywords=query.seed_keywords,
+            location_ids=query.locations,
+        )
+
+
+class MicrosoftAdsProvider(KeywordProvider):
+    name = "ms_ads"
+    data_source = "ms_ads_api"
+
+    @property
+    def is_configured(self) -> bool:
+        return ms_ads_service.is_configured
+
+    async def fetch(self, query: KeywordQuery) -> List[Dict[str, Any]]:
+        if not query.seed_keywords:
+            return []
+        ms_keywords = await ms_ads_service.get_keyword_ideas(
+            seed_keywords=query.seed_keywords,
+            location_ids=query.locations,
+        )
+        return [
+            {
+                "keyword": k.get("keyword") or k.get("text") or "",
+                "avg_monthly_searches": k.get("avg_monthly_searches") or k.get("monthly_searches") or 0,
+                "competition": k.get("competition") or ("High" if (k.get("competition_level") or 0) > 0.66 else ("Medium" if (k.get("competition_level") or 0) > 0.33 else "Low")),
+                "low_top_of_page_bid_micros": int((k.get("cpc_low") or k.get("suggested_bid_low") or 0) * 1_000_000),
+                "high_top_of_page_bid_micros": int((k.get("cpc_high") or k.get("suggested_bid_high") or k.get("cpc") or 0) * 1_000_000),
+                "source": "ms_ads_planner"
+            }
+            for k in (ms_keywords or []) if (k.get("keyword") or k.get("text"))
+        ]
+
+
+class SerpApiProvider(KeywordProvider):
+    name = "serpapi"
+    data_source = "serpapi_fallback"
+
+    @property
+    def is_configured(self) -> bool:
+        return serp_service.is_configured
+
+    async def fetch(self, query: KeywordQuery) -> List[Dict[str, Any]]:
+        if not query.seed_keywords:
+            return []
+        discovered = await serp_service.discover_keywords(query.seed_keywords)
+        return [
+            {
+                "keyword": r["keyword"],
+                "avg_monthly_searches": r.get("score", 0),
+                "competition": "Unknown",
+                "low_top_of_page_bid_micros": 0,
+                "high_top_of_page_bid_micros": 0,
+                "source": "serpapi"
+            }
+            for r in discovered
+        ]
+
+
+class ProviderStrategy:
+    """Runs the keyword providers in priority order under one of three modes:
+    - sequential: next provider only after the previous one came back empty
+    - hedged: also start the next provider if the current one hasn't answered
+      within hedge_delay_ms (or failed); the first non-empty answer wins, even from a
+      lower-priority provider (that is the point of hedging); priority only breaks ties
+      between answers that land together
+    - parallel: call every configured provider at once and merge, earlier
+      providers winning on duplicate keywords
+    """
+
+    def __init__(self, providers: List[KeywordProvider], mode: str = "sequential", hedge_delay_ms: int = 2000) -> None:
+        self.providers = providers
+        self.mode = mode if mode in STRATEGY_MODES else "sequential"
+        self.hedge_delay_ms = hedge_delay_ms
+
+    def _configured(self) -> List[KeywordProvider]:
+        return [p for p in self.providers if p.is_configured]
+
+    async def _attempt(self, provider: KeywordProvider, query: KeywordQuery, reason: str = "primary") -> List[Dict[str, Any]]:
+        # reason: why this provider was called ("primary", "<previous> empty", "<previous> slow", "parallel")
+        with tracer.span(f"provider.{provider.name}", attributes={"provider.name": provider.name, "seed.count": len(query.seed_keywords), "fallback.reason": reason}) as span:
+            try:
+                keywords = await provider.fetch(query) or []
+            except Exception as e:
+                logger.error(f"{provider.name} keyword fetch failed: {e}")
+                span.record_exception(e)
+                keywords = []
+            span.set_attributes({"keyword.count": len(keywords), "provider.outcome": "ok" if keywords else ("error" if span.status else "empty")})
+            return keywords
+
+    async def run(self, query: KeywordQuery, mode: Optional[str] = None) -> ProviderResult:
+        mode = mode if mode in STRATEGY_MODES else self.mode
+        providers = self._configured()
+        if not providers:
+            return ProviderResult(keywords=[], data_source="none")
+        with tracer.span("keyword_strategy.run", attributes={"strategy.mode": mode, "seed.count": len(query.seed_keywords), "location.code": query.location_code}) as span:
+            if mode == "parallel":
+                result = await self._run_parallel(providers, query)
+            elif mode == "hedged":
+                result = await self._run_hedged(providers, query)
+            else:
+                result = await self._run_sequential(providers, query)
+            span.set_attributes({"data_source": result.data_source, "keyword.count": len(result.keywords), "providers.attempted": result.attempted})
+            return result
+
+    async def stream(self, query: KeywordQuery, mode: Optional[str] = None) -> AsyncIterator[Tuple[str, List[Dict[str, Any]]]]:
+        """Yields (data_source, batch) pairs. Sequential mode streams each provider's batches
+        as they land and stops at the first provider that produced any; hedged and parallel
+        modes have to see whole results, so they yield their winner as a single batch.
+        """
+        mode = mode if mode in STRATEGY_MODES else self.mode
+        if mode != "sequential":
+            result = await self.run(query, mode=mode)
+            if result.keywords:
+                yield result.data_source, result.keywords
+            return
+        for provider in self._configured():
+            produced = 0
+            try:
+                async for batch in provider.stream(query):
+                    if batch:
+                        produced += len(batch)
+                        yield provider.data_source, batch
+            except Exception as e:
+                logger.error(f"{provider.name} keyword stream failed: {e}")
+            # an async generator can't own a span across yields; the request span gets an event per provider
+            current_span().add_event("provider.stream", provider=provider.name, keyword_count=produced)
+            if produced:
+                return
+
+    async def _run_sequential(self, providers: List[KeywordProvider], query: KeywordQuery) -> ProviderResult:
+        attempted: List[str] = []
+        for provider in providers:
+            reason = f"{attempted[-1]} empty" if attempted else "primary"
+            attempted.append(provider.name)
+            keywords = await self._attempt(provider, query, reason)
+            if keywords:
+                return ProviderResult(keywords=keywords, data_source=provider.data_source, attempted=attempted)
+        return ProviderResult(keywords=[], data_source="none", attempted=attempted)
+
+    async def _run_hedged(self, providers: List[KeywordProvider], query: KeywordQuery) -> ProviderResult:
+        attempted: List[str] = []
+        pending: Dict[asyncio.Task, int] = {}
+        delay = max(0.0, self.hedge_delay_ms / 1000.0)
+
+        def launch_next(reason: str) -> None:
+            idx = len(attempted)
+            attempted.append(providers[idx].name)
+            task = asyncio.create_task(self._attempt(providers[idx], query, reason))
+            pending[task] = idx
+
+        launch_next("primary")
+        try:
+            while pending:
+                can_hedge = len(attempted) < len(providers)
+                done, _ = await asyncio.wait(
+                    list(pending.keys()),
+                    timeout=delay if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    # current provider is slow - hedge with the next one
+                    launch_next(f"{attempted[-1]} slow")
+                    continue
+                came_back_empty = None
+                # answers landing together are taken in priority order
+                for task in sorted(done, key=lambda t: pending[t]):
+                    idx = pending.pop(task)
+                    keywords = task.result()
+                    if keywords:
+                        return ProviderResult(keywords=keywords, data_source=providers[idx].data_source, attempted=attempted)
+                    came_back_empty = providers[idx].name
+                if came_back_empty and len(attempted) < len(providers):
+                    launch_next(f"{came_back_empty} empty")
+            return ProviderResult(keywords=[], data_source="none", attempted=attempted)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _run_parallel(self, providers: List[KeywordProvider], query: KeywordQuery) -> ProviderResult:
+        outcomes = await asyncio.gather(*(self._attempt(p, query, "parallel") for p in providers))
+        merged: Dict[str, Dict[str, Any]] = {}
+        data_source = "none"
+        for provider, keywords in zip(providers, outcomes):
+            if keywords and data_source == "none":
+                data_source = provider.data_source
+            for kw in keywords:
+                key = (kw.get("keyword") or "").strip().lower()
+                if key and key not in merged:
+                    merged[key] = kw
+        return ProviderResult(keywords=list(merged.values()), data_source=data_source, attempted=[p.name for p in providers])
+
+
+# Priority: DataForSEO → Google Ads → Microsoft Ads → SerpAPI discovery
+keyword_strategy = ProviderStrategy(
+    providers=[DataForSEOProvider(), GoogleAdsProvider(), MicrosoftAdsProvider(), SerpApiProvider()],
+    mode=get_env("KEYWORD_PROVIDER_STRATEGY", "sequential"),
+    hedge_delay_ms=int(get_env("KEYWORD_HEDGE_DELAY_MS", "2000")),
+)
@@ -0,0 +1,285 @@
+import asyncio
+import bisect
+import functools
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from ..config import get_env
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+COUNT_BUCKETS = (0, 1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+
+    def _key(self, labels: Dict[str, Any]) -> Labels:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labels)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram; per label set it keeps bucket counts, sum and count."""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [per-bucket counts..., +Inf count], sum
+        self._values: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, (counts, total) in self._values.items():
+            running = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                running += count
+                le = 'le="%s"' % _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {running}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {running}")
+        return lines
+
+
+# (name, help, [(labels, value), ...]) gauges computed at scrape time
+Collector = Callable[[], List[Tuple[str, str, List[Tuple[Dict[str, Any], float]]]]]
+
+
+class MetricsRegistry:
+    """In-process metrics rendered in the Prometheus text format (GET /metrics).
+    Everything is updated from the event loop, so no locking. Collectors turn existing
+    counters (cache, coalescing, provider guards) into gauges at scrape time.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Collector] = []
+
+    def _add(self, metric: _Metric) -> Any:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def add_collector(self, collector: Collector) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                logger.error(f"metrics collector failed: {e}")
+                continue
+            for name, help, samples in families:
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry(enabled=get_env("METRICS_ENABLED", "true").lower() in ("1", "true", "yes"))
+
+HTTP_DURATION = metrics.histogram("sem_http_request_duration_seconds", "API request latency by handler, until the last body byte", ["method", "handler", "status"])
+HTTP_REQUEST_BYTES = metrics.histogram("sem_http_request_size_bytes", "API request body size", ["handler"], SIZE_BUCKETS)
+HTTP_RESPONSE_BYTES = metrics.histogram("sem_http_response_size_bytes", "API response body size", ["handler"], SIZE_BUCKETS)
+UPSTREAM_DURATION = metrics.histogram("sem_upstream_duration_seconds", "Provider call latency (cache, coalescing and retries included)", ["provider", "endpoint", "outcome"])
+UPSTREAM_HTTP = metrics.counter("sem_upstream_http_responses_total", "Raw upstream HTTP responses by host and status", ["host", "status"])
+UPSTREAM_BYTES = metrics.histogram("sem_upstream_response_size_bytes", "Upstream HTTP response body size", ["host"], SIZE_BUCKETS)
+STAGE_DURATION = metrics.histogram("sem_stage_duration_seconds", "Time spent in a planning stage", ["stage"])
+STAGE_KEYWORDS = metrics.histogram("sem_stage_keywords", "Keywords coming out of a planning stage", ["stage"], COUNT_BUCKETS)
+CPU_TASK_DURATION = metrics.histogram("sem_cpu_task_duration_seconds", "Planning stage tasks: time queued for a pool worker and time running in it, or inline run time", ["task", "phase"])
+LOOP_LAG = metrics.histogram("sem_event_loop_lag_seconds", "How late the event loop ran a timer", buckets=LAG_BUCKETS)
+LOOP_LAG_LAST = metrics.gauge("sem_event_loop_lag_last_seconds", "Most recent event loop lag sample")
+
+
+def track_upstream(provider: str, endpoint: Union[str, Callable[..., str]]) -> Callable:
+    """Decorator for async provider calls. endpoint is a label or a function of the call's
+    arguments. outcome is ok / empty (falsy result, which is how providers report
+    failures) / error / cancelled."""
+    def wrap(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        async def inner(*args: Any, **kwargs: Any) -> Any:
+            if not metrics.enabled:
+                return await fn(*args, **kwargs)
+            name = endpoint(*args, **kwargs) if callable(endpoint) else endpoint
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                result = await fn(*args, **kwargs)
+                outcome = "ok" if result else "empty"
+                return result
+            except asyncio.CancelledError:
+                outcome = "cancelled"
+                raise
+            finally:
+                UPSTREAM_DURATION.observe(time.perf_counter() - started, provider=provider, endpoint=name, outcome=outcome)
+        return inner
+    return wrap
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """Times a planning stage; usable as a context manager or a decorator."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if metrics.enabled:
+            STAGE_DURATION.observe(time.perf_counter() - started, stage=stage)
+
+
+def observe_keywords(stage: str, count: int) -> None:
+    if metrics.enabled:
+        STAGE_KEYWORDS.observe(count, stage=stage)
+
+
+def observe_upstream_response(host: str, status: Union[int, str], size: Optional[int] = None) -> None:
+    if metrics.enabled:
+        UPSTREAM_HTTP.inc(host=host, status=status)
+        if size is not None:
+            UPSTREAM_BYTES.observe(size, host=host)
+
+
+class MetricsMiddleware:
+    """ASGI middleware: latency, request and response size per handler. Handlers are
+    labelled by endpoint function name (bounded, unlike raw paths). Streaming responses
+    are timed until their last frame."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or not metrics.enabled:
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = {"code": 500}
+        sent = {"bytes": 0}
+        received = {"bytes": 0}
+
+        async def counting_receive() -> Dict[str, Any]:
+            message = await receive()
+            if message["type"] == "http.request":
+                received["bytes"] += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            elif message["type"] == "http.response.body":
+                sent["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            endpoint = scope.get("endpoint")
+            handler = getattr(endpoint, "__name__", "unmatched")
+            HTTP_DURATION.observe(time.perf_counter() - started, method=scope.get("method", ""), handler=handler, status=status["code"])
+            HTTP_REQUEST_BYTES.observe(received["bytes"], handler=handler)
+            HTTP_RESPONSE_BYTES.observe(sent["bytes"], handler=handler)
+
+
+class LoopLagMonitor:
+    """Sleeps `interval` seconds in a loop and records how late it woke up: a direct measure
+    of how long something blocked the event loop."""
+
+    def __init__(self, interval: float = 0.5) -> None:
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            LOOP_LAG.observe(lag)
+            LOOP_LAG_LAST.set(lag)
+
+    def start(self) -> None:
+        if metrics.enabled and self.interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+loop_lag_monitor = LoopLagMonitor(interval=float(get_env("METRICS_LOOP_LAG_INTERVAL", "0.5")))
@@ -1,16 +1,30 @@
 import os
+import asyncio
 import logging
-from typing import List, Dict, Any
+import threading
+import time
+from typing import List, Dict, Any, Optional
 
 from zeep import Client
+from zeep.cache import SqliteCache
 from zeep.transports import Transport
 from zeep.plugins import HistoryPlugin
 from requests_oauthlib import OAuth2Session
 from requests import Session
 
+from .http_client import run_blocking
+from .keyword_cache import keyword_cache
+from .resilience import provider_guards, is_retryable
+from .metrics import track_upstream
+from .tracing import traced
+
 logger = logging.getLogger(__name__)
 
 ADINSIGHT_WSDL = "https://clientcenter.api.bingads.microsoft.com/Api/Advertiser/AdInsight/v13/AdInsightService.svc?singleWsdl"
+ADINSIGHT_BINDING = '{https://bingads.microsoft.com/AdInsight/v13}BasicHttpBinding_IAdInsightService'
+TOKEN_URL = "https://login.live.com/oauth20_token.srf"
+# the background refresher never runs more often than this, whatever the token lifetime
+TOKEN_MIN_REFRESH_INTERVAL = 30.0
 
 class MicrosoftAdsService:
     def __init__(self):
@@ -28,47 +42,137 @@ class MicrosoftAdsService:
             self.account_id
         ])
         self._client = None
+        self._service = None
         self._history = HistoryPlugin()
+        # a bundled copy of the WSDL skips the download entirely; otherwise zeep caches it on disk
+        self.wsdl = os.getenv('MSADS_WSDL_PATH') or ADINSIGHT_WSDL
+        self.wsdl_cache_path = os.getenv('MSADS_WSDL_CACHE_PATH', 'cache/msads_wsdl.sqlite3')
+        self.wsdl_cache_ttl = int(os.getenv('MSADS_WSDL_CACHE_TTL', str(7 * 24 * 3600)))
+        # refresh this many seconds before the access token expires
+        self.token_refresh_margin = int(os.getenv('MSADS_TOKEN_REFRESH_MARGIN', '300'))
+        self._access_token = ""
+        self._token_expires_at = 0.0
+        # margin for the current token: short-lived tokens get at most half their lifetime
+        self._token_margin = float(self.token_refresh_margin)
+        self._token_lock = threading.Lock()
+        self._client_lock = threading.Lock()
+        self._refresher: Optional[asyncio.Task] = None
+        self.guard = provider_guards["ms_ads"]
 
-    def _get_access_token(self) -> str:
+    def _token_is_fresh(self) -> bool:
+        return bool(self._access_token) and time.time() < self._token_expires_at - self._token_margin
+
+    def _refresh_access_token(self) -> str:
         try:
             oauth = OAuth2Session(self.client_id)
             token = oauth.refresh_token(
-                "https://login.live.com/oauth20_token.srf",
+                TOKEN_URL,
                 refresh_token=self.refresh_token,
                 client_id=self.client_id,
                 client_secret=self.client_secret or "",
             )
-            return token.get("access_token", "")
+            self._access_token = token.get("access_token", "")
+            expires_in = float(token.get("expires_in") or 3600)
+            self._token_expires_at = time.time() + expires_in
+            self._token_margin = min(float(self.token_refresh_margin), expires_in / 2)
+            # Microsoft may rotate the refresh token on every exchange
+            self.refresh_token = token.get("refresh_token") or self.refresh_token
+            return self._access_token
         except Exception as e:
             logger.error(f"MS Ads OAuth refresh failed: {e}")
             return ""
 
+    def _get_access_token(self) -> str:
+        if self._token_is_fresh():
+            return self._access_token
+        with self._token_lock:
+            if self._token_is_fresh():
+                return self._access_token
+            return self._refresh_access_token()
+
+    async def _refresh_loop(self) -> None:
+        # keep the cached token ahead of its expiry so requests never wait on login.live.com
+        while True:
+            wait = self._token_expires_at - self._token_margin - time.time()
+            await asyncio.sleep(max(wait, TOKEN_MIN_REFRESH_INTERVAL))
+            with_token = await run_blocking(self._get_access_token)
+            if not with_token:
+                await asyncio.sleep(60)
+
+    def _ensure_refresher(self) -> None:
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.create_task(self._refresh_loop())
+
     def _ensure_client(self) -> Client:
         if self._client is not None:
             return self._client
-        try:
-            session = Session()
-            transport = Transport(session=session, timeout=30)
-            self._client = Client(wsdl=ADINSIGHT_WSDL, transport=transport, plugins=[self._history])
-            return self._client
-        except Exception as e:
-            logger.error(f"MS Ads zeep client init failed: {e}")
-            raise
+        with self._client_lock:
+            if self._client is not None:
+                return self._client
+            try:
+                session = Session()
+                folder = os.path.dirname(self.wsdl_cache_path)
+                if folder:
+                    os.makedirs(folder, exist_ok=True)
+                cache = SqliteCache(path=self.wsdl_cache_path, timeout=self.wsdl_cache_ttl)
+                transport = Transport(session=session, timeout=30, cache=cache)
+                self._client = Client(wsdl=self.wsdl, transport=transport, plugins=[self._history])
+                return self._client
+            except Exception as e:
+                logger.error(f"MS Ads zeep client init failed: {e}")
+                raise
+
+    def _ensure_service(self):
+        if self._service is not None:
+            return self._service
+        # the client first: _client_lock is not reentrant
+        client = self._ensure_client()
+        with self._client_lock:
+            if self._service is None:
+                self._service = client.create_service(ADINSIGHT_BINDING, ADINSIGHT_WSDL)
+            return self._service
 
+    def _warm(self) -> None:
+        self._get_access_token()
+        self._ensure_service()
+
+    async def warmup(self) -> None:
+        if not self.is_configured:
+            return
+        await run_blocking(self._warm)
+        self._ensure_refresher()
+
+    async def close(self) -> None:
+        if self._refresher is not None:
+            self._refresher.cancel()
+            self._refresher = None
+
+    @track_upstream("ms_ads", "keyword_ideas")
+    @traced("ms_ads.keyword_ideas", lambda self, seed_keywords, *a, **kw: {"seed.count": len(seed_keywords or [])}, result_count="keyword.count")
     async def get_keyword_ideas(self, seed_keywords: List[str], language: str = 'en', location_ids: List[str] = None) -> List[Dict[str, Any]]:
         if not self.is_configured or not seed_keywords:
             return []
+        self._ensure_refresher()
+        # OAuth refresh, WSDL load and the SOAP call are all blocking - keep them off the event loop
+        return await keyword_cache.get_or_fetch(
+            "ms_ads", "keyword_ideas", seed_keywords, ",".join(map(str, location_ids or [])), language,
+            lambda: self._guarded_keyword_ideas(seed_keywords, language, location_ids),
+        )
+
+    async def _guarded_keyword_ideas(self, seed_keywords: List[str], language: str, location_ids: List[str]) -> List[Dict[str, Any]]:
+        try:
+            return await self.guard.call(lambda: run_blocking(self._fetch_keyword_ideas, seed_keywords, language, location_ids))
+        except Exception as e:
+            logger.error(f"MS Ads keyword ideas error: {e}")
+            return []
+
+    def _fetch_keyword_ideas(self, seed_keywords: List[str], language: str, location_ids: List[str]) -> List[Dict[str, Any]]:
         try:
             access_token = self._get_access_token()
             if not access_token:
                 return []
 
-            client = self._ensure_client()
-            service = client.create_service(
-                '{https://bingads.microsoft.com/AdInsight/v13}BasicHttpBinding_IAdInsightService',
-                ADINSIGHT_WSDL,
-            )
+            service = self._ensure_service()
 
             headers = {
                 'AuthenticationToken': access_token,
@@ -123,6 +227,9 @@ class MicrosoftAdsService:
                     continue
             return results
         except Exception as e:
+            if is_retryable(e):
+                # throttling / transport errors go back to the guard for retry and the breaker
+                raise
             logger.error(f"MS Ads keyword ideas error: {e}")
             return []
 
@@ -0,0 +1,263 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from ..config import get_env
+from ..engine.keyword_frame import KeywordFrame
+from .http_client import run_blocking
+from .wire_format import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# KeywordFrame column dtypes for the disk format
+COLUMN_DTYPES = {
+    "keyword": object,
+    "volume": np.int64,
+    "competition": np.int8,
+    "bid_low": np.float64,
+    "bid_high": np.float64,
+    "source": object,
+    "intent": object,
+    "difficulty": np.float64,
+    "opportunity": np.float64,
+}
+# rough per-row overhead of the columns plus the python strings behind the object columns
+ROW_BYTES = 200
+
+
+class PlanSession:
+    """Server-side state of one plan, so later stages send a plan_id instead of the data:
+    - frame: the scored keywords /generate_keywords returned
+    - selection: frame rows kept by the last /filter_keywords (None = all)
+    - ad_groups: the last /group_keywords result, keywords held as frame rows
+    """
+
+    __slots__ = ("plan_id", "frame", "selection", "ad_groups", "created_at", "expires_at", "size")
+
+    def __init__(self, plan_id: str, frame: KeywordFrame, selection: Optional[np.ndarray] = None, ad_groups: Optional[List[Dict[str, Any]]] = None, created_at: Optional[float] = None, expires_at: float = 0.0) -> None:
+        self.plan_id = plan_id
+        self.frame = frame
+        self.selection = selection
+        self.ad_groups = ad_groups
+        self.created_at = created_at or time.time()
+        self.expires_at = expires_at
+        self.size = 0
+
+    def keywords(self) -> KeywordFrame:
+        """The current working set: filtered keywords if a filter ran, else all of them."""
+        return self.frame if self.selection is None else self.frame.take(self.selection)
+
+    def estimate_size(self) -> int:
+        rows = len(self.frame) + (0 if self.selection is None else len(self.selection))
+        rows += sum(len(g["rows"]) for g in self.ad_groups or [])
+        self.size = rows * ROW_BYTES + sum(map(len, self.frame.keyword.tolist()))
+        return self.size
+
+    def encode(self) -> bytes:
+        payload = {
+            "columns": {name: getattr(self.frame, name) for name in COLUMN_DTYPES},
+            "selection": self.selection,
+            "ad_groups": self.ad_groups,
+            "created_at": self.created_at,
+        }
+        # level 1: keyword lists compress ~8x even at the fastest setting
+        return zlib.compress(dumps(payload), 1)
+
+    @classmethod
+    def decode(cls, plan_id: str, blob: bytes, expires_at: float) -> "PlanSession":
+        payload = loads(zlib.decompress(blob))
+        frame = KeywordFrame(**{name: np.array(payload["columns"][name], dtype=dtype) for name, dtype in COLUMN_DTYPES.items()})
+        selection = payload.get("selection")
+        ad_groups = payload.get("ad_groups")
+        for group in ad_groups or []:
+            group["rows"] = np.array(group["rows"], dtype=np.int64)
+        return cls(
+            plan_id, frame,
+            selection=None if selection is None else np.array(selection, dtype=np.int64),
+            ad_groups=ad_groups,
+            created_at=payload.get("created_at"),
+            expires_at=expires_at,
+        )
+
+
+class PlanSessionStore:
+    """Plan sessions with a bounded memory tier and an on-disk spill.
+    - memory: LRU capped by session count and estimated bytes; evicted sessions are
+      written to SQLite (zlib-compressed) instead of being dropped
+    - disk: read back on a memory miss; stop() spills whatever is still in memory
+    - expiry: ttl_seconds after the last access, in both tiers
+    """
+
+    def __init__(self, path: str, ttl_seconds: int = 3600, max_entries: int = 256, max_bytes: int = 256 * 1024 * 1024, enabled: bool = True) -> None:
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._memory: "OrderedDict[str, PlanSession]" = OrderedDict()
+        self._bytes = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"created": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "spilled": 0}
+
+    # disk tier
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS sessions (plan_id TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)")
+            self._conn = conn
+        return self._conn
+
+    def _disk_put(self, sessions: List[PlanSession]) -> None:
+        rows = [(s.plan_id, s.encode(), s.expires_at) for s in sessions]
+        with self._lock:
+            db = self._db()
+            db.executemany("INSERT OR REPLACE INTO sessions (plan_id, value, expires_at) VALUES (?, ?, ?)", rows)
+            db.execute("DELETE FROM sessions WHERE expires_at < ?", (time.time(),))
+            db.commit()
+
+    def _disk_get(self, plan_id: str) -> Optional[PlanSession]:
+        with self._lock:
+            row = self._db().execute("SELECT value, expires_at FROM sessions WHERE plan_id = ? AND expires_at > ?", (plan_id, time.time())).fetchone()
+        return PlanSession.decode(plan_id, row[0], row[1]) if row else None
+
+    def _disk_delete(self, plan_id: str) -> bool:
+        with self._lock:
+            db = self._db()
+            deleted = db.execute("DELETE FROM sessions WHERE plan_id = ?", (plan_id,)).rowcount
+            db.commit()
+        return deleted > 0
+
+    def _purge(self) -> int:
+        with self._lock:
+            db = self._db()
+            deleted = db.execute("DELETE FROM sessions WHERE expires_at < ?", (time.time(),)).rowcount
+            db.commit()
+        return deleted
+
+    # memory tier
+
+    def _remember(self, session: PlanSession) -> List[PlanSession]:
+        """Puts the session in memory; returns the sessions evicted to make room."""
+        old = self._memory.pop(session.plan_id, None)
+        if old is not None:
+            self._bytes -= old.size
+        self._bytes += session.estimate_size()
+        self._memory[session.plan_id] = session
+        evicted: List[PlanSession] = []
+        now = time.time()
+        while self._memory and (len(self._memory) > self.max_entries or self._bytes > self.max_bytes):
+            _, victim = self._memory.popitem(last=False)
+            self._bytes -= victim.size
+            if victim.expires_at > now:
+                evicted.append(victim)
+        return evicted
+
+    async def _spill(self, sessions: List[PlanSession]) -> None:
+        if not sessions:
+            return
+        try:
+            await run_blocking(self._disk_put, sessions)
+            self.stats["spilled"] += len(sessions)
+        except Exception as e:
+            logger.error(f"plan session spill failed ({len(sessions)} sessions lost): {e}")
+
+    # public api
+
+    async def create(self, frame: KeywordFrame, selection: Optional[np.ndarray] = None, ad_groups: Optional[List[Dict[str, Any]]] = None) -> Optional[str]:
+        if not self.enabled:
+            return None
+        session = PlanSession(uuid.uuid4().hex, frame, selection=selection, ad_groups=ad_groups, expires_at=time.time() + self.ttl_seconds)
+        self.stats["created"] += 1
+        await self._spill(self._remember(session))
+        return session.plan_id
+
+    async def get(self, plan_id: str) -> Optional[PlanSession]:
+        """The live session (its expiry pushed back), or None if unknown or expired."""
+        if not self.enabled or not plan_id:
+            return None
+        now = time.time()
+        session = self._memory.get(plan_id)
+        if session is not None and session.expires_at <= now:
+            self._memory.pop(plan_id)
+            self._bytes -= session.size
+            session = None
+        if session is not None:
+            self.stats["memory_hits"] += 1
+            self._memory.move_to_end(plan_id)
+        else:
+            try:
+                session = await run_blocking(self._disk_get, plan_id)
+            except Exception as e:
+                logger.error(f"plan session read failed: {e}")
+                session = None
+            if session is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["disk_hits"] += 1
+            await self._spill(self._remember(session))
+        session.expires_at = now + self.ttl_seconds
+        return session
+
+    async def save(self, session: PlanSession) -> None:
+        """Call after changing a session (selection, ad groups): re-sizes it against the caps."""
+        if self.enabled:
+            await self._spill(self._remember(session))
+
+    async def discard(self, plan_id: str) -> bool:
+        session = self._memory.pop(plan_id, None)
+        if session is not None:
+            self._bytes -= session.size
+        try:
+            deleted = await run_blocking(self._disk_delete, plan_id)
+        except Exception as e:
+            logger.error(f"plan session delete failed: {e}")
+            deleted = False
+        return session is not None or deleted
+
+    async def start(self) -> None:
+        if not self.enabled:
+            return
+        try:
+            purged = await run_blocking(self._purge)
+            if purged:
+                logger.info(f"purged {purged} expired plan sessions")
+        except Exception as e:
+            logger.error(f"plan session store unavailable: {e}")
+
+    async def stop(self) -> None:
+        # sessions still in memory survive a restart through the disk tier
+        now = time.time()
+        await self._spill([s for s in self._memory.values() if s.expires_at > now])
+        self._memory.clear()
+        self._bytes = 0
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"memory_sessions": len(self._memory), "memory_bytes": self._bytes, **self.stats}
+
+
+plan_sessions = PlanSessionStore(
+    path=get_env("PLAN_SESSION_DB_PATH", "cache/plan_sessions.sqlite3"),
+    ttl_seconds=int(get_env("PLAN_SESSION_TTL_SECONDS", "3600")),
+    max_entries=int(get_env("PLAN_SESSION_MEMORY_ENTRIES", "256")),
+    max_bytes=int(get_env("PLAN_SESSION_MEMORY_MB", "256")) * 1024 * 1024,
+    enabled=get_env("PLAN_SESSIONS_ENABLED", "true").lower() in ("1", "true", "yes"),
+)
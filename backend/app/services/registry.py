@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from ..config import get_env
+from .dataforseo_service import dataforseo_service
+from .google_ads_service import google_ads_service
+from .ms_ads_service import ms_ads_service
+from .serp_service import serp_service
+from .http_client import http_transport, blocking_pool
+from .keyword_cache import keyword_cache
+from .job_queue import job_queue
+from .plan_sessions import plan_sessions
+from .cpu_pool import cpu_pool
+from .metrics import loop_lag_monitor
+from .tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceRegistry:
+    """Owns the provider singletons for the app's lifetime.
+    startup() warms every configured provider concurrently (TLS sessions, OAuth tokens,
+    gRPC channels, the zeep client) so the first request doesn't pay for it.
+    If warm-up outlives warmup_timeout the app starts serving anyway and the
+    remaining work finishes in the background; health() reports where it stands.
+    """
+
+    def __init__(self, services: Dict[str, Any], warmup_timeout: float = 20.0) -> None:
+        self.services = services
+        self.warmup_timeout = warmup_timeout
+        self.status: Dict[str, str] = {}
+        self.ready = False
+        self.warmup_ms: Optional[float] = None
+        self._warmup: Optional[asyncio.Task] = None
+
+    async def _warm_one(self, name: str, service: Any) -> None:
+        if not service.is_configured:
+            self.status[name] = "not_configured"
+            return
+        self.status[name] = "warming"
+        try:
+            await service.warmup()
+            self.status[name] = "ready"
+        except Exception as e:
+            # provider stays usable; the first real call just pays the cold cost
+            logger.warning(f"{name} warm-up failed: {e}")
+            self.status[name] = "degraded"
+
+    async def _warm_all(self) -> None:
+        started = time.perf_counter()
+        await asyncio.gather(*(self._warm_one(name, svc) for name, svc in self.services.items()))
+        self.warmup_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.ready = True
+        logger.info(f"provider warm-up finished in {self.warmup_ms} ms: {self.status}")
+
+    async def startup(self) -> None:
+        self._warmup = asyncio.create_task(self._warm_all())
+        try:
+            await asyncio.wait_for(asyncio.shield(self._warmup), timeout=self.warmup_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"provider warm-up still running after {self.warmup_timeout}s, serving anyway")
+        loop_lag_monitor.start()
+        cpu_pool.start()
+        tracer.exporter.start()
+        # picks up jobs a previous process left queued or running
+        await job_queue.start()
+        await plan_sessions.start()
+
+    async def shutdown(self) -> None:
+        if self._warmup is not None and not self._warmup.done():
+            self._warmup.cancel()
+        await job_queue.stop()
+        await loop_lag_monitor.stop()
+        # last batch of spans goes out while the transport and blocking pool are still up
+        await tracer.exporter.stop()
+        # in-memory plan sessions spill to disk through the blocking pool
+        await plan_sessions.stop()
+        await ms_ads_service.close()
+        await http_transport.aclose()
+        blocking_pool.shutdown(wait=False, cancel_futures=True)
+        keyword_cache.close()
+        cpu_pool.close()
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "status": "healthy" if self.ready else "warming_up",
+            "ready": self.ready,
+            "warmup_ms": self.warmup_ms,
+            "services": dict(self.status),
+        }
+
+
+service_registry = ServiceRegistry(
+    services={
+        "dataforseo": dataforseo_service,
+        "google_ads": google_ads_service,
+        "ms_ads": ms_ads_service,
+        "serpapi": serp_service,
+    },
+    warmup_timeout=float(get_env("STARTUP_WARMUP_TIMEOUT", "20")),
+)
@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+import requests
+
+from ..config import get_env
+from .tracing import current_span
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+# gRPC codes worth another attempt (Google Ads)
+RETRYABLE_GRPC = {"UNAVAILABLE", "DEADLINE_EXCEEDED", "RESOURCE_EXHAUSTED", "ABORTED", "INTERNAL"}
+
+# requests/second and burst per provider, sized to the published quotas:
+# DataForSEO 2000 calls/min, SerpAPI plan throughput, Google Ads planner ~1 QPS per customer
+DEFAULT_RATES = {
+    "dataforseo": (30.0, 30),
+    "serpapi": (5.0, 10),
+    "google_ads": (1.0, 2),
+    "ms_ads": (2.0, 4),
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose breaker is open."""
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code
+    # zeep.exceptions.TransportError and friends
+    code = getattr(exc, "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def _grpc_code(exc: BaseException) -> Optional[str]:
+    # GoogleAdsException keeps the grpc call on .error; a bare grpc.RpcError is the call itself
+    call = getattr(exc, "error", None) or exc
+    code = getattr(call, "code", None)
+    if callable(code):
+        try:
+            return getattr(code(), "name", None)
+        except Exception:
+            return None
+    return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Throttling, 5xx, timeouts and dropped connections; anything else is the caller's fault."""
+    if isinstance(exc, (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError, asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    # zeep (Microsoft Ads) runs on requests
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True
+    status = _status_code(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return _grpc_code(exc) in RETRYABLE_GRPC
+
+
+def _is_throttle(exc: BaseException) -> bool:
+    return _status_code(exc) == 429 or _grpc_code(exc) == "RESOURCE_EXHAUSTED"
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    if isinstance(exc, httpx.HTTPStatusError):
+        value = exc.response.headers.get("retry-after")
+        try:
+            return float(value) if value is not None else None
+        except ValueError:
+            return None
+    return None
+
+
+class TokenBucket:
+    """Async token bucket. The refill rate adapts: halved on every throttle response
+    (down to min_rate) and grown back by a small step per success (AIMD)."""
+
+    def __init__(self, rate: float, burst: int, min_rate: float = 0.1) -> None:
+        self.max_rate = max(rate, min_rate)
+        self.rate = self.max_rate
+        self.burst = max(1, burst)
+        self.min_rate = min_rate
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        # the lock queues waiters in arrival order
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+    def throttled(self) -> None:
+        self.rate = max(self.min_rate, self.rate / 2)
+
+    def succeeded(self) -> None:
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class CircuitBreaker:
+    """closed -> open after failure_threshold consecutive upstream failures; open rejects
+    every call until reset_seconds pass, then half-open lets one probe through, whose
+    outcome closes or re-opens it."""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30.0) -> None:
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+            self.state = "half_open"
+        if self.state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def release_probe(self) -> None:
+        self._probing = False
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning(f"{self.name} circuit opened after {self.failures} failures")
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+
+class ProviderGuard:
+    """Rate limit + retry + circuit breaker around one provider's upstream calls.
+    call(fn) fails fast with CircuitOpenError while the breaker is open, waits for a
+    token, and retries retryable failures with full-jitter exponential backoff
+    (honouring Retry-After). Only retryable failures count against the breaker:
+    a 400 means the upstream is alive.
+    """
+
+    def __init__(self, name: str, bucket: TokenBucket, breaker: CircuitBreaker, max_retries: int = 2, base_delay: float = 0.25, max_delay: float = 5.0, retryable: Callable[[BaseException], bool] = is_retryable) -> None:
+        self.name = name
+        self.bucket = bucket
+        self.breaker = breaker
+        self.max_retries = max(0, max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retryable = retryable
+        self.stats = {"calls": 0, "retries": 0, "failures": 0, "rejected": 0, "throttled": 0}
+
+    async def call(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.stats["calls"] += 1
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self.stats["rejected"] += 1
+                current_span().set_attribute("circuit.open", True)
+                raise CircuitOpenError(f"{self.name} circuit open")
+            await self.bucket.acquire()
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                # a cancelled probe must not leave the breaker stuck half-open
+                self.breaker.release_probe()
+                raise
+            except Exception as e:
+                if not self.retryable(e):
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if _is_throttle(e):
+                    self.stats["throttled"] += 1
+                    self.bucket.throttled()
+                if attempt >= self.max_retries or self.breaker.state == "open":
+                    self.stats["failures"] += 1
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                hinted = _retry_after(e)
+                if hinted is not None:
+                    delay = max(delay, min(hinted, self.max_delay))
+                attempt += 1
+                self.stats["retries"] += 1
+                current_span().add_event("retry", attempt=attempt, delay_s=round(delay, 3), error=str(e))
+                logger.info(f"{self.name} retry {attempt}/{self.max_retries} in {delay:.2f}s: {e}")
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            self.bucket.succeeded()
+            return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"state": self.breaker.state, "rate": round(self.bucket.rate, 3), **self.stats}
+
+
+def _guard(name: str, rate: float, burst: int) -> ProviderGuard:
+    prefix = name.upper()
+    return ProviderGuard(
+        name,
+        bucket=TokenBucket(
+            rate=float(get_env(f"RATE_LIMIT_{prefix}", str(rate))),
+            burst=int(get_env(f"RATE_BURST_{prefix}", str(burst))),
+        ),
+        breaker=CircuitBreaker(
+            name,
+            failure_threshold=int(get_env("BREAKER_FAILURE_THRESHOLD", "5")),
+            reset_seconds=float(get_env("BREAKER_RESET_SECONDS", "30")),
+        ),
+        max_retries=int(get_env("RETRY_MAX_ATTEMPTS", "2")),
+        base_delay=float(get_env("RETRY_BASE_DELAY_MS", "250")) / 1000,
+        max_delay=float(get_env("RETRY_MAX_DELAY_MS", "5000")) / 1000,
+    )
+
+
+provider_guards: Dict[str, ProviderGuard] = {name: _guard(name, rate, burst) for name, (rate, burst) in DEFAULT_RATES.items()}
+
+
+def guard_snapshot() -> Dict[str, Any]:
+    return {name: guard.snapshot() for name, guard in provider_guards.items()}
@@ -1,87 +1,114 @@
+import asyncio
 import logging
-from typing import List, Dict, Any
-import requests
+from typing import List, Dict, Any, Optional, Set
 from ..config import get_env
+from .http_client import http_transport
+from .keyword_cache import keyword_cache
+from .resilience import provider_guards
+from .metrics import track_upstream
+from .tracing import traced
+from .single_flight import single_flight, request_key
 
 logger = logging.getLogger(__name__)
 
 class SerpService:
     def __init__(self):
         self.api_key = get_env('SERPAPI_KEY')
-        self.base_url = 'https://serpapi.com/search.json'
+        self.base = get_env('SERPAPI_BASE_URL', 'https://serpapi.com')
+        self.base_url = f"{self.base}/search.json"
         self.is_configured = bool(self.api_key)
+        self.discovery_depth = int(get_env('SERPAPI_DISCOVERY_DEPTH', '0'))
+        self.max_queries = int(get_env('SERPAPI_MAX_QUERIES', '50'))
+        self.guard = provider_guards['serpapi']
+        self._limit = asyncio.Semaphore(int(get_env('SERPAPI_CONCURRENCY', '5')))
         if not self.is_configured:
             logger.warning("SerpAPI key not configured - discovery will be disabled")
 
-    def _get(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        try:
-            params = {**params, 'api_key': self.api_key}
-            r = requests.get(self.base_url, params=params, timeout=20)
+    @track_upstream("serpapi", lambda self, params: params.get('engine', 'search'))
+    @traced("serpapi.search", lambda self, params: {"serpapi.engine": params.get('engine', ''), "serpapi.query": params.get('q', '')})
+    async def _get(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return await single_flight.do(request_key("serpapi", params), lambda: self._send(params))
+
+    async def _send(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        params = {**params, 'api_key': self.api_key}
+
+        async def attempt():
+            r = await http_transport.request('GET', self.base_url, params=params, timeout=20)
             r.raise_for_status()
+            return r
+
+        try:
+            r = await self.guard.call(attempt)
             return r.json()
         except Exception as e:
             logger.error(f"SerpAPI request failed: {e}")
             return {}
 
-    async def discover_keywords(self, seeds: List[str]) -> List[Dict[str, Any]]:
+    async def warmup(self) -> None:
+        # account.json is free and doesn't count against the search quota
+        if self.is_configured:
+            r = await http_transport.request('GET', f"{self.base}/account.json", params={'api_key': self.api_key}, timeout=10)
+            r.raise_for_status()
+
+    async def discover_keywords(self, seeds: List[str], depth: Optional[int] = None) -> List[Dict[str, Any]]:
         if not self.is_configured or not seeds:
             return []
+        depth = self.discovery_depth if depth is None else max(0, depth)
+        return await keyword_cache.get_or_fetch("serpapi", f"discover:d{depth}", seeds, "", "en", lambda: self._discover(seeds, depth))
+
+    async def _discover(self, seeds: List[str], depth: int) -> List[Dict[str, Any]]:
+        """One google search per query; suggested searches / related questions score 3,
+        related searches score 2. With depth > 0, newly found terms are searched in turn,
+        highest score first, until max_queries is spent.
+        """
         collected: Dict[str, int] = {}
-        # Google Autocomplete and Related Searches per seed
-        for seed in seeds[:5]:
-            # Autocomplete via engine=google, google_domain default, q=seed, feature: 'autocomplete' (provided in inline_results)
-            data = await self._autocomplete(seed)
-            for kw in data:
-                collected[kw] = collected.get(kw, 0) + 3
-            # Related searches via normal search endpoint
-            related = await self._related_searches(seed)
-            for kw in related:
-                collected[kw] = collected.get(kw, 0) + 2
+        searched: Set[str] = set()
+        level = list(dict.fromkeys(s.strip() for s in seeds if s and s.strip()))
+        budget = self.max_queries
+        for _ in range(depth + 1):
+            level = [q for q in level if q.lower() not in searched][:budget]
+            if not level:
+                break
+            budget -= len(level)
+            searched.update(q.lower() for q in level)
+            # results come back in query order, so merging stays deterministic
+            for found in await asyncio.gather(*(self._search(q) for q in level)):
+                for kw, score in found.items():
+                    collected[kw] = collected.get(kw, 0) + score
+            level = sorted(collected, key=lambda k: -collected[k])
         # flatten to list
         return [{"keyword": k, "score": v} for k, v in collected.items()]
 
-    async def _autocomplete(self, query: str) -> List[str]:
-        try:
-            res = self._get({
+    async def _search(self, query: str) -> Dict[str, int]:
+        async with self._limit:
+            res = await self._get({
                 'engine': 'google',
                 'q': query,
                 'google_domain': 'google.com',
                 'hl': 'en',
                 'num': 10
             })
-            # SerpAPI returns 'inline_images' and others; autocomplete suggestions often under 'suggested_searches' or 'inline_results'
-            suggestions: List[str] = []
-            # Try 'suggested_searches'
-            for s in (res.get('suggested_searches') or []):
-                text = s.get('query') or s.get('title')
-                if text:
-                    suggestions.append(str(text))
-            # Try 'related_questions'
-            for s in (res.get('related_questions') or []):
-                q = s.get('question')
-                if q:
-                    suggestions.append(str(q))
-            return list(dict.fromkeys(suggestions))
-        except Exception as e:
-            logger.error(f"autocomplete error: {e}")
-            return []
-
-    async def _related_searches(self, query: str) -> List[str]:
         try:
-            res = self._get({
-                'engine': 'google',
-                'q': query,
-                'google_domain': 'google.com',
-                'hl': 'en'
-            })
-            related: List[str] = []
-            for item in (res.get('related_searches') or []):
-                q = item.get('query') or item.get('title')
-                if q:
-                    related.append(str(q))
-            return list(dict.fromkeys(related))
+            return self._extract(res)
         except Exception as e:
-            logger.error(f"related_searches error: {e}")
-            return []
+            logger.error(f"SerpAPI result parsing failed for {query!r}: {e}")
+            return {}
+
+    def _extract(self, res: Dict[str, Any]) -> Dict[str, int]:
+        # suggested searches and related questions count once (3), related searches add 2
+        suggested: Dict[str, int] = {}
+        for s in (res.get('suggested_searches') or []):
+            text = s.get('query') or s.get('title')
+            if text:
+                suggested[str(text)] = 3
+        for s in (res.get('related_questions') or []):
+            q = s.get('question')
+            if q:
+                suggested[str(q)] = 3
+        found = dict(suggested)
+        for q in dict.fromkeys(str(item.get('query') or item.get('title') or '') for item in (res.get('related_searches') or [])):
+            if q:
+                found[q] = found.get(q, 0) + 2
+        return found
 
 serp_service = SerpService()
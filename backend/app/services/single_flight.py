@@ -0,0 +1,76 @@
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+def request_key(prefix: str, *parts: Any) -> str:
+    """Stable key for an upstream call: prefix plus a hash of its JSON-normalized arguments."""
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return f"{prefix}:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+
+class SingleFlight:
+    """Coalesces identical concurrent calls onto one in-flight task.
+    The first caller for a key starts the work; everyone arriving before it
+    finishes awaits the same task and gets the same result (or exception).
+    The shared task is shielded, so a cancelled caller doesn't cancel it for the rest;
+    when the last caller waiting on it is cancelled (a closed stream, a dropped request),
+    the task is cancelled too rather than left running with nobody to take the result.
+    Counters are grouped by the key prefix (text before the first ':').
+    """
+
+    def __init__(self) -> None:
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # callers currently awaiting each task
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, key: str, field: str) -> None:
+        group = self.stats.setdefault(key.split(":", 1)[0], {"calls": 0, "leaders": 0, "coalesced": 0})
+        group[field] += 1
+
+    @staticmethod
+    def _consume(task: asyncio.Task) -> None:
+        # keep "exception was never retrieved" quiet when every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self._count(key, "calls")
+        task = self._inflight.get(key)
+        if task is not None:
+            self._count(key, "coalesced")
+        else:
+            self._count(key, "leaders")
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._inflight.pop(key, None) if self._inflight.get(key) is t else None)
+            task.add_done_callback(lambda t: self._waiters.pop(t, None))
+            task.add_done_callback(self._consume)
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters.get(task) == 1 and not task.done():
+                # nobody left to take the result; new callers start a fresh task
+                if self._inflight.get(key) is task:
+                    del self._inflight[key]
+                task.cancel()
+            raise
+        finally:
+            if task in self._waiters:
+                self._waiters[task] -= 1
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"in_flight": self.in_flight, "groups": {k: dict(v) for k, v in self.stats.items()}}
+
+
+single_flight = SingleFlight()
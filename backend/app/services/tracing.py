@@ -0,0 +1,295 @@
+import asyncio
+import collections
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
+import re
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+from ..config import get_env
+
+logger = logging.getLogger(__name__)
+
+# OTLP span kinds
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+STATUS_OK, STATUS_ERROR = 1, 2
+EXPORTERS = ("none", "file", "otlp")
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items() if v is not None]
+
+
+class Span:
+    """One timed operation. Field names and ids follow the OpenTelemetry data model
+    (16-byte trace id, 8-byte span id, hex encoded), so exports load into any OTLP backend."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "kind", "start_ns", "end_ns", "attributes", "events", "status", "status_message", "sampled")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], kind: int = KIND_INTERNAL, sampled: bool = True) -> None:
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes: Dict[str, Any] = {}
+        self.events: List[Dict[str, Any]] = []
+        self.status = 0
+        self.status_message = ""
+        self.sampled = sampled
+
+    @property
+    def recording(self) -> bool:
+        return self.sampled
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if self.sampled:
+            self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        if self.sampled:
+            self.attributes.update(attributes)
+
+    def add_event(self, name: str, **attributes: Any) -> None:
+        if self.sampled:
+            self.events.append({"name": name, "timeUnixNano": str(time.time_ns()), "attributes": _otlp_attributes(attributes)})
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.add_event("exception", **{"exception.type": type(exc).__name__, "exception.message": str(exc)})
+        self.status, self.status_message = STATUS_ERROR, str(exc)
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "events": self.events,
+            "status": {"code": self.status, "message": self.status_message} if self.status else {},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class _NoopSpan(Span):
+    # returned while tracing is off or the trace is not sampled
+    def __init__(self) -> None:
+        super().__init__("", "0" * 32, None, sampled=False)
+
+
+NOOP_SPAN = _NoopSpan()
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+def current_span() -> Span:
+    """The active span, or a no-op span that ignores attributes."""
+    return _current.get() or NOOP_SPAN
+
+
+class SpanExporter:
+    """Buffers finished spans and writes them in batches as OTLP/JSON export requests:
+    - file: one ExportTraceServiceRequest per line (the collector's otlpjsonfile receiver reads this)
+    - otlp: POST to an OTLP/HTTP collector (JSON encoding), e.g. a local collector on :4318
+    Nothing here needs network access unless "otlp" is configured. A full buffer drops the oldest spans.
+    """
+
+    def __init__(self, kind: str = "none", path: str = "cache/traces.jsonl", endpoint: str = "http://localhost:4318/v1/traces", service_name: str = "sem-plan-tool", interval: float = 2.0, max_queue: int = 10000) -> None:
+        self.kind = kind if kind in EXPORTERS else "none"
+        self.path = path
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.interval = interval
+        self._queue: Deque[Span] = collections.deque(maxlen=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"exported": 0, "failed": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.kind != "none"
+
+    def submit(self, span: Span) -> None:
+        self._queue.append(span)
+
+    def _payload(self, spans: List[Span]) -> Dict[str, Any]:
+        return {"resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": self.service_name})},
+            "scopeSpans": [{"scope": {"name": "app.services.tracing"}, "spans": [s.to_otlp() for s in spans]}],
+        }]}
+
+    def _write(self, line: str) -> None:
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as fh:
+            fh.write(line + "\n")
+
+    async def flush(self) -> None:
+        if not self._queue:
+            return
+        spans = list(self._queue)
+        self._queue.clear()
+        payload = self._payload(spans)
+        try:
+            if self.kind == "file":
+                # late imports: http_client itself opens spans through this module
+                from .http_client import run_blocking
+                await run_blocking(self._write, json.dumps(payload, separators=(",", ":")))
+            else:
+                from .http_client import http_transport
+                resp = await http_transport.client.post(self.endpoint, json=payload, timeout=5)
+                resp.raise_for_status()
+            self.stats["exported"] += len(spans)
+        except Exception as e:
+            self.stats["failed"] += len(spans)
+            logger.warning(f"trace export failed ({len(spans)} spans dropped): {e}")
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def start(self) -> None:
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.enabled:
+            await self.flush()
+
+
+class Tracer:
+    """Creates spans under the current context (contextvars, so asyncio tasks inherit
+    their parent). Sampling is decided once per trace at the root."""
+
+    def __init__(self, exporter: SpanExporter, sample_ratio: float = 1.0) -> None:
+        self.exporter = exporter
+        self.sample_ratio = sample_ratio
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter.enabled
+
+    @contextmanager
+    def span(self, name: str, kind: int = KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None, traceparent: Optional[str] = None) -> Iterator[Span]:
+        parent = _current.get()
+        if not self.enabled or (parent is not None and not parent.sampled):
+            yield NOOP_SPAN
+            return
+        if parent is not None:
+            span = Span(name, parent.trace_id, parent.span_id, kind)
+        else:
+            remote = _TRACEPARENT.match(traceparent or "")
+            if remote:
+                span = Span(name, remote.group(1), remote.group(2), kind, sampled=remote.group(3) == "01")
+            else:
+                span = Span(name, f"{random.getrandbits(128):032x}", None, kind, sampled=random.random() < self.sample_ratio)
+        if attributes:
+            span.set_attributes(attributes)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                span.set_attribute("cancelled", True)
+            else:
+                span.record_exception(e)
+            raise
+        finally:
+            _current.reset(token)
+            span.end_ns = time.time_ns()
+            if span.sampled:
+                self.exporter.submit(span)
+
+
+tracer = Tracer(
+    exporter=SpanExporter(
+        kind=get_env("TRACE_EXPORTER", "none"),
+        path=get_env("TRACE_FILE_PATH", "cache/traces.jsonl"),
+        endpoint=get_env("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"),
+        service_name=get_env("TRACE_SERVICE_NAME", "sem-plan-tool"),
+        interval=float(get_env("TRACE_EXPORT_INTERVAL", "2")),
+    ),
+    sample_ratio=float(get_env("TRACE_SAMPLE_RATIO", "1.0")),
+)
+
+
+def traced(name: str, attributes: Optional[Callable[..., Dict[str, Any]]] = None, kind: int = KIND_INTERNAL, result_count: Optional[str] = None) -> Callable:
+    """Decorator: runs an async function inside a span. attributes(*args, **kwargs) adds
+    call attributes; result_count names an attribute set to len(result)."""
+    def wrap(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        async def inner(*args: Any, **kwargs: Any) -> Any:
+            if not tracer.enabled:
+                return await fn(*args, **kwargs)
+            with tracer.span(name, kind, attributes(*args, **kwargs) if attributes else None) as span:
+                result = await fn(*args, **kwargs)
+                if result_count:
+                    span.set_attribute(result_count, len(result or ()))
+                return result
+        return inner
+    return wrap
+
+
+class TracingMiddleware:
+    """ASGI middleware: one SERVER span per API request, continuing an incoming W3C
+    traceparent. The response carries the trace id in X-Trace-Id for log correlation."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        incoming = headers.get(b"traceparent", b"").decode("latin-1")
+        method = scope.get("method", "")
+        with tracer.span(f"{method} {scope.get('path', '')}", KIND_SERVER, {"http.method": method, "http.target": scope.get("path", "")}, traceparent=incoming) as span:
+
+            async def traced_send(message: Dict[str, Any]) -> None:
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if span.sampled:
+                        if message["status"] >= 500:
+                            span.status = STATUS_ERROR
+                        message = {**message, "headers": list(message.get("headers") or []) + [(b"x-trace-id", span.trace_id.encode())]}
+                await send(message)
+
+            await self.app(scope, receive, traced_send)
+            endpoint = scope.get("endpoint")
+            if endpoint is not None and span.sampled:
+                # route name instead of the raw path (job ids etc.)
+                span.name = f"{method} {getattr(endpoint, '__name__', scope.get('path', ''))}"
@@ -0,0 +1,351 @@
+import contextvars
+import json
+import logging
+import zlib
+from dataclasses import asdict, is_dataclass
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from starlette.responses import JSONResponse, Response
+
+from ..config import get_env
+
+logger = logging.getLogger(__name__)
+
+# pinned in requirements.txt; the fallbacks keep a partial install serving plain json and gzip
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+MSGPACK_TYPES = (MSGPACK, "application/x-msgpack", "application/vnd.msgpack")
+# worth compressing; images, archives and already-encoded bodies pass through
+COMPRESSIBLE = ("application/json", "application/x-ndjson", "application/msgpack", "text/", "application/javascript")
+
+COMPRESSION_ENABLED = get_env("RESPONSE_COMPRESSION", "true").lower() in ("1", "true", "yes")
+COMPRESSION_MIN_BYTES = int(get_env("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(get_env("GZIP_LEVEL", "5"))
+BROTLI_QUALITY = int(get_env("BROTLI_QUALITY", "4"))
+MAX_REQUEST_BODY_BYTES = int(get_env("MAX_REQUEST_BODY_BYTES", str(64 * 1024 * 1024)))
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        # response models have no aliases or custom serializers, so the field dict is the
+        # wire shape; this also covers model_construct()ed models that skipped validation
+        return obj.__dict__
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if is_dataclass(obj):
+        return asdict(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"not serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """JSON bytes for plain data, pydantic models, dataclasses and numpy values."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data: bytes) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def to_jsonable(content: Any) -> Any:
+    """Plain JSON types, e.g. for storing a response; much cheaper than jsonable_encoder."""
+    return loads(dumps(content))
+
+
+def _media_ranges(header: str) -> List[Tuple[str, float]]:
+    ranges = []
+    for part in header.split(","):
+        fields = [f.strip() for f in part.split(";")]
+        if not fields[0]:
+            continue
+        q = 1.0
+        for f in fields[1:]:
+            if f.startswith("q="):
+                try:
+                    q = float(f[2:])
+                except ValueError:
+                    q = 0.0
+        ranges.append((fields[0].lower(), q))
+    return ranges
+
+
+def negotiate_format(accept: str) -> str:
+    """"msgpack" when the client prefers it (and msgpack is installed), else "json"."""
+    if msgpack is None or not accept:
+        return "json"
+    best_json, best_msgpack = -1.0, -1.0
+    for media, q in _media_ranges(accept):
+        if media in MSGPACK_TYPES:
+            best_msgpack = max(best_msgpack, q)
+        elif media in (JSON, "application/*", "*/*"):
+            best_json = max(best_json, q)
+    return "msgpack" if best_msgpack > 0 and best_msgpack >= best_json else "json"
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Response content coding: br (if brotli is installed) or gzip, by the client's q-values."""
+    offered = dict(_media_ranges(accept_encoding))
+    wildcard = offered.get("*", 0.0)
+    choices = [("br", offered.get("br", wildcard)), ("gzip", offered.get("gzip", wildcard))]
+    if brotli is None:
+        choices = choices[1:]
+    coding, q = max(choices, key=lambda c: c[1])
+    return coding if q > 0 else None
+
+
+# set per request by WireFormatMiddleware, read when WireResponse renders
+_response_format: contextvars.ContextVar[str] = contextvars.ContextVar("response_format", default="json")
+
+
+class WireResponse(Response):
+    """Response rendered straight from handler data (models included) with the fast
+    encoder, as JSON or MessagePack depending on the request's Accept header. Returning
+    one from a handler also skips FastAPI's response_model validation and jsonable_encoder."""
+
+    media_type = JSON
+
+    def __init__(self, content: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None, media_type: Optional[str] = None, background: Optional[BackgroundTask] = None) -> None:
+        self.format = _response_format.get()
+        if self.format == "msgpack":
+            media_type = MSGPACK
+        if msgpack is not None:
+            headers = {**(headers or {}), "Vary": "Accept"}
+        super().__init__(content, status_code, headers, media_type, background)
+
+    def render(self, content: Any) -> bytes:
+        if self.format == "msgpack":
+            return msgpack.packb(content, default=_default, use_bin_type=True)
+        return dumps(content)
+
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> str:
+    for key, value in headers:
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return ""
+
+
+def _without(headers: List[Tuple[bytes, bytes]], *names: bytes) -> List[Tuple[bytes, bytes]]:
+    return [(k, v) for k, v in headers if k.lower() not in names]
+
+
+class _TooLarge(Exception):
+    pass
+
+
+_BR_INPUT_CHUNK = 64 * 1024
+
+
+def _decompress(coding: str, data: bytes, limit: int) -> bytes:
+    if coding in ("gzip", "x-gzip", "deflate"):
+        # wbits 32+: gzip or zlib header, detected; max_length bounds a decompression bomb
+        inflater = zlib.decompressobj(zlib.MAX_WBITS | 32)
+        out = inflater.decompress(data, limit + 1)
+        if len(out) > limit or inflater.unconsumed_tail:
+            raise _TooLarge()
+        return out
+    if coding == "br" and brotli is not None:
+        # output_buffer_limit stops each step at the cap, so a brotli bomb never inflates past limit + 1
+        inflater = brotli.Decompressor()
+        out = bytearray()
+        for start in range(0, len(data), _BR_INPUT_CHUNK):
+            out += inflater.process(data[start:start + _BR_INPUT_CHUNK], output_buffer_limit=limit + 1 - len(out))
+            while len(out) <= limit and not inflater.can_accept_more_data():
+                out += inflater.process(b"", output_buffer_limit=limit + 1 - len(out))
+            if len(out) > limit:
+                raise _TooLarge()
+        if not inflater.is_finished():
+            raise brotli.error("truncated brotli stream")
+        return bytes(out)
+    raise ValueError(coding)
+
+
+class WireFormatMiddleware:
+    """Request side of the wire format:
+    - Content-Encoding gzip / deflate / br request bodies are decompressed (at most
+      max_body_bytes as sent and once inflated, else 413; unknown codings get 415)
+    - MessagePack request bodies are turned into JSON for the normal request parsing
+    - the Accept header picks JSON or MessagePack for WireResponse
+    """
+
+    def __init__(self, app: Any, max_body_bytes: int = MAX_REQUEST_BODY_BYTES) -> None:
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = list(scope.get("headers") or [])
+        token = _response_format.set(negotiate_format(_header(headers, b"accept")))
+        try:
+            coding = _header(headers, b"content-encoding").strip().lower()
+            content_type = _header(headers, b"content-type").split(";")[0].strip().lower()
+            is_msgpack = content_type in MSGPACK_TYPES
+            if coding in ("", "identity") and not is_msgpack:
+                await self.app(scope, receive, send)
+                return
+            try:
+                body = await self._read(receive, self.max_body_bytes)
+                if coding not in ("", "identity"):
+                    body = _decompress(coding, body, self.max_body_bytes)
+                if is_msgpack:
+                    if msgpack is None:
+                        raise ValueError(content_type)
+                    body = dumps(msgpack.unpackb(body, raw=False))
+                    headers = _without(headers, b"content-type") + [(b"content-type", JSON.encode())]
+            except _TooLarge:
+                await JSONResponse({"detail": "Request body too large"}, status_code=413)(scope, receive, send)
+                return
+            except ValueError as e:
+                await JSONResponse({"detail": f"Unsupported request encoding: {e}"}, status_code=415)(scope, receive, send)
+                return
+            except Exception as e:
+                await JSONResponse({"detail": f"Malformed request body: {e}"}, status_code=400)(scope, receive, send)
+                return
+            headers = _without(headers, b"content-encoding", b"content-length") + [(b"content-length", str(len(body)).encode())]
+            sent = False
+
+            async def replay() -> Dict[str, Any]:
+                nonlocal sent
+                if sent:
+                    return await receive()
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+
+            await self.app({**scope, "headers": headers}, replay, send)
+        finally:
+            _response_format.reset(token)
+
+    @staticmethod
+    async def _read(receive: Callable, limit: int) -> bytes:
+        # the raw body is held to the same cap as the inflated one
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > limit:
+                raise _TooLarge()
+            chunks.append(chunk)
+            if not message.get("more_body"):
+                break
+        return b"".join(chunks)
+
+
+class _Encoder:
+    def __init__(self, coding: str, gzip_level: int, brotli_quality: int) -> None:
+        self.coding = coding
+        if coding == "br":
+            self._br = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._gz = zlib.compressobj(gzip_level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def chunk(self, data: bytes) -> bytes:
+        # flushed per chunk so streamed frames reach the client without waiting for more
+        if self.coding == "br":
+            return self._br.process(data) + self._br.flush()
+        return self._gz.compress(data) + self._gz.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._br.finish() if self.coding == "br" else self._gz.flush()
+
+
+class CompressionMiddleware:
+    """Response compression negotiated by Accept-Encoding: brotli when available, else gzip.
+    Whole bodies under min_size go out as-is; streamed responses (NDJSON / SSE) are
+    compressed frame by frame with a flush after each, so streaming still streams."""
+
+    def __init__(self, app: Any, enabled: bool = COMPRESSION_ENABLED, min_size: int = COMPRESSION_MIN_BYTES, gzip_level: int = GZIP_LEVEL, brotli_quality: int = BROTLI_QUALITY) -> None:
+        self.app = app
+        self.enabled = enabled
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+        coding = negotiate_encoding(_header(list(scope.get("headers") or []), b"accept-encoding"))
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Dict[str, Any]] = None
+        encoder: Optional[_Encoder] = None
+        passthrough = False
+
+        async def compressing_send(message: Dict[str, Any]) -> None:
+            nonlocal start, encoder, passthrough
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers") or [])
+                content_type = _header(headers, b"content-type").lower()
+                if _header(headers, b"content-encoding") or not content_type.startswith(COMPRESSIBLE):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if start is not None:
+                headers = _without(list(start.get("headers") or []), b"content-length")
+                vary = _header(headers, b"vary")
+                headers = _without(headers, b"vary") + [(b"vary", (f"{vary}, Accept-Encoding" if vary else "Accept-Encoding").encode())]
+                if not more and len(body) < self.min_size:
+                    # small single-part body: not worth it
+                    passthrough = True
+                    await send(start)
+                    start = None
+                    await send(message)
+                    return
+                encoder = _Encoder(coding, self.gzip_level, self.brotli_quality)
+                headers.append((b"content-encoding", coding.encode()))
+                if not more:
+                    payload = encoder.chunk(body) + encoder.finish()
+                    headers.append((b"content-length", str(len(payload)).encode()))
+                    await send({**start, "headers": headers})
+                    start = None
+                    await send({"type": "http.response.body", "body": payload, "more_body": False})
+                    return
+                await send({**start, "headers": headers})
+                start = None
+            payload = encoder.chunk(body) if body else b""
+            if not more:
+                payload += encoder.finish()
+            if payload or not more:
+                await send({"type": "http.response.body", "body": payload, "more_body": more})
+
+        await self.app(scope, receive, compressing_send)
+
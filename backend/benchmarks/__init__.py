@@ -0,0 +1 @@
+# benchmarks package - offline throughput checks, run from backend/ with python -m
@@ -0,0 +1,125 @@
+"""Planning-engine micro-benchmarks at 1k / 10k / 100k keywords, no network.
+
+    python -m benchmarks.bench_engine [--sizes 1000,10000,100000] [--repeat 3] [--cases score,filter_keywords,...]
+                                      [--save-baseline bench.json] [--baseline bench.json] [--tolerance 0.25]
+
+Cases:
+- score: provider rows -> KeywordFrame -> scores -> response records (what replaced to_scores)
+- filter_keywords, group_keywords, generate_pmax_themes, calculate_bids: the endpoint
+  handlers, called directly with an already-validated request model
+
+Large cases go through the cpu pool like they do in the API (pickling included); run with
+CPU_POOL_ENABLED=false to time the stages inline.
+
+Prints the best time per case and size. With --baseline, exits non-zero if any case got
+slower than the saved time by more than --tolerance (a fraction).
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+from benchmarks.bench_intent import synthetic_keywords
+from app.api.v1.endpoints import (
+    BudgetRequest, FilterRequest, _build_ad_groups, _frame_items,
+    calculate_bids, filter_keywords, generate_pmax_themes, group_keywords,
+)
+from app.engine.keyword_frame import KeywordFrame
+
+CASES = ["score", "filter_keywords", "group_keywords", "generate_pmax_themes", "calculate_bids"]
+COMPETITION = ["Low", "Medium", "High"]
+
+
+def synthetic_rows(size: int, seed: int = 0) -> List[Dict[str, Any]]:
+    # provider-shaped rows; repeated texts get a counter so every row survives dedupe
+    rng = random.Random(seed)
+    rows = []
+    for i, text in enumerate(synthetic_keywords(size, seed)):
+        cpc = rng.uniform(0.2, 6.0)
+        rows.append({
+            "keyword": f"{text} {i}" if i >= size // 4 else text,
+            "avg_monthly_searches": int(rng.lognormvariate(6.5, 1.5)),
+            "competition": rng.choice(COMPETITION),
+            "low_top_of_page_bid_micros": int(cpc * 0.8 * 1_000_000),
+            "high_top_of_page_bid_micros": int(cpc * 1.2 * 1_000_000),
+            "source": "dataforseo",
+        })
+    return rows
+
+
+def _cases(size: int) -> Dict[str, Callable[[], Any]]:
+    rows = synthetic_rows(size)
+    items = _frame_items(KeywordFrame.from_rows(rows).score())
+    request = FilterRequest(keywords=items, min_search_volume=100, min_opportunity_score=0.3)
+    budgets = BudgetRequest(
+        ad_groups=asyncio.run(_build_ad_groups(KeywordFrame.from_items(items))),
+        budgets={"search": 50_000.0, "shopping": 20_000.0, "pmax": 30_000.0},
+    )
+    run = asyncio.run
+    return {
+        "score": lambda: _frame_items(KeywordFrame.from_rows(rows).score()),
+        "filter_keywords": lambda: run(filter_keywords(request)),
+        "group_keywords": lambda: run(group_keywords(request)),
+        "generate_pmax_themes": lambda: run(generate_pmax_themes(request)),
+        "calculate_bids": lambda: run(calculate_bids(budgets)),
+    }
+
+
+def _best(fn: Callable[[], Any], repeat: int) -> float:
+    fn()  # warm-up
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--cases", default=",".join(CASES))
+    parser.add_argument("--baseline", default=None, help="JSON file from --save-baseline to compare against")
+    parser.add_argument("--save-baseline", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+
+    results: Dict[str, Dict[str, float]] = {case: {} for case in cases}
+    for size in sizes:
+        fns = _cases(size)
+        for case in cases:
+            seconds = _best(fns[case], args.repeat)
+            results[case][str(size)] = seconds
+            print(f"{case:>22} {size:>8,} keywords: {seconds * 1000:10.1f} ms  {size / seconds:>14,.0f} keywords/s")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, encoding="utf-8") as fh:
+        baseline = json.load(fh)
+    regressions = []
+    for case, by_size in results.items():
+        for size, seconds in by_size.items():
+            before = baseline.get(case, {}).get(size)
+            if before and seconds > before * (1 + args.tolerance):
+                regressions.append(f"{case} @ {size}: {before * 1000:.1f} -> {seconds * 1000:.1f} ms")
+    for line in regressions:
+        print(f"regression: {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
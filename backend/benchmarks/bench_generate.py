@@ -0,0 +1,172 @@
+"""End-to-end /generate_keywords throughput and latency under concurrency, against the
+local stand-in providers (benchmarks.mock_upstream). No network, no API spend.
+
+    python -m benchmarks.bench_generate [--requests 400] [--concurrency 32] [--latency-ms 120] [--jitter-ms 40]
+                                        [--error-rate 0.0] [--error-status 503] [--strategy sequential]
+                                        [--max-results 1000] [--cache] [--rate-limits] [--max-p95-ms N] [--verbose]
+
+Requests go through the full ASGI stack in-process (middleware, validation, provider
+strategy, shared transport, scoring, serialization); only the providers are fake. Every
+request uses a distinct seed, so neither the cache nor request coalescing hides upstream
+work unless --cache is given. Provider rate limits are lifted unless --rate-limits is
+given, so the numbers measure this service rather than the quota.
+
+Prints req/s and p50/p95/p99 latency; exits non-zero on failed requests or when p95 is
+above --max-p95-ms.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import requests
+
+from benchmarks.bench_intent import MODIFIERS, PRODUCTS
+from benchmarks.mock_upstream import MockConfig, MockUpstream
+
+
+class StandInError(Exception):
+    """HTTP failure from the stand-in, shaped like the SDK transport errors (status_code),
+    so the provider guard retries it the same way."""
+
+    def __init__(self, status_code: int) -> None:
+        super().__init__(f"stand-in returned {status_code}")
+        self.status_code = status_code
+
+
+def _configure_env(upstream: str, args: argparse.Namespace) -> None:
+    # read by the service singletons at import time, so this runs before importing the app
+    scratch = tempfile.mkdtemp(prefix="sem-bench-")
+    os.environ.update({
+        "DATAFORSEO_BASE_URL": upstream,
+        "SERPAPI_BASE_URL": upstream,
+        "CACHE_ENABLED": "true" if args.cache else "false",
+        "CACHE_DB_PATH": os.path.join(scratch, "cache.sqlite3"),
+        "JOB_DB_PATH": os.path.join(scratch, "jobs.sqlite3"),
+        "PLAN_SESSION_DB_PATH": os.path.join(scratch, "plan_sessions.sqlite3"),
+        "TRACE_EXPORTER": "none",
+        "KEYWORD_PROVIDER_STRATEGY": args.strategy,
+    })
+    if not args.rate_limits:
+        for provider in ("DATAFORSEO", "SERPAPI", "GOOGLE_ADS", "MS_ADS"):
+            os.environ[f"RATE_LIMIT_{provider}"] = "100000"
+            os.environ[f"RATE_BURST_{provider}"] = "100000"
+
+
+def _stand_in_ads(upstream: str) -> None:
+    """Points the Google Ads and Microsoft Ads services at the stand-in. Only the blocking
+    SDK call is replaced; the guard, cache, thread pool hop and row mapping stay real."""
+    from app.services.google_ads_service import google_ads_service
+    from app.services.ms_ads_service import ms_ads_service
+
+    session = requests.Session()
+
+    def fetcher(provider: str):
+        def fetch(seed_keywords: List[str], *args: Any) -> List[Dict[str, Any]]:
+            resp = session.get(f"{upstream}/{provider}/keyword_ideas", params={"seed": seed_keywords}, timeout=30)
+            if resp.status_code >= 400:
+                raise StandInError(resp.status_code)
+            return resp.json()["results"]
+        return fetch
+
+    async def no_warmup() -> None:
+        return None
+
+    for provider, service in (("google_ads", google_ads_service), ("ms_ads", ms_ads_service)):
+        service.is_configured = True
+        service.warmup = no_warmup
+        service._fetch_keyword_ideas = fetcher(provider)
+    # no OAuth refresh loop against login.live.com
+    ms_ads_service._ensure_refresher = lambda: None
+
+
+def synthetic_seeds(count: int) -> List[str]:
+    seeds: List[str] = []
+    for modifier in MODIFIERS:
+        for product in PRODUCTS:
+            seeds.append(f"{modifier} {product}".strip())
+    # more requests than combinations: suffix a counter so seeds stay distinct
+    return [seeds[i % len(seeds)] + (f" {i // len(seeds)}" if i >= len(seeds) else "") for i in range(count)]
+
+
+async def _drive(args: argparse.Namespace) -> Tuple[List[float], Dict[int, int], float]:
+    import httpx
+    from app.main import semApp
+
+    seeds = synthetic_seeds(args.requests)
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    limit = asyncio.Semaphore(args.concurrency)
+
+    async with semApp.router.lifespan_context(semApp):
+        transport = httpx.ASGITransport(app=semApp)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+
+            async def one(seed: str) -> None:
+                body = {"seed_keywords": [seed], "max_results": args.max_results, "provider_strategy": args.strategy}
+                async with limit:
+                    started = time.perf_counter()
+                    resp = await client.post("/api/v1/generate_keywords", json=body)
+                    await resp.aread()
+                    latencies.append(time.perf_counter() - started)
+                statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+
+            # warm the route, pools and numpy paths outside the measurement
+            await one("warm up seed")
+            latencies.clear()
+            statuses.clear()
+
+            started = time.perf_counter()
+            await asyncio.gather(*(one(seed) for seed in seeds))
+            elapsed = time.perf_counter() - started
+    return latencies, statuses, elapsed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=120.0)
+    parser.add_argument("--jitter-ms", type=float, default=40.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--strategy", default="sequential", choices=["sequential", "hedged", "parallel"])
+    parser.add_argument("--max-results", type=int, default=1000)
+    parser.add_argument("--cache", action="store_true", help="keep the keyword cache on")
+    parser.add_argument("--rate-limits", action="store_true", help="keep the per-provider rate limits")
+    parser.add_argument("--max-p95-ms", type=float, default=None)
+    parser.add_argument("--verbose", action="store_true", help="keep the app's provider error logs")
+    args = parser.parse_args()
+    if not args.verbose:
+        # injected errors would otherwise log a line per failed upstream call
+        logging.getLogger("app").setLevel(logging.CRITICAL)
+
+    mock = MockUpstream(MockConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.error_status)).start()
+    try:
+        _configure_env(mock.url, args)
+        _stand_in_ads(mock.url)
+        latencies, statuses, elapsed = asyncio.run(_drive(args))
+    finally:
+        mock.stop()
+
+    ms = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    failed = sum(n for code, n in statuses.items() if code >= 400)
+    print(f"generate_keywords: {args.requests} requests, concurrency {args.concurrency}, strategy {args.strategy}, "
+          f"upstream {args.latency_ms:.0f}±{args.jitter_ms:.0f} ms, error rate {args.error_rate:.0%}")
+    print(f"throughput: {args.requests / elapsed:,.1f} req/s over {elapsed:.2f} s")
+    print(f"latency ms: p50 {p50:.1f}  p95 {p95:.1f}  p99 {p99:.1f}  max {ms.max():.1f}")
+    print(f"status codes: {dict(sorted(statuses.items()))}")
+    print(f"upstream calls: {mock.stats.total()} ({mock.stats.errors} injected errors) {dict(sorted(mock.stats.calls.items()))}")
+    if failed:
+        return 1
+    return 0 if args.max_p95_ms is None or p95 <= args.max_p95_ms else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+"""Intent classifier throughput.
+
+    python -m benchmarks.bench_intent [--size 1000000] [--repeat 5] [--min-rate 1000000]
+
+Prints keywords/second for the best run; exits non-zero if it is below --min-rate.
+"""
+import argparse
+import random
+import sys
+import time
+from typing import List
+
+from app.engine.intent import intent_classifier
+
+PRODUCTS = ["hiking boots", "coffee maker", "espresso machine", "gaming laptop", "office chair", "running shoes", "smart watch", "standing desk", "wireless earbuds", "air fryer"]
+MODIFIERS = ["", "best", "cheap", "buy", "how to clean", "near me", "for women", "for men", "kids", "review", "vs", "2024", "waterproof", "lightweight", "discount", "nike", "what is", "is it worth", "login", "for sale"]
+
+
+def synthetic_keywords(size: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    out = []
+    for _ in range(size):
+        parts = [rng.choice(MODIFIERS), rng.choice(PRODUCTS), rng.choice(MODIFIERS)]
+        out.append(" ".join(p for p in parts if p))
+    return out
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-rate", type=float, default=1_000_000)
+    args = parser.parse_args()
+
+    keywords = synthetic_keywords(args.size)
+    classifier = intent_classifier({"nike", "home-depot"})
+    classifier.classify(keywords[:1000])  # warm the compiled tables
+
+    best = float("inf")
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        intents = classifier.classify(keywords)
+        best = min(best, time.perf_counter() - started)
+    rate = args.size / best
+
+    counts = {name: int((intents == name).sum()) for name in sorted(set(intents.tolist()))}
+    print(f"intent: {args.size:,} keywords in {best * 1000:.1f} ms -> {rate:,.0f} keywords/s")
+    print(f"intent mix: {counts}")
+    return 0 if rate >= args.min_rate else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
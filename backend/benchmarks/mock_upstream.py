@@ -0,0 +1,219 @@
+"""Local stand-in for the keyword providers, replaying the recorded responses in
+benchmarks/fixtures/ with configurable latency and error injection.
+
+    python -m benchmarks.mock_upstream [--port 8765] [--latency-ms 150] [--jitter-ms 50] [--error-rate 0.05] [--error-status 503]
+
+Serves:
+- DataForSEO: keywords_for_keywords, labs keyword_ideas, search_volume, user_data
+  (point DATAFORSEO_BASE_URL at it)
+- SerpAPI: search.json, account.json (point SERPAPI_BASE_URL at it)
+- Google Ads / Microsoft Ads: GET /google_ads/keyword_ideas and /ms_ads/keyword_ideas
+  returning the rows the services map SDK responses to; the SDKs speak gRPC / SOAP,
+  so bench_generate swaps their blocking fetch for a plain HTTP call to these routes
+
+The recorded seed ("hiking boots") is replaced with the requested seed, so different
+seeds give different keywords and nothing is accidentally shared between requests.
+"""
+import argparse
+import asyncio
+import copy
+import json
+import os
+import random
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+RECORDED_SEED = "hiking boots"
+
+
+def load_fixture(name: str) -> Dict[str, Any]:
+    with open(os.path.join(FIXTURES, f"{name}.json"), encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+@dataclass
+class MockConfig:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 503
+    retry_after: Optional[float] = None  # sent with injected 429s
+    seed: int = 0
+
+
+@dataclass
+class MockStats:
+    calls: Dict[str, int] = field(default_factory=dict)
+    errors: int = 0
+
+    def total(self) -> int:
+        return sum(self.calls.values())
+
+
+def _substitute(value: Any, seed: str) -> Any:
+    # keyword text only; numbers and ids stay as recorded
+    if isinstance(value, str):
+        return value.replace(RECORDED_SEED, seed)
+    if isinstance(value, list):
+        return [_substitute(v, seed) for v in value]
+    if isinstance(value, dict):
+        return {k: _substitute(v, seed) for k, v in value.items()}
+    return value
+
+
+def create_app(config: MockConfig) -> Tuple[Starlette, MockStats]:
+    stats = MockStats()
+    rng = random.Random(config.seed)
+    fixtures = {name: load_fixture(name) for name in (
+        "dataforseo_keywords_for_keywords", "dataforseo_keyword_ideas", "dataforseo_search_volume",
+        "serpapi_search", "google_ads_keyword_ideas", "ms_ads_keyword_ideas",
+    )}
+    # search_volume answers for whatever keywords were asked, with recorded metrics cycled over them
+    volume_items = fixtures["dataforseo_search_volume"]["tasks"][0]["result"][0]["items"]
+
+    async def upstream(name: str) -> Optional[Response]:
+        stats.calls[name] = stats.calls.get(name, 0) + 1
+        delay = config.latency_ms + rng.uniform(-config.jitter_ms, config.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if config.error_rate and rng.random() < config.error_rate:
+            stats.errors += 1
+            headers = {"Retry-After": str(config.retry_after)} if config.error_status == 429 and config.retry_after is not None else None
+            return JSONResponse({"error": "injected"}, status_code=config.error_status, headers=headers)
+        return None
+
+    async def _task(request: Request) -> Dict[str, Any]:
+        body = await request.json()
+        return body[0] if isinstance(body, list) and body else {}
+
+    async def keywords_for_keywords(request: Request) -> Response:
+        failed = await upstream("dataforseo.keywords_for_keywords")
+        if failed:
+            return failed
+        task = await _task(request)
+        seeds = task.get("keywords") or [RECORDED_SEED]
+        data = copy.deepcopy(fixtures["dataforseo_keywords_for_keywords"])
+        items = data["tasks"][0]["result"][0]["items"]
+        data["tasks"][0]["result"][0]["items"] = [row for seed in seeds for row in _substitute(items, seed)]
+        return JSONResponse(data)
+
+    async def keyword_ideas(request: Request) -> Response:
+        failed = await upstream("dataforseo.keyword_ideas")
+        if failed:
+            return failed
+        task = await _task(request)
+        data = _substitute(fixtures["dataforseo_keyword_ideas"], task.get("keyword") or RECORDED_SEED)
+        result = data["tasks"][0]["result"][0]
+        result["items"] = result["items"][:int(task.get("limit") or len(result["items"]))]
+        return JSONResponse(data)
+
+    async def search_volume(request: Request) -> Response:
+        failed = await upstream("dataforseo.search_volume")
+        if failed:
+            return failed
+        task = await _task(request)
+        keywords: List[str] = task.get("keywords") or []
+        data = copy.deepcopy(fixtures["dataforseo_search_volume"])
+        data["tasks"][0]["result"][0]["items"] = [
+            {**volume_items[i % len(volume_items)], "keyword": kw} for i, kw in enumerate(keywords)
+        ]
+        return JSONResponse(data)
+
+    async def user_data(request: Request) -> Response:
+        return JSONResponse({"status_code": 20000, "tasks": [{"result": [{"login": "bench", "money": {"balance": 100}}]}]})
+
+    async def serp_search(request: Request) -> Response:
+        failed = await upstream("serpapi.search")
+        if failed:
+            return failed
+        return JSONResponse(_substitute(fixtures["serpapi_search"], request.query_params.get("q") or RECORDED_SEED))
+
+    async def serp_account(request: Request) -> Response:
+        return JSONResponse({"account_email": "bench@example.com", "plan_searches_left": 1000})
+
+    def ads_route(provider: str):
+        async def handler(request: Request) -> Response:
+            failed = await upstream(f"{provider}.keyword_ideas")
+            if failed:
+                return failed
+            seeds = request.query_params.getlist("seed") or [RECORDED_SEED]
+            rows = fixtures[f"{provider}_keyword_ideas"]["results"]
+            return JSONResponse({"results": [row for seed in seeds for row in _substitute(rows, seed)]})
+        return handler
+
+    async def mock_stats(request: Request) -> Response:
+        return JSONResponse({"calls": stats.calls, "errors": stats.errors})
+
+    app = Starlette(routes=[
+        Route("/v3/keywords_data/google_ads/keywords_for_keywords/live", keywords_for_keywords, methods=["POST"]),
+        Route("/v3/dataforseo_labs/google/keyword_ideas/live", keyword_ideas, methods=["POST"]),
+        Route("/v3/keywords_data/google_ads/search_volume/live", search_volume, methods=["POST"]),
+        Route("/v3/appendix/user_data", user_data),
+        Route("/search.json", serp_search),
+        Route("/account.json", serp_account),
+        Route("/google_ads/keyword_ideas", ads_route("google_ads")),
+        Route("/ms_ads/keyword_ideas", ads_route("ms_ads")),
+        Route("/_stats", mock_stats),
+    ])
+    return app, stats
+
+
+class MockUpstream:
+    """Runs the stand-in server on its own thread and event loop, so its latency and JSON
+    work never share a loop with the app under test."""
+
+    def __init__(self, config: MockConfig, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.app, self.stats = create_app(config)
+        self.server = uvicorn.Server(uvicorn.Config(self.app, host=host, port=port, log_level="warning", lifespan="off"))
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.servers[0].sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, timeout: float = 10.0) -> "MockUpstream":
+        self._thread = threading.Thread(target=self.server.run, name="mock-upstream", daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("mock upstream did not start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--retry-after", type=float, default=None)
+    args = parser.parse_args()
+
+    config = MockConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.error_status, args.retry_after)
+    app, _ = create_app(config)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="info", lifespan="off")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
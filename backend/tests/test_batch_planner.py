@@ -0,0 +1,55 @@
+import asyncio
+
+from app.services.batch_planner import BatchPlanner
+from app.services.keyword_providers import ProviderResult
+
+
+class _Strategy:
+    def __init__(self):
+        self.queries = []
+
+    async def run(self, query, mode=None):
+        self.queries.append(query)
+        # one batch-level row, like ideas a provider can't tie to a single seed
+        rows = [{"keyword": f"best {seed}"} for seed in query.seed_keywords] + [{"keyword": f"gift ideas {len(query.seed_keywords)}"}]
+        return ProviderResult(keywords=rows, data_source="dataforseo")
+
+
+def _plan(jobs, batch_size=20):
+    strategy = _Strategy()
+    planner = BatchPlanner(strategy, batch_size=batch_size)
+    units = planner.units(jobs)
+
+    async def build(unit, results):
+        return sorted(row["keyword"] for result in results for row in result.keywords)
+
+    async def main():
+        return {f"{unit.job_id}@{unit.location}": rows async for unit, rows in planner.run(units, build)}
+
+    return asyncio.run(main()), strategy.queries, planner.fetch_counts(units)
+
+
+def test_a_jobs_seeds_are_batched():
+    jobs = [{"job_id": "big", "seed_keywords": [f"seed {i:02d}" for i in range(25)], "locations": ["2840", "2826"]}]
+    _, queries, counts = _plan(jobs)
+    assert sorted(len(q.seed_keywords) for q in queries) == [5, 5, 20, 20]
+    assert counts == {"requested": 50, "unique": 50, "calls": 4}
+
+
+def test_identical_seed_sets_share_fetches():
+    jobs = [
+        {"job_id": "a", "seed_keywords": ["running shoes", "hiking boots"]},
+        {"job_id": "b", "seed_keywords": ["Hiking Boots", "running shoes"]},
+    ]
+    plans, queries, counts = _plan(jobs)
+    assert len(queries) == 1 and counts == {"requested": 4, "unique": 2, "calls": 1}
+    assert plans["a@2840"] == plans["b@2840"]
+
+
+def test_plan_does_not_depend_on_other_jobs():
+    shoes = {"job_id": "shoes", "seed_keywords": ["running shoes", "hiking boots"]}
+    alone, _, _ = _plan([shoes])
+    together, queries, _ = _plan([shoes, {"job_id": "coffee", "seed_keywords": ["espresso machine", "running shoes"]}])
+    assert together["shoes@2840"] == alone["shoes@2840"] == ["best hiking boots", "best running shoes", "gift ideas 2"]
+    assert together["coffee@2840"] == ["best espresso machine", "best running shoes", "gift ideas 2"]
+    assert all(set(q.seed_keywords) in ({"running shoes", "hiking boots"}, {"espresso machine", "running shoes"}) for q in queries)
@@ -0,0 +1,50 @@
+from app.engine.dedupe import VariantCollapser, canonical_key
+from app.engine.keyword_frame import KeywordFrame
+
+
+def _frame(keywords):
+    return KeywordFrame.from_rows([{"keyword": k, "avg_monthly_searches": 100 * (i + 1)} for i, k in enumerate(keywords)])
+
+
+def test_variants_share_a_key():
+    assert canonical_key("Boots for Women") == canonical_key("women's boots") == canonical_key("womens boot") == "boot women"
+
+
+def test_direction_words_are_kept():
+    assert canonical_key("flights to paris") != canonical_key("flights from paris")
+    assert canonical_key("cheap flights to paris") == canonical_key("Cheap Flights to Paris!")
+
+
+def test_word_order_kept_with_direction_words():
+    assert canonical_key("paris to london") != canonical_key("london to paris")
+    assert canonical_key("red shoes") == canonical_key("shoes red")
+
+
+def test_plural_exceptions():
+    assert canonical_key("glass") != canonical_key("glasses")
+    assert canonical_key("news") != canonical_key("new")
+    assert canonical_key("us open") != canonical_key("us opens")
+    assert canonical_key("kids shoes") == canonical_key("kid shoe")
+    assert canonical_key("children books") == canonical_key("child book")
+
+
+def test_collapse_keeps_directions_apart():
+    keywords = ["flights to paris", "flights from paris", "paris to london", "london to paris", "t shirt printing", "tshirt printing", "Flights to Paris"]
+    groups = VariantCollapser(threshold=0.8).group_ids(_frame(keywords)).tolist()
+    assert groups == [0, 1, 2, 3, 4, 4, 0]
+
+
+def test_collapse_keeps_audiences_apart():
+    keywords = [
+        "waterproof hiking boots for men", "waterproof hiking boots for women",
+        "running shoes for men size", "running shoes for women size",
+        "wireless noise cancelling headphones men", "wireless noise cancelling headphones women",
+    ]
+    groups = VariantCollapser(threshold=0.5).group_ids(_frame(keywords)).tolist()
+    assert groups == [0, 1, 2, 3, 4, 5]
+
+
+def test_collapse_merges_spacing_and_typos():
+    keywords = ["wireless noise cancelling headphones", "wireless noise cancelling headphnes", "t shirt printing", "tshirt printing", "kids shoes", "adult shoes"]
+    groups = VariantCollapser(threshold=0.5).group_ids(_frame(keywords)).tolist()
+    assert groups == [0, 0, 1, 1, 2, 3]
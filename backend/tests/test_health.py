@@ -0,0 +1,17 @@
+from fastapi.testclient import TestClient
+
+from app.main import semApp
+from app.services.registry import service_registry
+
+
+def test_liveness_and_readiness(monkeypatch):
+    # no lifespan: the routes only read the registry's warm-up state
+    client = TestClient(semApp)
+    monkeypatch.setattr(service_registry, "ready", False)
+    health, ready = client.get("/health"), client.get("/ready")
+    assert health.status_code == 200 and health.json()["ready"] is False
+    assert ready.status_code == 503 and ready.json()["status"] == "warming_up"
+
+    monkeypatch.setattr(service_registry, "ready", True)
+    assert client.get("/health").json()["status"] == "healthy"
+    assert client.get("/ready").status_code == 200
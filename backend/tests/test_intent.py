@@ -0,0 +1,25 @@
+from app.engine.intent import classify_intents
+
+
+def test_lexicon_hits():
+    assert list(classify_intents(["how to tie a tie", "buy running shoes", "best running shoes", "nike login", "running shoes"])) == [
+        "informational", "transactional", "commercial", "navigational", "commercial",
+    ]
+
+
+def test_sixteen_byte_brand_matches():
+    assert list(classify_intents(["abcdefghijklmnop shoes"], ["abcdefghijklmnop"])) == ["navigational"]
+
+
+def test_long_brand_matches_whole_word_only():
+    brands = ["abcdefghijklmnopqrstu"]
+    assert list(classify_intents(["abcdefghijklmnopqrstu", "abcdefghijklmnopqrstuvw shoes"], brands)) == ["navigational", "commercial"]
+
+
+def test_brands_sharing_a_long_prefix():
+    brands = ["internationalshoes", "internationalshoesdirect"]
+    assert list(classify_intents(["x", "internationalshoesdirect outlet", "internationalshoes"], brands)) == ["commercial", "navigational", "navigational"]
+
+
+def test_multi_word_brand_and_question_start():
+    assert list(classify_intents(["home depot drills", "is it worth it", "worth it is"], ["home-depot"])) == ["navigational", "informational", "commercial"]
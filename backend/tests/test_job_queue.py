@@ -0,0 +1,69 @@
+import asyncio
+
+from app.services.job_queue import JobQueue, JobStore
+
+
+def test_finished_status_is_not_overwritten(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    store.create("a", "plan", {})
+    assert store.transition("a", "running")
+    assert store.transition("a", "succeeded", result={"ok": True}, stage="done")
+    assert not store.transition("a", "cancelled")
+    assert store.get("a", with_result=True)["status"] == "succeeded"
+
+    store.create("b", "plan", {})
+    assert store.transition("b", "cancelled")
+    assert not store.transition("b", "succeeded", result={"ok": True})
+    assert store.get("b")["status"] == "cancelled"
+    store.close()
+
+
+def test_cancel_after_the_handler_finished_keeps_the_result(tmp_path):
+    async def main():
+        queue = JobQueue(JobStore(str(tmp_path / "jobs.sqlite3")), workers=1)
+
+        async def handler(ctx):
+            return {"plans": []}
+
+        queue.register("plan", handler)
+        await queue.start()
+        job_id = await queue.submit("plan", {})
+        await queue._queue.join()
+
+        # cancel() read the job while it was still running, then the handler finished
+        real_status = queue.status
+        stale = {**(await real_status(job_id)), "status": "running"}
+
+        async def stale_first(job_id, with_result=False, _calls=[]):
+            _calls.append(1)
+            return stale if len(_calls) == 1 else await real_status(job_id, with_result)
+
+        queue.status = stale_first
+        job = await queue.cancel(job_id)
+        await queue.stop()
+        return job
+
+    assert asyncio.run(main())["status"] == "succeeded"
+
+
+def test_cancel_while_running(tmp_path):
+    async def main():
+        queue = JobQueue(JobStore(str(tmp_path / "jobs.sqlite3")), workers=1)
+        started = asyncio.Event()
+
+        async def handler(ctx):
+            started.set()
+            await asyncio.sleep(10)
+
+        queue.register("plan", handler)
+        await queue.start()
+        job_id = await queue.submit("plan", {})
+        await started.wait()
+        job = await queue.cancel(job_id)
+        await queue._queue.join()
+        final = await queue.status(job_id)
+        await queue.stop()
+        return job, final
+
+    job, final = asyncio.run(main())
+    assert job["status"] == final["status"] == "cancelled"
@@ -0,0 +1,42 @@
+import asyncio
+
+from app.services.keyword_providers import KeywordProvider, KeywordQuery, ProviderStrategy
+
+
+class _Provider(KeywordProvider):
+    def __init__(self, name, delay, rows):
+        self.name = self.data_source = name
+        self.delay = delay
+        self.rows = rows
+
+    @property
+    def is_configured(self):
+        return True
+
+    async def fetch(self, query):
+        await asyncio.sleep(self.delay)
+        return [{"keyword": k} for k in self.rows]
+
+
+def _run(providers, mode):
+    return asyncio.run(ProviderStrategy(providers, mode=mode, hedge_delay_ms=20).run(KeywordQuery(seed_keywords=["shoes"])))
+
+
+def test_hedged_takes_the_first_answer():
+    result = _run([_Provider("slow", 0.3, ["a"]), _Provider("fast", 0.0, ["b"])], "hedged")
+    assert result.data_source == "fast" and result.attempted == ["slow", "fast"]
+
+
+def test_hedged_falls_through_empty_answers():
+    result = _run([_Provider("empty", 0.0, []), _Provider("second", 0.0, ["b"])], "hedged")
+    assert result.data_source == "second" and result.keywords == [{"keyword": "b"}]
+
+
+def test_sequential_keeps_priority():
+    result = _run([_Provider("slow", 0.05, ["a"]), _Provider("fast", 0.0, ["b"])], "sequential")
+    assert result.data_source == "slow" and result.attempted == ["slow"]
+
+
+def test_parallel_merges_in_priority_order():
+    result = _run([_Provider("first", 0.02, ["a", "b"]), _Provider("second", 0.0, ["b", "c"])], "parallel")
+    assert result.data_source == "first" and [k["keyword"] for k in result.keywords] == ["a", "b", "c"]
@@ -0,0 +1,54 @@
+import asyncio
+
+from app.services import ms_ads_service as module
+
+
+class _Session:
+    calls = 0
+
+    def __init__(self, client_id):
+        pass
+
+    def refresh_token(self, url, **kwargs):
+        _Session.calls += 1
+        return {"access_token": f"token-{_Session.calls}", "expires_in": 120}
+
+
+def test_short_lived_token_does_not_spin(monkeypatch):
+    monkeypatch.setattr(module, "OAuth2Session", _Session)
+    monkeypatch.setattr(module, "TOKEN_MIN_REFRESH_INTERVAL", 0.05)
+    service = module.MicrosoftAdsService()
+    service.token_refresh_margin = 300
+
+    # a 120s token with a 300s margin: the margin is clamped to half the lifetime
+    assert service._get_access_token() == "token-1"
+    assert service._token_margin == 60 and service._token_is_fresh()
+    assert service._get_access_token() == "token-1"
+
+    async def run_loop():
+        task = asyncio.ensure_future(service._refresh_loop())
+        await asyncio.sleep(0.2)
+        task.cancel()
+
+    asyncio.run(run_loop())
+    assert _Session.calls == 1
+
+
+def test_service_is_created_once_under_concurrency(monkeypatch):
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    created = []
+
+    class _Client:
+        def create_service(self, binding, address):
+            time.sleep(0.05)
+            created.append(threading.get_ident())
+            return object()
+
+    service = module.MicrosoftAdsService()
+    monkeypatch.setattr(service, "_ensure_client", lambda: _Client())
+    with ThreadPoolExecutor(8) as pool:
+        services = list(pool.map(lambda _: service._ensure_service(), range(8)))
+    assert len(created) == 1 and all(s is services[0] for s in services)
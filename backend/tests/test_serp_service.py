@@ -0,0 +1,10 @@
+from app.services.serp_service import serp_service
+
+
+def test_extract_sums_scores_across_sections():
+    res = {
+        "suggested_searches": [{"query": "running shoes"}, {"title": "trail shoes"}],
+        "related_questions": [{"question": "running shoes"}, {"question": "how to lace shoes"}],
+        "related_searches": [{"query": "running shoes"}, {"query": "shoe store"}, {"query": "shoe store"}],
+    }
+    assert serp_service._extract(res) == {"running shoes": 5, "trail shoes": 3, "how to lace shoes": 3, "shoe store": 2}
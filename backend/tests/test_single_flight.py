@@ -0,0 +1,54 @@
+import asyncio
+
+from app.services.single_flight import SingleFlight
+
+
+def _call(flight: SingleFlight, started: list, finished: list):
+    async def work():
+        started.append(1)
+        await asyncio.sleep(0.05)
+        finished.append(1)
+        return "rows"
+
+    return flight.do("test:key", work)
+
+
+def test_concurrent_calls_share_one_task():
+    async def main():
+        flight, started, finished = SingleFlight(), [], []
+        results = await asyncio.gather(*(_call(flight, started, finished) for _ in range(3)))
+        return results, started, flight.stats["test"]
+
+    results, started, stats = asyncio.run(main())
+    assert results == ["rows"] * 3 and len(started) == 1
+    assert stats == {"calls": 3, "leaders": 1, "coalesced": 2}
+
+
+def test_last_waiter_leaving_cancels_the_task():
+    async def main():
+        flight, started, finished = SingleFlight(), [], []
+        first = asyncio.ensure_future(_call(flight, started, finished))
+        second = asyncio.ensure_future(_call(flight, started, finished))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0.01)
+        assert flight.in_flight == 1
+        second.cancel()
+        await asyncio.sleep(0.1)
+        return flight, finished
+
+    flight, finished = asyncio.run(main())
+    assert finished == [] and flight.in_flight == 0
+
+
+def test_remaining_waiter_still_gets_the_result():
+    async def main():
+        flight, started, finished = SingleFlight(), [], []
+        first = asyncio.ensure_future(_call(flight, started, finished))
+        second = asyncio.ensure_future(_call(flight, started, finished))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second, started
+
+    result, started = asyncio.run(main())
+    assert result == "rows" and len(started) == 1
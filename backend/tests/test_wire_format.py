@@ -0,0 +1,58 @@
+import brotli
+import msgpack
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.services.wire_format import CompressionMiddleware, WireFormatMiddleware, WireResponse, _decompress, _TooLarge
+
+
+def _client(max_body_bytes: int = 1024 * 1024) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(WireFormatMiddleware, max_body_bytes=max_body_bytes)
+    app.add_middleware(CompressionMiddleware, min_size=100)
+
+    @app.post("/echo")
+    async def echo(body: dict):
+        return WireResponse({"keywords": body["keywords"] * 50})
+
+    return TestClient(app)
+
+
+def test_msgpack_request_and_response():
+    body = msgpack.packb({"keywords": ["running shoes"]})
+    response = _client().post("/echo", content=body, headers={"Content-Type": "application/msgpack", "Accept": "application/msgpack", "Accept-Encoding": "identity"})
+    assert response.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(response.content) == {"keywords": ["running shoes"] * 50}
+
+
+def test_brotli_request_and_response():
+    body = brotli.compress(b'{"keywords": ["running shoes"]}')
+    response = _client().post("/echo", content=body, headers={"Content-Type": "application/json", "Content-Encoding": "br", "Accept-Encoding": "br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.json() == {"keywords": ["running shoes"] * 50}
+
+
+def test_oversized_brotli_body_is_rejected():
+    body = brotli.compress(b'{"keywords": ["' + b"a" * (2 * 1024 * 1024) + b'"]}')
+    response = _client().post("/echo", content=body, headers={"Content-Type": "application/json", "Content-Encoding": "br"})
+    assert response.status_code == 413
+
+
+def test_brotli_bomb_stops_at_the_limit():
+    bomb = brotli.compress(b"\0" * (64 * 1024 * 1024), quality=5)
+    assert len(bomb) < 64 * 1024
+    with pytest.raises(_TooLarge):
+        _decompress("br", bomb, 1024 * 1024)
+
+
+def test_oversized_raw_body_is_rejected():
+    body = msgpack.packb({"keywords": ["a" * 4096]})
+    response = _client(max_body_bytes=1024).post("/echo", content=body, headers={"Content-Type": "application/msgpack"})
+    assert response.status_code == 413
+
+
+def test_truncated_brotli_body_is_malformed():
+    body = brotli.compress(b'{"keywords": ["running shoes"]}' * 100)[:-4]
+    response = _client().post("/echo", content=body, headers={"Content-Type": "application/json", "Content-Encoding": "br"})
+    assert response.status_code == 400
@@ -112,20 +112,23 @@ const Index = () => {
         competitor_url: data.competitorUrl
       });
       const keywords: KeywordItem[] = gen.keywords || [];
+      // with a plan session the later stages reference the keywords server-side
+      const planId: string | undefined = gen.plan_id;
 
-      const filt: any = await api.filterKeywords({
-        keywords,
-        min_search_volume: Number(data.minSearchVolume) || 100,
-      });
+      const min_search_volume = Number(data.minSearchVolume) || 100;
+      const filt: any = await api.filterKeywords(planId ? { plan_id: planId, min_search_volume } : { keywords, min_search_volume });
 
       let filtered = filt.keywords || [];
+      let usePlan = Boolean(planId);
       if ((!filtered || filtered.length === 0) && keywords.length > 0) {
         filtered = keywords;
+        usePlan = false;
       }
 
-      const grouped: any = await api.groupKeywords({ keywords: filtered });
+      const grouped: any = await api.groupKeywords(usePlan ? { plan_id: planId } : { keywords: filtered });
       let groups = grouped.ad_groups || [];
       if ((!groups || groups.length === 0) && filtered.length > 0) {
+        usePlan = false;
         groups = [
           {
             name: "General Terms",
@@ -141,7 +144,7 @@ const Index = () => {
       }
       setAdGroups(groups);
 
-      const pmax: any = await api.generatePMaxThemes({ keywords: filtered });
+      const pmax: any = await api.generatePMaxThemes(usePlan ? { plan_id: planId } : { keywords: filtered });
       setThemes(pmax.themes || []);
 
       const budgets = {
@@ -149,14 +152,17 @@ const Index = () => {
         shopping: Number(data.shoppingBudget) || 0,
         pmax: Number(data.pmaxBudget) || 0,
       };
-      const bids: any = await api.calculateBids({ ad_groups: groups as unknown as ApiAdGroup[], budgets, conversion_rate: Number(data.conversionRate) / 100 });
+      const conversion_rate = Number(data.conversionRate) / 100;
+      const bids: any = await api.calculateBids(usePlan
+        ? { plan_id: planId, budgets, conversion_rate }
+        : { ad_groups: groups as unknown as ApiAdGroup[], budgets, conversion_rate });
       setBudget({
         totalBudget: bids.total_budget || 0,
         overallRoas: bids.expected_roas || 0,
         conversionRate: Number(data.conversionRate)/100 || 0,
         breakdown: (bids.bid_recommendations || []).map((r: any) => ({
           campaignType: r.ad_group_name,
-          budget: budgets.search + budgets.shopping + budgets.pmax > 0 ? (budgets.search + budgets.shopping + budgets.pmax) / (groups.length || 1) : 0,
+          budget: r.budget ?? 0,
           expectedCpc: r.target_cpc,
           estimatedClicks: r.estimated_clicks,
           estimatedConversions: r.estimated_conversions,
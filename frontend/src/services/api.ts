@@ -28,7 +28,8 @@ export interface KeywordItem {
 }
 
 export interface FilterRequest {
-  keywords: KeywordItem[];
+  keywords?: KeywordItem[];
+  plan_id?: string;
   min_search_volume?: number;
   max_competition?: string;
   min_opportunity_score?: number;
@@ -69,7 +70,8 @@ export interface PMaxTheme {
 }
 
 export interface BudgetRequest {
-  ad_groups: AdGroup[];
+  ad_groups?: AdGroup[];
+  plan_id?: string;
   budgets: {
     search: number;
     shopping: number;
@@ -79,6 +81,23 @@ export interface BudgetRequest {
   target_roas?: number;
 }
 
+export type PlanOutput = 'keywords' | 'filtered_keywords' | 'ad_groups' | 'pmax_themes' | 'bids';
+
+export interface PlanRequest extends KeywordRequest {
+  min_search_volume?: number;
+  max_competition?: string;
+  min_opportunity_score?: number;
+  exclude_branded?: boolean;
+  max_group_size?: number;
+  similarity_threshold?: number;
+  budgets?: Record<string, number>;
+  conversion_rate?: number;
+  target_roas?: number;
+  conversion_value?: number;
+  include_keyword_bids?: boolean;
+  outputs?: PlanOutput[];
+}
+
 export interface ApiResponse<T> {
   status: string;
   data?: T;
@@ -142,6 +161,7 @@ class SEMApiClient {
     keywords: KeywordItem[];
     trends_analyzed: string[];
     generated_at: string;
+    plan_id?: string;
   }>> {
     try {
       const response = await this.client.post('/api/v1/generate_keywords', request);
@@ -208,6 +228,27 @@ class SEMApiClient {
     }
   }
 
+  async buildPlan(request: PlanRequest): Promise<ApiResponse<{
+    plan_id?: string;
+    data_source: string;
+    total_keywords: number;
+    counts: Record<string, number>;
+    keywords?: KeywordItem[];
+    filtered_keywords?: KeywordItem[];
+    ad_groups?: AdGroup[];
+    pmax_themes?: PMaxTheme[];
+    bids?: any;
+    timings_ms: Record<string, number>;
+    generated_at: string;
+  }>> {
+    try {
+      const response = await this.client.post('/api/v1/plan', request);
+      return response.data;
+    } catch (error) {
+      throw this.handleError(error);
+    }
+  }
+
   private handleError(error: any): Error {
     if (error.response) {
       const message = error.response.data?.error || error.response.data?.message || 'Server error';
@@ -229,6 +270,7 @@ export const api = {
   groupKeywords: (request: FilterRequest) => semApiClient.groupKeywords(request),
   generatePMaxThemes: (request: FilterRequest) => semApiClient.generatePMaxThemes(request),
   calculateBids: (request: BudgetRequest) => semApiClient.calculateBids(request),
+  buildPlan: (request: PlanRequest) => semApiClient.buildPlan(request),
 };
 
 export default semApiClient;